@@ -0,0 +1,262 @@
+# archive_api.py
+
+import sqlite3
+from pathlib import Path
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from api.dwarf_backup_db import DB_NAME
+
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+
+# Exposure of a session in seconds from DwarfData.exp_time ("30", "0.5" or "1/250")
+EXPOSURE_SECONDS_SQL = """
+    CASE WHEN instr(DwarfData.exp_time, '/') > 0
+        THEN CAST(substr(DwarfData.exp_time, 1, instr(DwarfData.exp_time, '/') - 1) AS REAL)
+             / CAST(substr(DwarfData.exp_time, instr(DwarfData.exp_time, '/') + 1) AS REAL)
+        ELSE CAST(DwarfData.exp_time AS REAL)
+    END
+"""
+
+# Session tables by source, with the columns and joins only found in the backup entries
+SESSION_SOURCES = {
+    "backup": ("BackupEntry", """,
+                BackupEntry.backup_drive_id AS drive_id,
+                BackupDrive.name AS drive_name""",
+               "LEFT JOIN BackupDrive ON BackupEntry.backup_drive_id = BackupDrive.id"),
+    "dwarf": ("DwarfEntry", "", ""),
+}
+
+STATS_GROUPS = {
+    "object": ("{entry}.astro_object_id", "AstroObject.name"),
+    "dwarf": ("{entry}.dwarf_id", "Dwarf.name"),
+    "drive": ("BackupEntry.backup_drive_id", "BackupDrive.name"),
+    "month": ("substr({entry}.session_date, 1, 7)", "substr({entry}.session_date, 1, 7)"),
+}
+
+archive_api = APIRouter(prefix="/api", tags=["archive"])
+
+def open_archive(db_name=DB_NAME):
+    """Read-only connection to the archive database, the API can't change it."""
+    try:
+        conn = sqlite3.connect(f"{Path(db_name).resolve().as_uri()}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=503, detail=f"Archive database not available: {e}")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def etag_matches(request: Request, etag):
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def query_response(request: Request, query):
+    """
+    JSON of query(conn), with the DB change counter as ETag: a request with an up to date If-None-Match gets a 304
+    without running the query.
+    """
+    conn = open_archive()
+    try:
+        # read before the query: a change in between only costs an extra download on the next request
+        try:
+            version = conn.execute("SELECT version FROM DbVersion WHERE id = 1").fetchone()[0]
+        except (sqlite3.Error, TypeError) as e:
+            raise HTTPException(status_code=503, detail=f"Archive database not ready: {e}")
+        etag = f'"{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        try:
+            content = query(conn)
+        except sqlite3.Error as e:
+            print(f"[DB ERROR] API query failed on {request.url.path}: {e}")
+            raise HTTPException(status_code=500, detail="Archive query failed")
+        content["version"] = version
+        return JSONResponse(content, headers=headers)
+    finally:
+        conn.close()
+
+def keyset_page(conn, select, where, params, id_column, after, limit):
+    """
+    One page of select ordered by id_column, the rows after the id after.
+    next_after is the value of after for the next page, None on the last one.
+    """
+    where = list(where)
+    params = list(params)
+    if after is not None:
+        where.append(f"{id_column} > ?")
+        params.append(after)
+    query = select + (" WHERE " + " AND ".join(where) if where else "") + f" ORDER BY {id_column} LIMIT ?"
+    rows = conn.execute(query, params + [limit + 1]).fetchall()
+    items = [dict(row) for row in rows[:limit]]
+    return {"items": items, "next_after": items[-1]["id"] if len(rows) > limit else None}
+
+@archive_api.get("/dwarfs")
+def list_dwarfs(request: Request):
+    def query(conn):
+        rows = conn.execute("""
+            SELECT id, name, description, type, usb_astronomy_dir, last_scan_date
+            FROM Dwarf
+            ORDER BY id
+        """).fetchall()
+        return {"items": [dict(row) for row in rows]}
+    return query_response(request, query)
+
+@archive_api.get("/drives")
+def list_drives(request: Request, dwarf_id: Optional[int] = None):
+    def query(conn):
+        where = "WHERE dwarf_id = ?" if dwarf_id is not None else ""
+        rows = conn.execute(f"""
+            SELECT id, name, description, location, astronomy_dir, dwarf_id, last_backup_scan_date
+            FROM BackupDrive
+            {where}
+            ORDER BY id
+        """, [dwarf_id] if dwarf_id is not None else []).fetchall()
+        return {"items": [dict(row) for row in rows]}
+    return query_response(request, query)
+
+@archive_api.get("/objects")
+def list_objects(request: Request, search: Optional[str] = None, dso_id: Optional[int] = None,
+                 with_sessions: bool = False, after: Optional[int] = None,
+                 limit: int = Query(API_DEFAULT_LIMIT, ge=1, le=API_MAX_LIMIT)):
+    def query(conn):
+        where = []
+        params = []
+        if search:
+            # instr: no LIKE wildcards in the searched text
+            where.append("""(instr(lower(AstroObject.name), lower(?)) > 0 OR instr(lower(coalesce(AstroObject.description, '')), lower(?)) > 0
+                             OR instr(lower(coalesce(DsoCatalog.designation, '')), lower(?)) > 0)""")
+            params += [search, search, search]
+        if dso_id is not None:
+            where.append("AstroObject.dso_id = ?")
+            params.append(dso_id)
+        if with_sessions:
+            where.append("""(EXISTS (SELECT 1 FROM BackupEntry WHERE astro_object_id = AstroObject.id)
+                             OR EXISTS (SELECT 1 FROM DwarfEntry WHERE astro_object_id = AstroObject.id))""")
+        select = """
+            SELECT
+                AstroObject.id,
+                AstroObject.name,
+                AstroObject.description,
+                AstroObject.dso_id,
+                DsoCatalog.designation,
+                DsoCatalog.type,
+                DsoCatalog.constellation,
+                (SELECT COUNT(*) FROM BackupEntry WHERE astro_object_id = AstroObject.id) AS backup_sessions,
+                (SELECT COUNT(*) FROM DwarfEntry WHERE astro_object_id = AstroObject.id) AS dwarf_sessions
+            FROM AstroObject
+            LEFT JOIN DsoCatalog ON AstroObject.dso_id = DsoCatalog.id
+        """
+        return keyset_page(conn, select, where, params, "AstroObject.id", after, limit)
+    return query_response(request, query)
+
+@archive_api.get("/sessions")
+def list_sessions(request: Request, source: Literal["backup", "dwarf"] = "backup",
+                  object_id: Optional[int] = None, dso_id: Optional[int] = None, dwarf_id: Optional[int] = None,
+                  drive_id: Optional[int] = None, favorite: Optional[bool] = None, target: Optional[str] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None, after: Optional[int] = None,
+                  limit: int = Query(API_DEFAULT_LIMIT, ge=1, le=API_MAX_LIMIT)):
+    """Sessions of the backup drives or of the Dwarfs, date_from / date_to as ISO dates (2025-01-31)."""
+    if drive_id is not None and source != "backup":
+        raise HTTPException(status_code=400, detail="drive_id is only available for the backup sessions")
+    entry, drive_columns, drive_join = SESSION_SOURCES[source]
+
+    def query(conn):
+        where = []
+        params = []
+        filters = [
+            (object_id, f"{entry}.astro_object_id = ?"),
+            (dso_id, f"{entry}.astro_object_id IN (SELECT id FROM AstroObject WHERE dso_id = ?)"),
+            (dwarf_id, f"{entry}.dwarf_id = ?"),
+            (drive_id, "BackupEntry.backup_drive_id = ?"),
+            (favorite, f"{entry}.favorite = ?"),
+            (target, "DwarfData.target = ?"),
+            (date_from, f"{entry}.session_date >= ?"),
+            # the whole day of date_to
+            (date_to + "\uffff" if date_to else None, f"{entry}.session_date <= ?"),
+        ]
+        for value, clause in filters:
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        select = f"""
+            SELECT
+                {entry}.id,
+                {entry}.dwarf_data_id,
+                {entry}.session_date,
+                {entry}.session_dir,
+                {entry}.favorite,
+                {entry}.astro_object_id AS object_id,
+                AstroObject.name AS object_name,
+                {entry}.dwarf_id,
+                Dwarf.name AS dwarf_name{drive_columns},
+                DwarfData.file_path,
+                DwarfData.target,
+                DwarfData.ra,
+                DwarfData.dec,
+                DwarfData.exp_time,
+                DwarfData.gain,
+                DwarfData.ircut,
+                DwarfData.shotsStacked AS stacks,
+                DwarfData.minTemp,
+                DwarfData.maxTemp,
+                SessionStats.total_size,
+                SessionStats.fits_count
+            FROM {entry}
+            JOIN DwarfData ON {entry}.dwarf_data_id = DwarfData.id
+            LEFT JOIN AstroObject ON {entry}.astro_object_id = AstroObject.id
+            LEFT JOIN Dwarf ON {entry}.dwarf_id = Dwarf.id
+            {drive_join}
+            LEFT JOIN SessionStats ON SessionStats.dwarf_data_id = {entry}.dwarf_data_id
+        """
+        return keyset_page(conn, select, where, params, f"{entry}.id", after, limit)
+    return query_response(request, query)
+
+def session_totals(conn, entry, group_by=None):
+    """Sessions, objects, stacked frames, exposure (seconds) and disk size of the sessions of entry, by group when group_by is set."""
+    key_column, name_column = (column.format(entry=entry) for column in STATS_GROUPS[group_by]) if group_by else (None, None)
+    group_columns = f"{key_column} AS key, {name_column} AS name," if group_by else ""
+    query = f"""
+        SELECT
+            {group_columns}
+            COUNT(*) AS sessions,
+            COUNT(DISTINCT {entry}.astro_object_id) AS objects,
+            SUM(DwarfData.shotsStacked) AS stacks,
+            SUM(DwarfData.shotsStacked * {EXPOSURE_SECONDS_SQL}) AS exposure,
+            SUM(SessionStats.total_size) AS total_size
+        FROM {entry}
+        JOIN DwarfData ON {entry}.dwarf_data_id = DwarfData.id
+        LEFT JOIN AstroObject ON {entry}.astro_object_id = AstroObject.id
+        LEFT JOIN Dwarf ON {entry}.dwarf_id = Dwarf.id
+        {"LEFT JOIN BackupDrive ON BackupEntry.backup_drive_id = BackupDrive.id" if entry == "BackupEntry" else ""}
+        LEFT JOIN SessionStats ON SessionStats.dwarf_data_id = {entry}.dwarf_data_id
+    """
+    if group_by:
+        query += f" GROUP BY {key_column} ORDER BY sessions DESC, key"
+        return [dict(row) for row in conn.execute(query).fetchall()]
+    return dict(conn.execute(query).fetchone())
+
+@archive_api.get("/stats")
+def archive_stats(request: Request):
+    def query(conn):
+        counts = conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM Dwarf) AS dwarfs,
+                (SELECT COUNT(*) FROM BackupDrive) AS drives,
+                (SELECT COUNT(*) FROM AstroObject) AS objects
+        """).fetchone()
+        return {**dict(counts), "backup": session_totals(conn, "BackupEntry"), "dwarf": session_totals(conn, "DwarfEntry")}
+    return query_response(request, query)
+
+@archive_api.get("/stats/{group_by}")
+def archive_stats_by(request: Request, group_by: Literal["object", "dwarf", "drive", "month"],
+                     source: Literal["backup", "dwarf"] = "backup"):
+    if group_by == "drive" and source != "backup":
+        raise HTTPException(status_code=400, detail="Sessions of the Dwarfs are not on backup drives")
+    entry = SESSION_SOURCES[source][0]
+    return query_response(request, lambda conn: {"items": session_totals(conn, entry, group_by)})
@@ -2,6 +2,17 @@ import sqlite3
 import os
 # Encoding changed to UTF-8
 DB_NAME = "db\\dwarf_backup.db"
+# Tables read by the JSON API, any change to them increments DbVersion.version (the ETag of the API)
+DB_VERSION_TABLES = ("Dwarf", "BackupDrive", "DwarfData", "BackupEntry", "DwarfEntry", "AstroObject", "DsoCatalog", "SessionStats")
+# Frame quality columns of SubFrame, added to the databases created before them
+SUBFRAME_QUALITY_COLUMNS = (
+    ("background", "REAL"),
+    ("noise", "REAL"),
+    ("star_count", "INTEGER"),
+    ("fwhm", "REAL"),
+    ("quality_mtime", "INTEGER"),
+    ("excluded", "BOOLEAN DEFAULT 0"),
+)
 
 def connect_db(database:DB_NAME):
     try:
@@ -121,6 +132,60 @@ def init_db(conn):
                 mtp_drive_id TEXT
             )
         """)
+        # Header values of the sub-frames of a session, filled at scan time
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SubFrame (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dwarf_data_id INTEGER NOT NULL,
+                file_name TEXT NOT NULL,
+                format TEXT,
+                frame_type TEXT,
+                date_obs TEXT,
+                exp_time REAL,
+                gain INTEGER,
+                filter TEXT,
+                ccd_temp REAL,
+                file_size INTEGER,
+                modification_time INTEGER,
+                background REAL,
+                noise REAL,
+                star_count INTEGER,
+                fwhm REAL,
+                quality_mtime INTEGER,
+                excluded BOOLEAN DEFAULT 0,
+                FOREIGN KEY (dwarf_data_id) REFERENCES DwarfData(id) ON DELETE CASCADE,
+                UNIQUE("dwarf_data_id", "file_name")
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_subframe_dwarf_data_id ON SubFrame(dwarf_data_id);
+        """)
+        cursor.execute("PRAGMA table_info(SubFrame)")
+        subframe_columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in SUBFRAME_QUALITY_COLUMNS:
+            if column not in subframe_columns:
+                cursor.execute(f"ALTER TABLE SubFrame ADD COLUMN {column} {column_type}")
+        # Size and frame counts of the session directory, refreshed when its mtime or file count changes
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SessionStats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dwarf_data_id INTEGER UNIQUE NOT NULL,
+                dir_mtime INTEGER,
+                file_count INTEGER,
+                total_size INTEGER,
+                fits_size INTEGER,
+                tiff_size INTEGER,
+                image_size INTEGER,
+                other_size INTEGER,
+                fits_count INTEGER,
+                failed_fits_count INTEGER,
+                tiff_count INTEGER,
+                failed_tiff_count INTEGER,
+                panel_count INTEGER,
+                updated_at DATETIME,
+                FOREIGN KEY (dwarf_data_id) REFERENCES DwarfData(id) ON DELETE CASCADE
+            )
+        """)
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_backupentry_session_dir ON BackupEntry(session_dir);
         """)
@@ -164,6 +229,22 @@ def init_db(conn):
         cursor.execute("""
           CREATE INDEX IF NOT EXISTS idx_constellation ON DsoCatalog(constellation);
         """)
+        # Change counter of the archive, maintained by triggers so every writer updates it
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS DbVersion (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO DbVersion (id, version) VALUES (1, 0)")
+        for table in DB_VERSION_TABLES:
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE DbVersion SET version = version + 1 WHERE id = 1;
+                    END
+                """)
         # Check if the table is empty
         cursor.execute("SELECT COUNT(*) FROM DsoCatalog")
         row_count = cursor.fetchone()[0]
@@ -645,7 +645,8 @@ def get_ObjectSelect_backup(conn: sqlite3.Connection, object_id = None, dso_id =
                 BackupEntry.favorite,
                 DwarfData.target,
                 DwarfData.dec,
-                DwarfData.ra
+                DwarfData.ra,
+                BackupEntry.id
             FROM BackupEntry
             JOIN DwarfData ON BackupEntry.dwarf_data_id = DwarfData.id
             JOIN BackupDrive ON BackupEntry.backup_drive_id = BackupDrive.id
@@ -727,7 +728,8 @@ def get_ObjectSelect_duplicate_backup(conn: sqlite3.Connection, object_id = None
                 BackupEntry.favorite,
                 DwarfData.target,
                 DwarfData.dec,
-                DwarfData.ra
+                DwarfData.ra,
+                BackupEntry.id
             FROM BackupEntry
             JOIN DwarfData ON BackupEntry.dwarf_data_id = DwarfData.id
             JOIN BackupDrive ON BackupEntry.backup_drive_id = BackupDrive.id
@@ -839,7 +841,8 @@ def get_ObjectSelect_dwarf(conn: sqlite3.Connection, object_id = None, dso_id =
                 DwarfEntry.favorite,
                 DwarfData.target,
                 DwarfData.dec,
-                DwarfData.ra
+                DwarfData.ra,
+                DwarfEntry.id
             FROM DwarfEntry
             JOIN DwarfData ON DwarfEntry.dwarf_data_id = DwarfData.id
             JOIN Dwarf ON DwarfEntry.dwarf_id = Dwarf.id
@@ -1303,6 +1306,201 @@ def insert_DwarfData(conn: sqlite3.Connection, file_path, mtime, thumbnail_path,
         print(f"[DB ERROR] Failed to insert or fetch DwarfData: {e}")
         return None, None
 
+def get_subframe_signatures(conn: sqlite3.Connection, dwarf_data_id):
+    """{file_name: (file_size, modification_time)} of the indexed sub-frames of a session."""
+    try:
+        cursor = conn.execute("SELECT file_name, file_size, modification_time FROM SubFrame WHERE dwarf_data_id = ?", (dwarf_data_id,))
+        return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to get SubFrame signatures for {dwarf_data_id}: {e}")
+        return {}
+
+def upsert_subframes(conn: sqlite3.Connection, dwarf_data_id, frames):
+    """frames: (file_name, format, frame_type, date_obs, exp_time, gain, filter, ccd_temp, file_size, modification_time)"""
+    try:
+        conn.executemany("""
+            INSERT INTO SubFrame (
+                dwarf_data_id, file_name, format, frame_type, date_obs, exp_time, gain, filter, ccd_temp, file_size, modification_time
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(dwarf_data_id, file_name) DO UPDATE SET
+                format = excluded.format,
+                frame_type = excluded.frame_type,
+                date_obs = excluded.date_obs,
+                exp_time = excluded.exp_time,
+                gain = excluded.gain,
+                filter = excluded.filter,
+                ccd_temp = excluded.ccd_temp,
+                file_size = excluded.file_size,
+                modification_time = excluded.modification_time
+        """, [(dwarf_data_id, *frame) for frame in frames])
+        conn.commit()
+        return True
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to insert SubFrame rows for {dwarf_data_id}: {e}")
+        return False
+
+def delete_subframes(conn: sqlite3.Connection, dwarf_data_id, file_names):
+    try:
+        conn.executemany("DELETE FROM SubFrame WHERE dwarf_data_id = ? AND file_name = ?",
+                         [(dwarf_data_id, file_name) for file_name in file_names])
+        conn.commit()
+        return True
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to delete SubFrame rows for {dwarf_data_id}: {e}")
+        return False
+
+def get_subframe_summary(conn: sqlite3.Connection, dwarf_data_id):
+    """
+    Frame counts and integration of a session from the SubFrame index, no file access.
+    Return None when the session has not been indexed.
+    """
+    try:
+        cursor = conn.execute("""
+            SELECT
+                COUNT(*),
+                SUM(CASE WHEN frame_type = 'light' AND format = 'fits' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN frame_type = 'failed' AND format = 'fits' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN frame_type = 'light' AND format = 'tiff' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN frame_type = 'failed' AND format = 'tiff' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN frame_type = 'light' THEN exp_time ELSE 0 END),
+                MAX(CASE WHEN frame_type = 'stacked' THEN exp_time END),
+                MIN(CASE WHEN frame_type = 'light' THEN date_obs END),
+                MAX(CASE WHEN frame_type = 'light' THEN date_obs END),
+                MIN(CASE WHEN frame_type = 'light' THEN ccd_temp END),
+                MAX(CASE WHEN frame_type = 'light' THEN ccd_temp END),
+                SUM(CASE WHEN frame_type = 'light' AND quality_mtime = modification_time THEN 1 ELSE 0 END),
+                AVG(CASE WHEN frame_type = 'light' AND quality_mtime = modification_time THEN fwhm END),
+                AVG(CASE WHEN frame_type = 'light' AND quality_mtime = modification_time THEN star_count END),
+                SUM(CASE WHEN excluded THEN 1 ELSE 0 END)
+            FROM SubFrame WHERE dwarf_data_id = ?
+        """, (dwarf_data_id,))
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            return None
+
+        return {
+            "frames": row[0],
+            "fits": row[1] or 0,
+            "failed_fits": row[2] or 0,
+            "tiff": row[3] or 0,
+            "failed_tiff": row[4] or 0,
+            "integration": row[5] or 0,
+            "stacked_exposure": row[6],
+            "first_date_obs": row[7],
+            "last_date_obs": row[8],
+            "min_ccd_temp": row[9],
+            "max_ccd_temp": row[10],
+            "analyzed": row[11] or 0,
+            "fwhm": row[12],
+            "stars": row[13],
+            "excluded": row[14] or 0
+        }
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to get SubFrame summary for {dwarf_data_id}: {e}")
+        return None
+
+SUBFRAME_COLUMNS = (
+    "file_name", "format", "frame_type", "date_obs", "exp_time", "gain", "filter", "ccd_temp", "file_size", "modification_time",
+    "background", "noise", "star_count", "fwhm", "quality_mtime", "excluded"
+)
+
+def get_subframes(conn: sqlite3.Connection, dwarf_data_id, frame_types=None):
+    """Sub-frames of a session as dicts, ordered by file name."""
+    try:
+        query = f"SELECT {', '.join(SUBFRAME_COLUMNS)} FROM SubFrame WHERE dwarf_data_id = ?"
+        params = [dwarf_data_id]
+        if frame_types:
+            query += f" AND frame_type IN ({','.join('?' for _ in frame_types)})"
+            params.extend(frame_types)
+        cursor = conn.execute(query + " ORDER BY file_name", params)
+        return [dict(zip(SUBFRAME_COLUMNS, row)) for row in cursor.fetchall()]
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to get SubFrame rows for {dwarf_data_id}: {e}")
+        return []
+
+def set_subframe_quality(conn: sqlite3.Connection, dwarf_data_id, results):
+    """results: (file_name, background, noise, star_count, fwhm, quality_mtime)"""
+    try:
+        conn.executemany("""
+            UPDATE SubFrame SET background = ?, noise = ?, star_count = ?, fwhm = ?, quality_mtime = ?
+            WHERE dwarf_data_id = ? AND file_name = ?
+        """, [(*result[1:], dwarf_data_id, result[0]) for result in results])
+        conn.commit()
+        return True
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to set SubFrame quality for {dwarf_data_id}: {e}")
+        return False
+
+def set_subframes_excluded(conn: sqlite3.Connection, dwarf_data_id, excluded_names):
+    """The frames in excluded_names are excluded from the session, all the others are included."""
+    try:
+        conn.execute("UPDATE SubFrame SET excluded = 0 WHERE dwarf_data_id = ?", (dwarf_data_id,))
+        conn.executemany("UPDATE SubFrame SET excluded = 1 WHERE dwarf_data_id = ? AND file_name = ?",
+                         [(dwarf_data_id, file_name) for file_name in excluded_names])
+        conn.commit()
+        return True
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to set excluded SubFrame rows for {dwarf_data_id}: {e}")
+        return False
+
+def get_sessions_quality(conn: sqlite3.Connection, dwarf_data_ids):
+    """{dwarf_data_id: (analyzed frames, average fwhm, average star count, average noise)} of the analyzed light frames."""
+    try:
+        if not dwarf_data_ids:
+            return {}
+        placeholders = ",".join("?" for _ in dwarf_data_ids)
+        cursor = conn.execute(f"""
+            SELECT dwarf_data_id, COUNT(*), AVG(fwhm), AVG(star_count), AVG(noise)
+            FROM SubFrame
+            WHERE dwarf_data_id IN ({placeholders}) AND frame_type = 'light' AND quality_mtime = modification_time AND NOT excluded
+            GROUP BY dwarf_data_id
+        """, list(dwarf_data_ids))
+        return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to get sessions quality: {e}")
+        return {}
+
+SESSION_STATS_COLUMNS = (
+    "dir_mtime", "file_count", "total_size", "fits_size", "tiff_size", "image_size", "other_size",
+    "fits_count", "failed_fits_count", "tiff_count", "failed_tiff_count", "panel_count"
+)
+
+def get_session_stats(conn: sqlite3.Connection, dwarf_data_id):
+    """Stored statistics of a session as a dict, None when the session has not been scanned yet."""
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(SESSION_STATS_COLUMNS)} FROM SessionStats WHERE dwarf_data_id = ?", (dwarf_data_id,))
+        row = cursor.fetchone()
+        return dict(zip(SESSION_STATS_COLUMNS, row)) if row else None
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to get SessionStats for {dwarf_data_id}: {e}")
+        return None
+
+def set_session_stats(conn: sqlite3.Connection, dwarf_data_id, stats):
+    try:
+        values = [stats[column] for column in SESSION_STATS_COLUMNS]
+        conn.execute(f"""
+            INSERT INTO SessionStats (dwarf_data_id, {', '.join(SESSION_STATS_COLUMNS)}, updated_at)
+            VALUES (?, {', '.join('?' for _ in SESSION_STATS_COLUMNS)}, ?)
+            ON CONFLICT(dwarf_data_id) DO UPDATE SET
+                {', '.join(f'{column} = excluded.{column}' for column in SESSION_STATS_COLUMNS)},
+                updated_at = excluded.updated_at
+        """, (dwarf_data_id, *values, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+        return True
+
+    except Exception as e:
+        print(f"[DB ERROR] Failed to set SessionStats for {dwarf_data_id}: {e}")
+        return False
+
 def insert_BackupEntry(conn: sqlite3.Connection, backup_drive_id, dwarf_id, astro_object_id, dwarf_data_id, session_dt_str, session_dir):
     try:
         # Insert entry in BackupEntry
@@ -1391,6 +1589,20 @@ def get_dso_filtered(conn: sqlite3.Connection, search='', constellation=None, ds
     with conn:
         return conn.execute(query, params).fetchall()
 
+def get_dso_search_terms(conn: sqlite3.Connection, dso_ids):
+    """{dso_id: [designation, displayName, alternate names...]} of the catalog objects, for the object search."""
+    dso_ids = list(dso_ids)
+    if not dso_ids:
+        return {}
+    placeholders = ",".join("?" for _ in dso_ids)
+    with conn:
+        rows = conn.execute(f'SELECT id, designation, displayName, alternateNames FROM DsoCatalog WHERE id IN ({placeholders})', dso_ids).fetchall()
+    terms = {}
+    for dso_id, designation, display_name, alternate_names in rows:
+        names = [designation, display_name] + (alternate_names or "").split(",")
+        terms[dso_id] = [name.strip() for name in names if name and name.strip()]
+    return terms
+
 def update_astro_object(conn: sqlite3.Connection, astro_id, dso_id, description):
     with conn:
         dso = conn.execute('SELECT displayName, constellation, type, size, magnitude FROM DsoCatalog WHERE id = ?', (dso_id,)).fetchone()
@@ -1,5 +1,7 @@
 import os
+import io
 import sys
+import ftplib
 import sqlite3
 import json
 import hashlib
@@ -11,14 +13,17 @@ import re
 import platform
 import subprocess
 import glob
+import time
 from astropy.io import fits
 import matplotlib.pyplot as plt
 import numpy as np
-from auto_stretch import apply_stretch
 import cv2
 from nicegui import ui, run
 
 from api.dwarf_backup_db import connect_db, close_db, commit_db
+from api.fits_access import read_fits_keyword, read_fits_section
+from api.subframe_index import index_session_subframes
+from api.session_stats import update_session_stats
 from api.dwarf_backup_db_api import get_backupDrive_id_from_location, insert_astro_object, insert_DwarfData, insert_BackupEntry, insert_DwarfEntry
 from api.dwarf_backup_db_api import is_dwarf_exists, get_dwarf_Names, add_dwarf_detail, delete_notpresent_backup_entries_and_dwarf_data, delete_notpresent_dwarf_entries_and_dwarf_data, set_dwarf_scan_date, set_backup_scan_date
 
@@ -50,47 +55,48 @@ def parse_shots_info(json_path, ftp=None):
                 print(f"❌ FTP connection is required for {json_path}.")
                 return {}
 
-            # Extracting the path on FTP server
+            # Extracting the path on FTP server, the file is small: read it in memory
             ftp_path = json_path.replace("ftp://", "")
-            with open("temp_shotsInfo.json", "wb") as temp_file:
-                ftp.retrbinary(f"RETR {ftp_path}", temp_file.write)
-
-            with open("temp_shotsInfo.json", 'r', encoding='utf-8') as f:
-                raw = json.load(f)
+            buffer = io.BytesIO()
+            ftp.retrbinary(f"RETR {ftp_path}", buffer.write)
+            raw = json.loads(buffer.getvalue().decode("utf-8"))
 
         else:
             # Local file handling
             with open(json_path, 'r', encoding='utf-8') as f:
                 raw = json.load(f)
 
-        shotsToTake = raw.get("shotsToTake")
-        shotsTaken = raw.get("shotsTaken")
-        # case RESTACKED
-        if raw.get("shotsToStack"):
-            shotsToTake = raw.get("shotsToStack")
-            if raw.get("shotsDiscard"):
-                shotsTaken = shotsToTake - raw.get("shotsDiscard")
-
-        return {
-            "dec": str(raw.get("DEC")),
-            "ra": str(raw.get("RA")),
-            "target": raw.get("target"),
-            "binning": raw.get("binning"),
-            "format": raw.get("format"),
-            "exp_time": str(raw.get("exp")) if raw.get('exp') is not None else None,
-            "gain": raw.get("gain"),
-            "shotsToTake": shotsToTake,
-            "shotsTaken": shotsTaken,
-            "shotsStacked": raw.get("shotsStacked"),
-            "ircut": raw.get("ir"),
-            "maxTemp": raw.get("maxTemp"),
-            "minTemp": raw.get("minTemp"),
-        }
+        return shots_info_from_json(raw)
 
     except Exception as e:
         print(f"Error reading {json_path}: {e}")
         return {}
 
+def shots_info_from_json(raw):
+    shotsToTake = raw.get("shotsToTake")
+    shotsTaken = raw.get("shotsTaken")
+    # case RESTACKED
+    if raw.get("shotsToStack"):
+        shotsToTake = raw.get("shotsToStack")
+        if raw.get("shotsDiscard"):
+            shotsTaken = shotsToTake - raw.get("shotsDiscard")
+
+    return {
+        "dec": str(raw.get("DEC")),
+        "ra": str(raw.get("RA")),
+        "target": raw.get("target"),
+        "binning": raw.get("binning"),
+        "format": raw.get("format"),
+        "exp_time": str(raw.get("exp")) if raw.get('exp') is not None else None,
+        "gain": raw.get("gain"),
+        "shotsToTake": shotsToTake,
+        "shotsTaken": shotsTaken,
+        "shotsStacked": raw.get("shotsStacked"),
+        "ircut": raw.get("ir"),
+        "maxTemp": raw.get("maxTemp"),
+        "minTemp": raw.get("minTemp"),
+    }
+
 def open_folder(path_var):
     path = path_var.get()
     if os.path.isdir(path):
@@ -340,6 +346,17 @@ def get_local_dwarf_dir(dwarf_id = None):
 def is_path_local_dwarf_dir(full_path):
     return "Dwarf_Local" in str(full_path)
 
+def get_app_data_dir(subdir = None):
+    # App managed data (transfer journals, caches), kept apart from the Dwarf and backup drives
+    app_data_dir = os.path.join(".", "Dwarfium_Data")
+    if subdir:
+        app_data_dir = os.path.join(app_data_dir, subdir)
+    try:
+        os.makedirs(app_data_dir, exist_ok=True)
+    except Exception as e:
+        print(f"❌ Failed to create directory: {e}")
+    return app_data_dir
+
 def sync_dwarf_sessions(dwarf_id, source_root, local_root="./Dwarf_Local",log=None):
     dwarf_dir = os.path.join(local_root, f"DWARF_{dwarf_id}")
     archive_dir = os.path.join(dwarf_dir, "Archive")
@@ -453,7 +470,7 @@ def check_dir_session (root, dirs, files, session_dir_main_dir, session_dir):
     # ❌ Otherwise it's a container with other subdirs (multi-part or something else)
     return False
 
-def scan_backup_folder(db_name, backup_root, astronomy_dir, dwarf_id, backup_drive_id = None, session_dir_path = None, log=None):
+def scan_backup_folder(db_name, backup_root, astronomy_dir, dwarf_id, backup_drive_id = None, session_dir_path = None, log=None, new_sessions=None):
     if not db_name:
         print_log(f"❌ database name can not be empty!",log)
         return 0,0
@@ -532,7 +549,7 @@ def scan_backup_folder(db_name, backup_root, astronomy_dir, dwarf_id, backup_dri
             print_log(f"📂 Processing direct Dwarf data:\n {astro_dir}",log)
             new_added, data_ids = process_dwarf_folder(
                 conn, backup_root, astro_path,
-                astro_object_id, dwarf_id, backup_drive_id
+                astro_object_id, dwarf_id, backup_drive_id, new_sessions
             )
             total_added += new_added
             if data_ids:
@@ -594,7 +611,7 @@ def scan_backup_folder(db_name, backup_root, astronomy_dir, dwarf_id, backup_dri
                         print(f"Processing session folder (deep): {last_dir_path}")
                         new_added, data_ids = process_dwarf_folder(
                             conn, backup_root, last_dir_path,
-                            astro_object_id, dwarf_id, backup_drive_id
+                            astro_object_id, dwarf_id, backup_drive_id, new_sessions
                         )
                         total_added += new_added
                         print(f"Added : {new_added}")
@@ -912,7 +929,7 @@ def scan_sub_folder(conn, backup_root, astro_path, astro_dir, total_added, valid
     close_db(conn)
     return total_added, deleted
 
-def process_dwarf_folder (conn, backup_root, dwarf_path, astro_object_id, dwarf_id, backup_drive_id=None): 
+def process_dwarf_folder (conn, backup_root, dwarf_path, astro_object_id, dwarf_id, backup_drive_id=None, new_sessions=None): 
     added = 0
     data_ids = set()
     session_date = extract_session_datetime(dwarf_path)
@@ -941,8 +958,16 @@ def process_dwarf_folder (conn, backup_root, dwarf_path, astro_object_id, dwarf_
                 # Insert entry in DwarfEntry
                 new_id = insert_DwarfEntry(conn, dwarf_id, astro_object_id, dwarf_data_id, session_dt_str, session_dir)
                 added += 1 if new_id != 0 else 0
+            # new sessions are returned to the caller (previews pre-generation)
+            if new_id != 0 and new_sessions is not None and dwarf_path not in new_sessions:
+                new_sessions.append(dwarf_path)
         if data_id:
             data_ids.add(data_id)
+
+    # sub-frame headers stored once here, the explore page reads them from the DB
+    if data_ids:
+        index_session_subframes(conn, data_ids, dwarf_path)
+        update_session_stats(conn, data_ids, dwarf_path)
     return added, data_ids
 
 def get_Backup_fullpath (location, subdir, filename, dwarf_id = None):
@@ -966,16 +991,6 @@ def get_Backup_fullpath (location, subdir, filename, dwarf_id = None):
 
     return full_path
 
-def get_directory_size(directory: str) -> str:
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(directory):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if os.path.isfile(fp):
-                total_size += os.path.getsize(fp)
-    # Format size nicely
-    return format_size(total_size)
-
 def format_size(size_bytes: int) -> str:
     if size_bytes == 0:
         return "0B"
@@ -1079,12 +1094,24 @@ def count_failed_tiff_files(directory):
 
 def get_total_exposure(fits_file):
     try:
-        with fits.open(fits_file) as hdul:
-            return float(hdul[0].header.get("EXPTIME", 0))
+        # header only, the image data is never loaded
+        return float(read_fits_keyword(fits_file, "EXPTIME", 0))
     except Exception as e:
         print(f"Error reading EXPTIME from {fits_file}: {e}")
         return 0
 
+# Largest side of the FITS previews, they are shown at most at this size
+PREVIEW_MAX_SIZE = 1280
+PREVIEW_THUMBNAIL_SIZE = 256
+# Preview levels and stretch (auto_stretch defaults), statistics on a subsample
+PREVIEW_BLACK_PERCENTILE = 0.01
+PREVIEW_WHITE_PERCENTILE = 99.99
+PREVIEW_STATS_SAMPLES = 500000
+PREVIEW_LUT_SIZE = 65536
+PREVIEW_CONTRAST_GAIN = 10
+STRETCH_TARGET_BKG = 0.25
+STRETCH_SHADOWS_CLIP = -1.25
+
 def generate_fits_preview1(fits_path: str) -> str:
     try:
         from astropy.io import fits
@@ -1094,22 +1121,16 @@ def generate_fits_preview1(fits_path: str) -> str:
         def increase_contrast(image, gain=10):
             return 1 / (1 + np.exp(-gain * (image - 0.5)))
 
-        with fits.open(fits_path) as hdul:
-            data = hdul[0].data
-            header = hdul[0].header
+        # memory mapped section, BSCALE/BZERO already applied
+        data, header = read_fits_section(fits_path, PREVIEW_MAX_SIZE)
 
-        if data is None or data.ndim != 3:
+        if data.ndim != 3:
             raise ValueError(f"Expected 3D RGB FITS data, got shape {data.shape}")
 
-        image = np.transpose(data, (1, 2, 0)).astype(np.float32)
-
-        bzero = header.get("BZERO", 0)
-        bscale = header.get("BSCALE", 1)
-        image = image * bscale + bzero
+        image = resize_to_preview(np.transpose(data, (1, 2, 0)), PREVIEW_MAX_SIZE)
 
-        # Normalization
-        vmin = np.percentile(image, 0.1)
-        vmax = np.percentile(image, 99.9)
+        # Normalization (histogram of a subsample instead of two full sorts)
+        vmin, vmax = histogram_percentiles(stats_sample(image), (0.1, 99.9))
         image = np.clip((image - vmin) / (vmax - vmin), 0, 1)
 
         # Stretch
@@ -1144,76 +1165,160 @@ def generate_fits_preview1(fits_path: str) -> str:
         return "image/image-error.png"
 
 
-def generate_fits_preview(fits_path: str) -> str:
-    try:
-        from astropy.io import fits
-        import numpy as np
-        import matplotlib.pyplot as plt
-        print(cv2.__version__)
-        def increase_contrast(image, gain=10):
-            return 1 / (1 + np.exp(-gain * (image - 0.5)))
-
-        with fits.open(fits_path) as hdul:
-            data = hdul[0].data
-            header = hdul[0].header
-
-        if data is None:
-            raise ValueError("FITS file has no data")
-
-        if data.ndim == 3:
-            # If the image is already 3D (RGB), ensure it's in float32 (0-1)
-            image_rgb = np.transpose(data, (1, 2, 0)).astype(np.float32)
-            image_rgb = np.clip(image_rgb / np.max(image_rgb), 0, 1)
-            print(f"Using 3D RGB image: {image_rgb.shape}")
-
-        elif data.ndim == 2:
-            # If it's 2D (Bayer pattern), apply demosaicing
-            print("Detected 2D Bayer image, applying demosaicing...")
-
-            # Convert to float32 and normalize (0-1)
-            data = data.astype(np.float32)
-            data -= np.min(data)
-            data /= np.max(data)
-
-            # Convert to uint8 (0-255) for OpenCV
-            data_8bit = (data * 255).astype(np.uint8)
-            image_rgb = cv2.demosaicing(data_8bit, cv2.COLOR_BayerRG2RGB)
-            print(f"Demosaiced image shape: {image_rgb.shape}")
-
-            # Convert to float32 (0-1) for further processing
-            image_rgb = image_rgb.astype(np.float32) / 255.0
+def bayer_superpixel(data):
+    """
+    Half resolution RGB from a Bayer frame, one pixel per 2x2 cell (same channel order as COLOR_BayerRG2RGB).
+    Cheaper than a full demosaicing when the preview is downsampled anyway.
+    """
+    height, width = data.shape[0] // 2 * 2, data.shape[1] // 2 * 2
+    data = data[:height, :width].astype(np.float32)
+    green = (data[0::2, 1::2] + data[1::2, 0::2]) * 0.5
+    return np.dstack((data[1::2, 1::2], green, data[0::2, 0::2]))
+
+def resize_to_preview(image, max_size):
+    """Area downsampling (block mean) so that the largest side is at most max_size."""
+    height, width = image.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(np.ascontiguousarray(image), (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+
+def stats_sample(image, max_samples=PREVIEW_STATS_SAMPLES):
+    """Every n-th value of image, at most max_samples values: enough for the histogram statistics."""
+    flat = image.reshape(-1)
+    return flat[::max(1, flat.size // max_samples)]
+
+def histogram_percentiles(sample, percentiles, bins=PREVIEW_LUT_SIZE):
+    """Percentiles read on a histogram of the sample (no sort), precision of one bin."""
+    low, high = float(np.min(sample)), float(np.max(sample))
+    if high <= low:
+        return [low for _ in percentiles]
+    hist, edges = np.histogram(sample, bins=bins, range=(low, high))
+    cdf = np.cumsum(hist)
+    return [float(edges[min(np.searchsorted(cdf, cdf[-1] * percentile / 100), bins - 1)]) for percentile in percentiles]
+
+def mtf(m, x):
+    """PixInsight midtones transfer function (same as auto_stretch)."""
+    x = np.asarray(x, dtype=np.float64)
+    denominator = (2 * m - 1) * x - m
+    return np.where(denominator == 0, 0.5, (m - 1) * x / np.where(denominator == 0, 1, denominator))
+
+def stretch_lut(median, avg_dev, contrast_gain=PREVIEW_CONTRAST_GAIN):
+    """
+    uint16 -> uint8 lookup table: auto stretch (shadows clipping + midtones) then the sigmoid contrast boost.
+    median and avg_dev are the statistics of the 0-1 normalized data.
+    """
+    c0 = float(np.clip(median + STRETCH_SHADOWS_CLIP * avg_dev, 0, 1))
+    x = np.linspace(0, 1, PREVIEW_LUT_SIZE)
+    if c0 >= 1:
+        y = np.zeros_like(x)
+    else:
+        m = float(mtf(STRETCH_TARGET_BKG, median - c0))
+        y = np.where(x < c0, 0, mtf(m, np.clip((x - c0) / (1 - c0), 0, 1)))
+    y = 1 / (1 + np.exp(-contrast_gain * (y - 0.5)))
+    return np.round(np.clip(y, 0, 1) * 255).astype(np.uint8)
 
+def render_fits_preview(fits_path: str, preview_path: str, max_size: int = PREVIEW_MAX_SIZE) -> str:
+    """
+    Downsample first, then stretch: the Bayer frames are debayered in float/uint16 (never quantized to 8 bits before),
+    black/white points and stretch statistics come from a subsample histogram, and the final mapping is one
+    integer lookup table.
+    """
+    timings = []
+    start = time.perf_counter()
+    def lap(stage):
+        nonlocal start
+        now = time.perf_counter()
+        timings.append(f"{stage} {now - start:.3f}s")
+        start = now
+
+    # memory mapped, only a strided section of a large image is read
+    data, header = read_fits_section(fits_path, max_size)
+    lap("read")
+
+    if data.ndim == 3:
+        # 3D (RGB) image
+        image_rgb = resize_to_preview(np.transpose(data, (1, 2, 0)), max_size)
+        lap("resize")
+        print(f"Using 3D RGB image: {data.shape} -> {image_rgb.shape}")
+
+    elif data.ndim == 2:
+        # 2D (Bayer pattern)
+        if max(data.shape) >= 2 * max_size:
+            image_rgb = resize_to_preview(bayer_superpixel(data), max_size)
         else:
-            raise ValueError(f"Unsupported FITS data shape: {data.shape}")
-
-        # Ensure image is in 0-1 range
-        image = np.clip(image_rgb, 0, 1)
-
-        image = apply_stretch(image)
-
-        # Apply contrast boost (optional)
-        image = increase_contrast(image)
-
-        # Color balance
-        r, g, b = image[..., 0], image[..., 1], image[..., 2]
-        green_mean = g.mean()
-
-        # Remove green bias proportionally
-        g = np.clip(g - 0.45 * green_mean, 0, 1)
-
-        # Recombine channels
-        image = np.stack([r, g, b], axis=-1)
-        image = np.clip(image, 0, 1)  # Ensure values are in range
-
-        # Convert back to uint8 for final output
-        final_image = (image * 255).astype(np.uint8)
-        print("Processed image shape:", final_image.shape)
-
-        preview_path = fits_path.replace(".fits", "_preview.png")
-        plt.imsave(preview_path, final_image, format='png')
-
-        return preview_path
+            data -= np.min(data)
+            data *= 65535 / max(np.max(data), 1e-12)
+            image_rgb = cv2.demosaicing(data.astype(np.uint16), cv2.COLOR_BayerRG2RGB)
+            image_rgb = resize_to_preview(image_rgb.astype(np.float32), max_size)
+        lap("debayer+resize")
+        print(f"Debayered 2D image: {data.shape} -> {image_rgb.shape}")
 
-    except Exception as e:
-        print(f"Error generating preview: {e}")
-        return "image/image-error.png"
+    else:
+        raise ValueError(f"Unsupported FITS data shape: {data.shape}")
+
+    # Black and white points, then 16 bits quantization
+    black, white = histogram_percentiles(stats_sample(image_rgb), (PREVIEW_BLACK_PERCENTILE, PREVIEW_WHITE_PERCENTILE))
+    image = image_rgb - black
+    image *= (PREVIEW_LUT_SIZE - 1) / max(white - black, 1e-12)
+    image16 = np.clip(image, 0, PREVIEW_LUT_SIZE - 1).astype(np.uint16)
+    lap("levels")
+
+    # Linked stretch: same statistics and table for the 3 channels
+    sample = stats_sample(image16).astype(np.float32) / (PREVIEW_LUT_SIZE - 1)
+    median = float(np.median(sample))
+    avg_dev = float(np.mean(np.abs(sample - median)))
+    final_image = stretch_lut(median, avg_dev)[image16]
+
+    # Color balance: remove green bias proportionally
+    green = final_image[..., 1]
+    green_mean = green.mean()
+    final_image[..., 1] = np.clip(green.astype(np.int16) - round(0.45 * green_mean), 0, 255).astype(np.uint8)
+    lap("stretch")
+
+    # encoded in memory, preview_path may not end with .png (cache temporary file)
+    ok, png = cv2.imencode(".png", cv2.cvtColor(final_image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise ValueError("PNG encoding failed")
+    with open(preview_path, "wb") as f:
+        f.write(png.tobytes())
+    lap("write")
+
+    print(f"⏱️ Preview {os.path.basename(fits_path)}: {' | '.join(timings)}")
+    return preview_path
+
+def read_display_image(image_path: str, max_size: int = None):
+    """8 bits BGR image of a stacked JPG/PNG/TIFF (16 bits TIFF are scaled), optionally reduced to max_size."""
+    # decoded from memory, cv2.imread doesn't open non ASCII paths on Windows
+    image = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"Unreadable image {image_path}")
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    elif image.shape[2] == 4:
+        image = image[..., :3]
+    if max_size:
+        image = resize_to_preview(image, max_size)
+    if image.dtype != np.uint8:
+        image = image.astype(np.float32)
+        image = (np.clip(image / max(np.max(image), 1e-12), 0, 1) * 255).astype(np.uint8)
+    return image
+
+def render_image_preview(image_path: str, preview_path: str, max_size: int = PREVIEW_MAX_SIZE) -> str:
+    """PNG preview of a stacked JPG/PNG/TIFF."""
+    image = read_display_image(image_path, max_size)
+    ok, png = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise ValueError("PNG encoding failed")
+    with open(preview_path, "wb") as f:
+        f.write(png.tobytes())
+    return preview_path
+
+def get_preview_renderer(image_path: str):
+    """Render function for the images the browser can't show directly (FITS, TIFF), None otherwise."""
+    extension = get_extension(image_path)
+    if extension == "fits":
+        return render_fits_preview
+    if extension in ("tif", "tiff"):
+        return render_image_preview
+    return None
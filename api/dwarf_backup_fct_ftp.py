@@ -1,41 +1,414 @@
 import os
+import io
+import json
+import time
+import shutil
+import calendar
+import posixpath
+import hashlib
 import ftplib
+import threading
 from ftplib import FTP
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Encoding changed to UTF-8
 from contextlib import contextmanager
 
-from api.dwarf_backup_fct import print_log
+from api.dwarf_backup_fct import print_log, shots_info_from_json, extract_session_datetime, extract_astro_name_from_folder
+from api.dwarf_backup_db import connect_db, close_db, commit_db
+from api.dwarf_backup_db_api import insert_astro_object, insert_DwarfData, insert_DwarfEntry, delete_notpresent_dwarf_entries_and_dwarf_data, set_dwarf_scan_date
+from api.session_stats import is_panel_dir, compute_session_stats, store_session_stats
+from api.subframe_index import index_session_subframes
 
 DWARF2_FTP_PATH = "/DWARF_II/Astronomy"
 DWARF3_FTP_PATH = "/Astronomy"
 
+FTP_PORT = 21
+FTP_TIMEOUT = 30
+# Number of parallel FTP connections used to download from the Dwarf
+FTP_POOL_SIZE = 4
+# Number of downloaded files between two throughput measures
+FTP_ADAPT_WINDOW = 8
+# Parallel FTP connections used to list the sessions and read their shotsInfo.json
+FTP_SCAN_WORKERS = 4
+# Shared page connections: NOOP after FTP_NOOP_INTERVAL seconds idle, closed after FTP_SESSION_IDLE_TIMEOUT
+FTP_NOOP_INTERVAL = 20
+FTP_SESSION_IDLE_TIMEOUT = 300
+FTP_LIST_CACHE_TTL = 10
+# Interrupted downloads are resumed, waiting FTP_RETRY_BACKOFF seconds then twice longer after each failure
+FTP_DOWNLOAD_RETRIES = 5
+FTP_RETRY_BACKOFF = 1
+FTP_RETRY_BACKOFF_MAX = 30
+# Difference (seconds) between a local copy and the Dwarf file still seen as the same date (FAT keeps 2 s)
+FTP_MTIME_TOLERANCE = 2
+
+def ftp_connect(ip_address, port = FTP_PORT, timeout = FTP_TIMEOUT):
+    ftp = ftplib.FTP(timeout=timeout)
+    ftp.connect(ip_address, port)
+    ftp.login()  # Anonymous login
+    return ftp
+
+def ftp_close(ftp):
+    try:
+        ftp.quit()
+    except Exception:
+        ftp.close()
+
 @contextmanager
-def ftp_conn(ip_address):
+def ftp_conn(ip_address, port = FTP_PORT):
     ftp = ftplib.FTP()
     try:
-        ftp.connect(ip_address)
+        ftp.connect(ip_address, port)
         ftp.login()  # Anonymous login
         yield ftp
     finally:
+        ftp_close(ftp)
+
+class FtpConnectionPool:
+    """
+    Pool of logged-in FTP connections to one Dwarf.
+    Connections are opened on demand up to size and given back after use,
+    a connection that failed is dropped instead of being reused.
+    """
+    def __init__(self, ip_address, size = FTP_POOL_SIZE, port = FTP_PORT, timeout = FTP_TIMEOUT):
+        self.ip_address = ip_address
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.idle = []
+        self.opened = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise ftplib.Error("FTP connection pool is closed")
+                if self.idle:
+                    return self.idle.pop()
+                if self.opened < self.size:
+                    self.opened += 1
+                    break
+                self.condition.wait()
+
         try:
-            ftp.quit()
+            return ftp_connect(self.ip_address, self.port, self.timeout)
         except Exception:
-            ftp.close()
+            with self.condition:
+                self.opened -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, ftp, broken = False):
+        with self.condition:
+            if broken or self.closed:
+                self.opened -= 1
+            else:
+                self.idle.append(ftp)
+                ftp = None
+            self.condition.notify()
+        if ftp:
+            ftp_close(ftp)
+
+    @contextmanager
+    def connection(self):
+        ftp = self.acquire()
+        try:
+            yield ftp
+        except (ftplib.all_errors) as e:
+            # error_perm (missing file...) leaves the connection usable
+            self.release(ftp, broken=not isinstance(e, ftplib.error_perm))
+            ftp = None
+            raise
+        finally:
+            if ftp:
+                self.release(ftp)
+
+    def close_all(self):
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.opened -= len(idle)
+            self.condition.notify_all()
+        for ftp in idle:
+            ftp_close(ftp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close_all()
+
+class AdaptiveConcurrency:
+    """
+    Number of active download workers, tuned from the measured throughput:
+    one more worker while the throughput grows, one less when it drops or on errors.
+    """
+    def __init__(self, max_workers, start = 2, window = FTP_ADAPT_WINDOW):
+        self.max_workers = max(1, max_workers)
+        self.limit = min(start, self.max_workers)
+        self.window = window
+        self.best_rate = 0
+        self.window_bytes = 0
+        self.window_files = 0
+        self.window_start = time.monotonic()
+        self.condition = threading.Condition()
+
+    def wait_turn(self, worker_index, stop):
+        with self.condition:
+            while worker_index >= self.limit and not stop():
+                self.condition.wait(timeout=0.5)
+
+    def file_done(self, nb_bytes):
+        with self.condition:
+            self.window_bytes += nb_bytes
+            self.window_files += 1
+            if self.window_files < self.window:
+                return
+            elapsed = max(time.monotonic() - self.window_start, 0.001)
+            rate = self.window_bytes / elapsed
+            if rate > self.best_rate * 1.1 and self.limit < self.max_workers:
+                self.limit += 1
+            elif rate < self.best_rate * 0.7 and self.limit > 1:
+                self.limit -= 1
+            self.best_rate = max(self.best_rate, rate)
+            self.window_bytes = 0
+            self.window_files = 0
+            self.window_start = time.monotonic()
+            self.condition.notify_all()
+
+    def file_failed(self):
+        with self.condition:
+            if self.limit > 1:
+                self.limit -= 1
+            self.best_rate = 0
+            self.condition.notify_all()
+
+def ftp_download_files_parallel(ip_address, all_files, max_connections = FTP_POOL_SIZE, port = FTP_PORT, progress = None, cancel = None, log = None):
+    """
+    Download all_files [(remote_path, local_path, size, modify)] (from download_ftp_tree) with a pool of FTP connections,
+    the listing size and modify date save a SIZE and a MDTM request per file.
+    progress(done_files, total_files, nb_bytes) is called after each file from a worker thread,
+    cancel() is polled between files.
+    Return the list of files that could not be downloaded.
+    """
+    cancel = cancel or (lambda: False)
+    pending = deque((remote_path, local_path, size, modify, 0) for remote_path, local_path, size, modify in all_files)
+    failed = []
+    # files being downloaded, including the ones waiting for a retry
+    in_flight = [0]
+    work = threading.Condition()
+    done = [0]
+    total_files = len(all_files)
+    concurrency = AdaptiveConcurrency(max_connections)
+
+    def finished():
+        return not pending and in_flight[0] == 0
+
+    def next_file():
+        """Next file to download, None once every file is downloaded or failed, or on cancel."""
+        with work:
+            while not pending:
+                if in_flight[0] == 0 or cancel():
+                    return None
+                # a file still downloading may fail and come back for a retry
+                work.wait(timeout=0.5)
+            in_flight[0] += 1
+            return pending.popleft()
+
+    def worker(worker_index, pool):
+        while not cancel():
+            # idle workers stay until nothing is in flight: the worker 0 is always allowed to take a retried file
+            concurrency.wait_turn(worker_index, lambda: cancel() or finished())
+            item = next_file()
+            if item is None:
+                return
+            remote_path, local_path, size, modify, attempt = item
+            try:
+                with pool.connection() as ftp:
+                    ftp_download_file(ftp, remote_path, local_path, size, modify)
+                nb_bytes = os.path.getsize(local_path)
+                concurrency.file_done(nb_bytes)
+                with work:
+                    done[0] += 1
+                    nb_done = done[0]
+                if progress:
+                    progress(nb_done, total_files, nb_bytes)
+            except (ftplib.all_errors) as e:
+                concurrency.file_failed()
+                if attempt < FTP_DOWNLOAD_RETRIES and not isinstance(e, ftplib.error_perm):
+                    print_log(f"⚠️ Retry {remote_path}: {e}", log)
+                    # the Wi-Fi link may need some time to come back, the partial file is resumed
+                    time.sleep(min(FTP_RETRY_BACKOFF * 2 ** attempt, FTP_RETRY_BACKOFF_MAX))
+                    with work:
+                        pending.append((remote_path, local_path, size, modify, attempt + 1))
+                else:
+                    print_log(f"❌ Download failed {remote_path}: {e}", log)
+                    with work:
+                        failed.append((remote_path, local_path))
+            finally:
+                with work:
+                    in_flight[0] -= 1
+                    work.notify_all()
+
+    with FtpConnectionPool(ip_address, size=max_connections, port=port) as pool:
+        workers = [threading.Thread(target=worker, args=(i, pool), daemon=True) for i in range(max_connections)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    # files never tried because of a cancel are failed too
+    failed.extend((remote_path, local_path) for remote_path, local_path, *_ in pending)
+    return failed
+
+class FtpDeviceSession:
+    """
+    Logged-in FTP connection to one Dwarf, shared by the pages.
+    The connection is kept alive with NOOP, the Dwarf layout (Dwarf2 or Dwarf3) is detected once
+    and directory listings are cached for FTP_LIST_CACHE_TTL seconds.
+    """
+    def __init__(self, ip_address, port = FTP_PORT):
+        self.ip_address = ip_address
+        self.port = port
+        self.ftp = None
+        self.last_used = 0
+        self.astro_dir = None
+        self.layout_checked = False
+        self.listings = {}
+        self.lock = threading.RLock()
+
+    def connection(self):
+        """Return the connection, checked with NOOP when it was idle, or a new one."""
+        if self.ftp and time.monotonic() - self.last_used > FTP_NOOP_INTERVAL:
+            try:
+                self.ftp.voidcmd("NOOP")
+            except ftplib.all_errors:
+                self.close()
+        if not self.ftp:
+            self.ftp = ftp_connect(self.ip_address, self.port)
+        self.last_used = time.monotonic()
+        return self.ftp
+
+    def run(self, command):
+        """Run command(ftp), with one new try on a fresh connection if the kept one was dropped."""
+        with self.lock:
+            try:
+                return command(self.connection())
+            except (OSError, EOFError, ftplib.error_temp):
+                self.close()
+                return command(self.connection())
+
+    def keepalive(self):
+        with self.lock:
+            if not self.ftp:
+                return
+            if time.monotonic() - self.last_used > FTP_SESSION_IDLE_TIMEOUT:
+                self.close()
+                return
+            try:
+                self.ftp.voidcmd("NOOP")
+            except ftplib.all_errors:
+                self.close()
+
+    def close(self):
+        with self.lock:
+            if self.ftp:
+                ftp_close(self.ftp)
+            self.ftp = None
+
+    def list_dir(self, path):
+        with self.lock:
+            now = time.monotonic()
+            cached = self.listings.get(path)
+            if cached and now - cached[0] < FTP_LIST_CACHE_TTL:
+                return cached[1]
+            entries = self.run(lambda ftp: ftp_list_dir(ftp, path))
+            self.listings[path] = (now, entries)
+            return entries
+
+    def invalidate(self, path = None):
+        """Forget the cached listings of path, its parent and its sub directories, or all of them."""
+        with self.lock:
+            if path is None:
+                self.listings = {}
+                return
+            path = path.rstrip("/") or "/"
+            parent = posixpath.dirname(path)
+            for cached_path in list(self.listings):
+                if cached_path in (parent, path) or cached_path.startswith(path + "/"):
+                    self.listings.pop(cached_path, None)
+
+    def has_dir(self, parent, name):
+        try:
+            return any(entry["name"] == name and entry["type"] == "dir" for entry in self.list_dir(parent))
+        except ftplib.error_perm:
+            return False
+
+    def get_astro_dir(self):
+        if not self.layout_checked:
+            if self.has_dir("/DWARF_II", posixpath.basename(DWARF2_FTP_PATH)):
+                self.astro_dir = DWARF2_FTP_PATH
+            elif self.has_dir("/", posixpath.basename(DWARF3_FTP_PATH)):
+                self.astro_dir = DWARF3_FTP_PATH
+            else:
+                self.astro_dir = None
+            self.layout_checked = True
+        return self.astro_dir
+
+    def path_exists(self, path):
+        path = path.rstrip("/") or "/"
+        if path == "/":
+            return True
+        try:
+            return any(entry["name"] == posixpath.basename(path) for entry in self.list_dir(posixpath.dirname(path)))
+        except ftplib.error_perm:
+            return False
+
+ftp_sessions = {}
+ftp_sessions_lock = threading.Lock()
+ftp_keepalive_thread = None
+
+def _ftp_keepalive_loop():
+    while True:
+        time.sleep(FTP_NOOP_INTERVAL)
+        with ftp_sessions_lock:
+            sessions = list(ftp_sessions.values())
+        for session in sessions:
+            session.keepalive()
+
+def get_ftp_session(ip_address, port = FTP_PORT):
+    global ftp_keepalive_thread
+    with ftp_sessions_lock:
+        session = ftp_sessions.get((ip_address, port))
+        if not session:
+            session = ftp_sessions[(ip_address, port)] = FtpDeviceSession(ip_address, port)
+        if not ftp_keepalive_thread:
+            ftp_keepalive_thread = threading.Thread(target=_ftp_keepalive_loop, daemon=True)
+            ftp_keepalive_thread.start()
+    return session
+
+def invalidate_ftp_cache(ip_address, path = None, port = FTP_PORT):
+    with ftp_sessions_lock:
+        session = ftp_sessions.get((ip_address, port))
+    if session:
+        session.invalidate(path)
+
+def close_ftp_sessions():
+    with ftp_sessions_lock:
+        sessions = list(ftp_sessions.values())
+        ftp_sessions.clear()
+    for session in sessions:
+        session.close()
 
 def get_ftp_astroDir(ip_address):
     if not ip_address:
         return None
 
     try:
-        with ftp_conn(ip_address) as ftp:
-            dwarf2_path = DWARF2_FTP_PATH
-            dwarf3_path = DWARF3_FTP_PATH
-
-            if dwarf2_path in ftp.nlst("/DWARF_II"):
-                return dwarf2_path
-            elif dwarf3_path in ftp.nlst("/"):
-                return dwarf3_path
+        return get_ftp_session(ip_address).get_astro_dir()
     except ftplib.all_errors:
         pass
 
@@ -46,11 +419,10 @@ def list_ftp_subdirectories(ip_address):
         return None
 
     try:
-        with ftp_conn(ip_address) as ftp:
-            if DWARF2_FTP_PATH in ftp.nlst("/DWARF_II"):
-                return ftp.nlst(DWARF2_FTP_PATH)
-            elif DWARF3_FTP_PATH in ftp.nlst("/"):
-                return ftp.nlst(DWARF3_FTP_PATH)
+        session = get_ftp_session(ip_address)
+        astro_dir = session.get_astro_dir()
+        if astro_dir:
+            return [posixpath.join(astro_dir, entry["name"]) for entry in session.list_dir(astro_dir) if entry["type"] == "dir"]
     except ftplib.all_errors:
         pass
 
@@ -58,10 +430,8 @@ def list_ftp_subdirectories(ip_address):
 
 def ftp_path_exists(ip_address, path):
     try:
-        with ftp_conn(ip_address) as ftp:
-            ftp.cwd(path)
-            return True
-    except:
+        return get_ftp_session(ip_address).path_exists(path)
+    except ftplib.all_errors:
         return False
 
 def check_ftp_connection(ip_address):
@@ -69,20 +439,103 @@ def check_ftp_connection(ip_address):
         return "❌ Please enter an IP address."
 
     try:
-        with ftp_conn(ip_address) as ftp:
-            if DWARF2_FTP_PATH in ftp.nlst("/DWARF_II"):
-                return "✅ Connected to Dwarf2 FTP"
-            elif DWARF3_FTP_PATH in ftp.nlst("/"):
-                return "✅ Connected to Dwarf3 FTP"
-            else:
-                return "❌ Connected to FTP (not Dwarf)."
+        session = get_ftp_session(ip_address)
+        # the user asks for a new check: the Dwarf may have been changed
+        session.layout_checked = False
+        session.invalidate()
+        astro_dir = session.get_astro_dir()
+        if astro_dir == DWARF2_FTP_PATH:
+            return "✅ Connected to Dwarf2 FTP"
+        elif astro_dir == DWARF3_FTP_PATH:
+            return "✅ Connected to Dwarf3 FTP"
+        else:
+            return "❌ Connected to FTP (not Dwarf)."
     except ftplib.all_errors:
         return "❌ FTP Error: not connected"
 
-def download_ftp_tree(ip_address, ftp_root_path, local_dest_root):
+def parse_mlsd_time(value):
+    """MLSD modify fact (YYYYMMDDHHMMSS[.sss], UTC) to a timestamp."""
+    try:
+        return calendar.timegm(time.strptime(value[:14], "%Y%m%d%H%M%S"))
+    except (TypeError, ValueError):
+        return None
+
+def parse_list_line(line):
+    """
+    Parse one line of a LIST answer, unix (ls -l) or DOS format.
+    Return a listing entry or None for the lines that can not be parsed.
+    """
+    parts = line.split(None, 8)
+    if len(parts) == 9 and parts[0][:1] in "-dl":
+        mode, _, _, _, size, month, day, year_or_time, name = parts
+        try:
+            if ":" in year_or_time:
+                # less than 6 months old: the year is not given, it is this year or the previous one
+                year = time.gmtime().tm_year
+                modify = calendar.timegm(time.strptime(f"{year} {month} {day} {year_or_time}", "%Y %b %d %H:%M"))
+                if modify > time.time() + 86400:
+                    modify = calendar.timegm(time.strptime(f"{year - 1} {month} {day} {year_or_time}", "%Y %b %d %H:%M"))
+            else:
+                modify = calendar.timegm(time.strptime(f"{year_or_time} {month} {day}", "%Y %b %d"))
+        except ValueError:
+            modify = None
+        if mode.startswith("l"):
+            name = name.split(" -> ", 1)[0]
+        return {"name": name, "type": "dir" if mode.startswith("d") else "file", "size": int(size) if size.isdigit() else None, "modify": modify}
+
+    parts = line.split(None, 3)
+    if len(parts) == 4 and "-" in parts[0]:
+        date_part, time_part, size_or_dir, name = parts
+        try:
+            modify = calendar.timegm(time.strptime(f"{date_part} {time_part}", "%m-%d-%y %I:%M%p"))
+        except ValueError:
+            modify = None
+        is_dir = size_or_dir.upper() == "<DIR>"
+        return {"name": name, "type": "dir" if is_dir else "file", "size": None if is_dir else int(size_or_dir) if size_or_dir.isdigit() else None, "modify": modify}
+
+    return None
+
+def ftp_list_dir(ftp, path):
+    """
+    List a FTP directory in one request.
+    Return [{"name", "type": "dir"|"file", "size", "modify"}] without . and ..
+    MLSD is used when the server supports it, otherwise the LIST answer is parsed.
+    """
+    entries = []
+    if getattr(ftp, "dwarf_mlsd", True):
+        try:
+            for name, facts in ftp.mlsd(path, facts=["type", "size", "modify"]):
+                entry_type = facts.get("type", "").lower()
+                if entry_type in ("cdir", "pdir") or name in (".", ".."):
+                    continue
+                size = facts.get("size")
+                entries.append({
+                    "name": posixpath.basename(name.rstrip("/")) or name,
+                    "type": "dir" if entry_type == "dir" else "file",
+                    "size": int(size) if size and size.isdigit() else None,
+                    "modify": parse_mlsd_time(facts.get("modify"))
+                })
+            return entries
+        except ftplib.error_perm as e:
+            # 500/502: command unknown, remember it for this connection. 550: path error
+            if not str(e).startswith(("500", "501", "502")):
+                raise
+            ftp.dwarf_mlsd = False
+
+    lines = []
+    ftp.retrlines(f"LIST {path}", lines.append)
+    for line in lines:
+        entry = parse_list_line(line)
+        if entry and entry["name"] not in (".", ".."):
+            entry["name"] = posixpath.basename(entry["name"].rstrip("/")) or entry["name"]
+            entries.append(entry)
+    return entries
+
+def download_ftp_tree(ip_address, ftp_root_path, local_dest_root, port = FTP_PORT):
+    """Files under ftp_root_path: [(remote_path, local_path, size, modify)], size and modify from the listing (None if unknown)."""
     all_files = []
     try:
-        with ftp_conn(ip_address) as ftp:
+        with ftp_conn(ip_address, port) as ftp:
             _recursive_ftp_walk(ftp, ftp_root_path, local_dest_root, all_files)
     except ftplib.all_errors as e:
         print(f"FTP error: {e}")
@@ -90,20 +543,13 @@ def download_ftp_tree(ip_address, ftp_root_path, local_dest_root):
 
 def _recursive_ftp_walk(ftp, ftp_path, local_dest_root, all_files):
     try:
-        entries = ftp.nlst(ftp_path)
-        for entry in entries:
-            try:
-                ftp.cwd(entry)  # It's a directory
-                _recursive_ftp_walk(
-                    ftp, entry,
-                    os.path.join(local_dest_root, os.path.relpath(entry, ftp_path)),
-                    all_files
-                )
-            except ftplib.error_perm:
-                # It's a file
-                rel_path = os.path.relpath(entry, ftp_path)
-                local_path = os.path.join(local_dest_root, rel_path)
-                all_files.append((entry, local_path))
+        for entry in ftp_list_dir(ftp, ftp_path):
+            remote_path = posixpath.join(ftp_path, entry["name"])
+            local_path = os.path.join(local_dest_root, entry["name"])
+            if entry["type"] == "dir":
+                _recursive_ftp_walk(ftp, remote_path, local_path, all_files)
+            else:
+                all_files.append((remote_path, local_path, entry["size"], entry["modify"]))
     except ftplib.all_errors as e:
         print(f"FTP error listing {ftp_path}: {e}")
 
@@ -115,18 +561,12 @@ def ftp_walk(ftp, path):
     dirs, nondirs = [], []
 
     try:
-        entries = ftp.nlst(path)
-        for entry in entries:
-            # Skip . and ..
-            name = entry.rsplit('/', 1)[-1]
-            if name in ('.', '..'):
-                continue
-
-            try:
-                ftp.cwd(entry)  # Try to change into the entry
-                dirs.append(entry)
-            except ftplib.error_perm:
-                nondirs.append(entry)
+        for entry in ftp_list_dir(ftp, path):
+            entry_path = posixpath.join(path, entry["name"])
+            if entry["type"] == "dir":
+                dirs.append(entry_path)
+            else:
+                nondirs.append(entry_path)
 
         yield path, dirs, nondirs
 
@@ -143,10 +583,67 @@ def connect_to_dwarf(ip_address, status_label):
         status_label.text = status_message
 
 # --- Download file from FTP to local ---
-def ftp_download_file(ftp, remote_path, local_path):
-    os.makedirs(os.path.dirname(local_path), exist_ok=True)
-    with open(local_path, 'wb') as f:
-        ftp.retrbinary(f"RETR {remote_path}", f.write)
+def ftp_remote_size(ftp, remote_path):
+    try:
+        ftp.voidcmd("TYPE I")
+        return ftp.size(remote_path)
+    except ftplib.error_perm:
+        return None
+
+def ftp_remote_modify(ftp, remote_path):
+    """Modification timestamp of remote_path from MDTM, None when the server doesn't give it."""
+    try:
+        return parse_mlsd_time(ftp.sendcmd(f"MDTM {remote_path}").split()[-1])
+    except ftplib.error_perm:
+        return None
+
+def ftp_download_file(ftp, remote_path, local_path, remote_size = None, remote_modify = None):
+    """
+    Download remote_path to local_path, remote_size and remote_modify from the listing when known.
+    Data goes to local_path.part, a part file left by an interrupted download is continued
+    with REST at its current length. The file gets its final name once its size is checked,
+    and the date of the remote file: a local file with the same size and date is not downloaded again.
+    """
+    local_dir = os.path.dirname(local_path)
+    if local_dir:
+        os.makedirs(local_dir, exist_ok=True)
+    if remote_size is None:
+        remote_size = ftp_remote_size(ftp, remote_path)
+
+    # already downloaded by a previous run: a restacked file can have the same size, the date must match too
+    if remote_size is not None and os.path.exists(local_path) and os.path.getsize(local_path) == remote_size:
+        if remote_modify is None:
+            remote_modify = ftp_remote_modify(ftp, remote_path)
+        if not files_are_different(local_path, remote_size, remote_modify):
+            return
+
+    part_path = local_path + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if remote_size is None or offset > remote_size:
+        offset = 0
+
+    with open(part_path, 'ab' if offset else 'wb') as f:
+        # a complete part file only needs the size check and the rename
+        if not offset or offset < remote_size:
+            try:
+                ftp.retrbinary(f"RETR {remote_path}", f.write, rest=offset or None)
+            except ftplib.error_perm as e:
+                if not offset or not str(e).startswith(("500", "501", "502", "504")):
+                    raise
+                # REST not supported: start again from the beginning
+                f.seek(0)
+                f.truncate()
+                ftp.retrbinary(f"RETR {remote_path}", f.write)
+
+    local_size = os.path.getsize(part_path)
+    if remote_size is not None and local_size != remote_size:
+        # transient error: the next try resumes from the received data
+        raise ftplib.error_temp(f"451 Size mismatch for {remote_path}: {local_size}/{remote_size} bytes")
+    os.replace(part_path, local_path)
+    if remote_modify is None:
+        remote_modify = ftp_remote_modify(ftp, remote_path)
+    if remote_modify is not None:
+        os.utime(local_path, (remote_modify, remote_modify))
 
 # --- Upload file from local to FTP ---
 # not working as READ ONLY need sftp on DWARF 2 only
@@ -154,11 +651,14 @@ def ftp_upload_file(ftp, local_path, remote_path):
     with open(local_path, 'rb') as f:
         ftp.storbinary(f"STOR {remote_path}", f)
 
-def files_are_different(dst, size):
+def files_are_different(dst, size, modify = None):
     if not os.path.exists(dst):
         return True
     if os.path.getsize(dst) != size:
         return True
+    # the downloaded files get the date of the Dwarf file
+    if modify is not None and abs(os.path.getmtime(dst) - modify) > FTP_MTIME_TOLERANCE:
+        return True
     return False
 
 def safe_path(path):
@@ -172,8 +672,7 @@ def ftp_sync_dwarf_sessions(ftp, dwarf_id, source_root="/DWARF/Sessions", local_
     archive_dir = os.path.join(dwarf_dir, "Archive")
     os.makedirs(archive_dir, exist_ok=True)
 
-    ftp.cwd(source_root)
-    sessions = ftp.nlst()
+    sessions = [entry["name"] for entry in ftp_list_dir(ftp, source_root) if entry["type"] == "dir"]
 
     local_sessions = [
         d for d in os.listdir(dwarf_dir)
@@ -187,19 +686,16 @@ def ftp_sync_dwarf_sessions(ftp, dwarf_id, source_root="/DWARF/Sessions", local_
         dst_session = os.path.join(dwarf_dir, session)
         os.makedirs(dst_session, exist_ok=True)
 
-        ftp.cwd(remote_session_path)
-        files = ftp.nlst()
-        for file_name in files:
-            if file_name.startswith("stacked") or file_name == "shotsInfo.json":
+        # one listing gives the size of every file of the session
+        for entry in ftp_list_dir(ftp, remote_session_path):
+            file_name = entry["name"]
+            if entry["type"] == "file" and (file_name.startswith("stacked") or file_name == "shotsInfo.json"):
                 local_file_path = safe_path(os.path.join(dst_session, file_name))
 
-                # Get size from FTP (needed to compare)
-                size = ftp.size(file_name)
-
-                if files_are_different(local_file_path, size):
+                size = entry["size"]
+                if size is None or files_are_different(local_file_path, size, entry["modify"]):
                     print_log(f"📥 Downloading {file_name} from {session}...", log)
-                    with open(local_file_path, 'wb') as f:
-                        ftp.retrbinary(f"RETR {file_name}", f.write)
+                    ftp_download_file(ftp, f"{remote_session_path}/{file_name}", local_file_path, size, entry["modify"])
                 else:
                     print_log(f"✅ Skipping {file_name} (unchanged)", log)
 
@@ -253,38 +749,25 @@ def parse_shots_info(json_path, ftp=None):
                 return {}
 
             # Extracting the path on FTP server
-            ftp_path = json_path.replace("ftp://", "")
-            with open("temp_shotsInfo.json", "wb") as temp_file:
-                ftp.retrbinary(f"RETR {ftp_path}", temp_file.write)
-
-            with open("temp_shotsInfo.json", 'r', encoding='utf-8') as f:
-                raw = json.load(f)
+            raw = ftp_read_json(ftp, json_path.replace("ftp://", ""))
 
         else:
             # Local file handling
             with open(json_path, 'r', encoding='utf-8') as f:
                 raw = json.load(f)
 
-        return {
-            "dec": str(raw.get("DEC")),
-            "ra": str(raw.get("RA")),
-            "target": raw.get("target"),
-            "binning": raw.get("binning"),
-            "format": raw.get("format"),
-            "exp_time": str(raw.get("exp")) if raw.get('exp') is not None else None,
-            "gain": raw.get("gain"),
-            "shotsToTake": raw.get("shotsToTake"),
-            "shotsTaken": raw.get("shotsTaken"),
-            "shotsStacked": raw.get("shotsStacked"),
-            "ircut": raw.get("ir"),
-            "maxTemp": raw.get("maxTemp"),
-            "minTemp": raw.get("minTemp"),
-        }
+        return shots_info_from_json(raw)
 
     except Exception as e:
         print(f"Error reading {json_path}: {e}")
         return {}
 
+def ftp_read_json(ftp, remote_path):
+    """Read a small JSON file (shotsInfo.json) from the FTP server in memory."""
+    buffer = io.BytesIO()
+    ftp.retrbinary(f"RETR {remote_path}", buffer.write)
+    return json.loads(buffer.getvalue().decode("utf-8"))
+
 def compute_md5(filepath):
     hash_md5 = hashlib.md5()
     filepath_str = str(filepath)
@@ -299,8 +782,7 @@ def compute_md5(filepath):
                 while chunk := conn.recv(4096):
                     hash_md5.update(chunk)
     else:
-        long_path = f"\\\\?\\{os.path.abspath(filepath)}"
-        with open(long_path, "rb") as f:
+        with open(safe_path(filepath), "rb") as f:
             for chunk in iter(lambda: f.read(4096), b""):
                 hash_md5.update(chunk)
 
@@ -324,8 +806,112 @@ def extract_target_json_ftp(ip_address, astro_path):
     return meta.get("target") if meta else None
 
 
-## TO DO ##
-def scan_backup_folder_ftp(db_name, backup_root, astronomy_dir, dwarf_id, backup_drive_id = None, session_dir_path = None, log=None):
+def ftp_list_dwarf_sessions(pool, astro_dir, max_workers = FTP_SCAN_WORKERS):
+    """
+    List the sessions of the Dwarf astronomy dir (RESTACKED sessions included) with their files.
+    Return [(session, entries)], session is relative to astro_dir ("RESTACKED/<name>" for restacked ones).
+    The panel directories of a mosaic have their own listing in entry["entries"].
+    One listing per directory, the session directories are listed concurrently.
+    """
+    with pool.connection() as ftp:
+        top_entries = ftp_list_dir(ftp, astro_dir)
+        sessions = [entry["name"] for entry in top_entries if entry["type"] == "dir" and entry["name"] not in ("RESTACKED", "Archive")]
+        if any(entry["name"] == "RESTACKED" and entry["type"] == "dir" for entry in top_entries):
+            sessions += [f"RESTACKED/{entry['name']}" for entry in ftp_list_dir(ftp, f"{astro_dir}/RESTACKED") if entry["type"] == "dir"]
+
+    def list_session(session):
+        with pool.connection() as ftp:
+            entries = ftp_list_dir(ftp, f"{astro_dir}/{session}")
+            if "_MOSAIC_" in session:
+                for entry in entries:
+                    if entry["type"] == "dir" and is_panel_dir(entry["name"]):
+                        entry["entries"] = ftp_list_dir(ftp, f"{astro_dir}/{session}/{entry['name']}")
+            return session, entries
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(list_session, sessions))
+
+def ftp_fetch_shots_info(pool, astro_dir, sessions, max_workers = FTP_SCAN_WORKERS, log = None):
+    """Read the shotsInfo.json of all the sessions concurrently, in memory. Return {session: meta}."""
+    def fetch(session):
+        try:
+            with pool.connection() as ftp:
+                return session, shots_info_from_json(ftp_read_json(ftp, f"{astro_dir}/{session}/shotsInfo.json"))
+        except (ftplib.all_errors + (ValueError,)) as e:
+            print_log(f"⚠️ Can't read shotsInfo.json of {session}: {e}", log)
+            return session, {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(executor.map(fetch, sessions))
+
+def ftp_session_listing(entries):
+    """(dir_mtime, files, subdirs) of a session from its listing, as walk_session_dir gives them for a local directory."""
+    files = []
+    subdirs = []
+    dir_mtime = 0
+    for entry in entries:
+        dir_mtime = max(dir_mtime, entry["modify"] or 0)
+        if entry["type"] == "file":
+            files.append((entry["name"], "", entry["size"] or 0))
+        else:
+            subdirs.append(entry["name"])
+            for sub_entry in entry.get("entries", []):
+                dir_mtime = max(dir_mtime, sub_entry["modify"] or 0)
+                if sub_entry["type"] == "file":
+                    files.append((sub_entry["name"], entry["name"], sub_entry["size"] or 0))
+    return dir_mtime, files, subdirs
+
+def is_session_mirror_file(file_name):
+    return file_name.startswith("stacked") or file_name == "shotsInfo.json"
+
+def ftp_mirror_sessions(pool, astro_dir, session_entries, dwarf_dir, max_workers = FTP_SCAN_WORKERS, log = None):
+    """Copy the stacked files and shotsInfo.json of the sessions in the local Dwarf dir, from the known listings."""
+    archive_dir = os.path.join(dwarf_dir, "Archive")
+    os.makedirs(archive_dir, exist_ok=True)
+
+    to_download = []
+    for session, entries in session_entries:
+        dst_session = os.path.join(dwarf_dir, *session.split("/"))
+        os.makedirs(dst_session, exist_ok=True)
+        for entry in entries:
+            if entry["type"] == "file" and is_session_mirror_file(entry["name"]):
+                local_file_path = safe_path(os.path.join(dst_session, entry["name"]))
+                if entry["size"] is None or files_are_different(local_file_path, entry["size"], entry["modify"]):
+                    to_download.append((f"{astro_dir}/{session}/{entry['name']}", local_file_path, entry["size"], entry["modify"]))
+
+    def download(item):
+        remote_path, local_file_path, size, modify = item
+        try:
+            with pool.connection() as ftp:
+                ftp_download_file(ftp, remote_path, local_file_path, size, modify)
+            print_log(f"📥 Downloaded {remote_path}", log)
+        except ftplib.all_errors as e:
+            print_log(f"❌ Download failed {remote_path}: {e}", log)
+
+    print_log(f"🔄 Local copy: {len(to_download)} files to update...", log)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(download, to_download))
+
+    # Archive removed sessions
+    remote_top_dirs = {session.split("/")[0] for session, _ in session_entries}
+    local_sessions = [
+        d for d in os.listdir(dwarf_dir)
+        if os.path.isdir(os.path.join(dwarf_dir, d)) and d != "Archive"
+    ]
+    for session in set(local_sessions) - remote_top_dirs:
+        print_log(f"📦 Archiving removed session: {session}", log)
+        shutil.move(os.path.join(dwarf_dir, session), os.path.join(archive_dir, session))
+
+def scan_dwarf_ftp(db_name, ip_address, astro_dir, dwarf_id, local_root = None, log = None, port = FTP_PORT, max_workers = FTP_SCAN_WORKERS, new_sessions = None):
+    """
+    Index the sessions of a Dwarf directly over FTP.
+    Sessions are listed once, shotsInfo.json files are read concurrently in memory and the data
+    goes straight into the DB, with the session stats computed from the listings.
+    With local_root, the stacked files are also kept in the local Dwarf dir (same layout as ftp_sync_dwarf_sessions)
+    so they can be shown when the Dwarf is not connected, their headers are indexed and the local dirs of the
+    new sessions are added to new_sessions (previews pre-generation).
+    Return (added, deleted) like scan_backup_folder.
+    """
     if not db_name:
         print_log(f"❌ database name can not be empty!",log)
         return 0,0
@@ -334,179 +920,100 @@ def scan_backup_folder_ftp(db_name, backup_root, astronomy_dir, dwarf_id, backup
         print_log(f"❌ {db_name} database couldn't be opened!",log)
         return 0,0
 
-    if astronomy_dir:
-        data_root = os.path.join(backup_root, astronomy_dir)
-    else:
-        data_root = backup_root
-    if not os.path.exists(data_root):
-        print_log(f"❌ {astronomy_dir} folder not found in {backup_root}",log)
-        return 0,0
-
-    # Scan only one session dir
-    session_dir_main_dir = None
-    session_dir = None
-    is_session_dir = None
-
-    if session_dir_path:
-        session_dir_main_dir, is_session_dir = determine_session_dir(data_root, session_dir_path)
-
-    if session_dir_main_dir:
-        session_dir = os.path.basename(session_dir_path)
-
     valid_ids = set()
     total_added = 0
     deleted = 0
 
-    for astro_dir in os.listdir(data_root):
-        astro_path = os.path.join(data_root, astro_dir)
-        if not os.path.isdir(astro_path):
-            continue
-
-        if session_dir_main_dir and not (session_dir_main_dir == astro_dir):
-            continue
+    try:
+        with FtpConnectionPool(ip_address, size=max_workers, port=port) as pool:
+            session_entries = ftp_list_dwarf_sessions(pool, astro_dir, max_workers)
+            print_log(f"🔍 {len(session_entries)} sessions found on the Dwarf", log)
 
-        if session_dir_main_dir:
-            if is_session_dir:
-                print_log(f"🔍 Processing Session Dir: {session_dir}",log)
-                print(f"Processing Session Dir: {session_dir}",log)
+            with_info = [session for session, entries in session_entries if any(entry["name"] == "shotsInfo.json" for entry in entries)]
+            metas = ftp_fetch_shots_info(pool, astro_dir, with_info, max_workers, log)
 
-        else:
-            print_log(f"🔍 Processing Dir:",log)
-            print_log(f"🔍 {astro_dir}",log)
-            print(f"astro_path Dir: {astro_path}")
-            print(f"Processing Dir: {astro_dir}")
-    
-        found_data = False
-        total_previous = total_added
-    
-        astro_name = extract_astro_name_from_folder(astro_dir)
-        print(f"Processing extract_astro_name_from_folder: {astro_name}")
-        if not astro_name:
-            check_target_file = astro_path
-            print(f"check_target_file Dir: {astro_path}")
-            astro_name = extract_target_json(astro_path)
-            print(f"Processing extract_target_json: {astro_name}")
-        if astro_name:
-            found_data = True
-            astro_object_id, new = insert_astro_object(conn, astro_name)
-            if not astro_object_id:
-                break
-            if new:
-                print_log(f"add astro object : {astro_name}",log)
-            else:
-                print_log(f"use astro object : {astro_name}",log)
-            print_log(f"📂 Processing direct Dwarf data:\n {astro_dir}",log)
-            new_added, data_ids = process_dwarf_folder(
-                conn, backup_root, astro_path,
-                astro_object_id, dwarf_id, backup_drive_id
-            )
-            total_added += new_added
-            if data_ids:
-                if isinstance(data_ids, (list, tuple, set)):
-                    valid_ids.update(data_ids)
-                else:
-                    valid_ids.add(data_ids)
-            if total_added - total_previous == 1:
-                print_log(f"📂 Found 1 new Session in {astro_dir}",log)
-            elif total_added != total_previous:
-                print_log(f"📂 Found {total_added - total_previous} new Sessions in {astro_dir}",log)
+            dwarf_dir = None
+            if local_root:
+                dwarf_dir = os.path.join(local_root, f"DWARF_{dwarf_id}")
+                ftp_mirror_sessions(pool, astro_dir, session_entries, dwarf_dir, max_workers, log)
 
-        else:
-            astro_name = astro_dir
-            # Traverse all folders below astro_path
-            for root, dirs, files in os.walk(astro_path):
-                if check_dir_session (root, dirs, files, session_dir_main_dir, session_dir):
-                    current_dir = os.path.basename(os.path.normpath(root))
-                    print(f"current_dir Dir: {current_dir}")
-                    if current_dir == 'Thumbnail':
-                        last_dir = os.path.basename(os.path.dirname(root))  # Use parent dir
-                        last_dir = os.path.basename(os.path.dirname(root))  # name
-                        last_dir_path = os.path.dirname(root)               # full path
-                    else:
-                        last_dir = current_dir
-                        last_dir_path = root
-                    print(f"check_target_file Dir: {last_dir}")
-                    check_target = extract_astro_name_from_folder(last_dir)
-                    if not check_target:
-                        print(f"check_target_file Dir: {last_dir_path}")
-                        check_target = extract_target_json(last_dir_path)
-
-                    print(f"check_target: {check_target}")
-                    if check_target:
-                        if not found_data:
-                            print(f"not found_data")
-                            if astro_name == "RESTACKED":
-                                astro_object_id, new = insert_astro_object(conn, check_target)
-                                if not astro_object_id:
-                                    break
-                                if new:
-                                    print_log(f"add astro object : {check_target}",log)
-                                else:
-                                    print_log(f"use astro object : {check_target}",log)
-                                found_data = True
-                            else: # use Main AstroDir Name
-                                print(f"astro_object_id {astro_name}")
-                                astro_object_id, new = insert_astro_object(conn, astro_name)
-                                if not astro_object_id:
-                                    print(f"not astro_object_id")
-                                    break
-                                if new:
-                                    print_log(f"add astro object : {astro_name}",log)
-                                else:
-                                    print_log(f"use astro object : {astro_name}",log)
-                                found_data = True
-                        print_log(f"📂 Processing session folder (deep):\n {os.path.dirname(last_dir_path)}",log)
-                        print_log(f"📂 Session: {os.path.basename(last_dir_path)}",log)
-                        print(f"Processing session folder (deep): {last_dir_path}")
-                        new_added, data_ids = process_dwarf_folder(
-                            conn, backup_root, last_dir_path,
-                            astro_object_id, dwarf_id, backup_drive_id
-                        )
-                        total_added += new_added
-                        print(f"Added : {new_added}")
-                        if data_ids:
-                            if isinstance(data_ids, (list, tuple, set)):
-                                valid_ids.update(data_ids)
-                            else:
-                                valid_ids.add(data_ids)
-
-            if total_added - total_previous == 1:
-                print_log(f"📂 Found 1 new Session in {astro_dir}",log)
-            elif total_added != total_previous:
-                print_log(f"📂 Found {total_added - total_previous} new Sessions in {astro_dir}",log)
-            else:
-                print_log(f"📂 No new Session found in {astro_dir}",log)
+    except ftplib.all_errors as e:
+        print_log(f"❌ FTP Error: {e}", log)
+        close_db(conn)
+        return 0,0
 
-        if not found_data:
-            print_log(f"⚠️ Ignored unrecognized folder: {astro_dir}",log)
+    for session, entries in session_entries:
+        session_dir = session.split("/")[-1]
+        session_date = extract_session_datetime(session_dir)
+        if not session_date:
+            print_log(f"⚠️ Ignored unrecognized folder: {session}",log)
+            continue
 
-    if session_dir_main_dir :
-        # update scan date if modifications presents
-        if deleted or total_added:
-            set_dwarf_scan_date(conn, dwarf_id)
+        meta = metas.get(session, {})
+        astro_name = extract_astro_name_from_folder(session_dir) or meta.get("target")
+        if not astro_name:
+            print_log(f"⚠️ Ignored unrecognized folder: {session}",log)
+            continue
 
-    else:
-        # delete data that are not more present
-        if not backup_drive_id:
-            deleted = delete_notpresent_dwarf_entries_and_dwarf_data(conn, dwarf_id, valid_ids)
-            if deleted == 1:
-                print_log(f"📂 Deleted 1 entry in DB not more present",log)
-            elif deleted and deleted > 1:
-                print_log(f"📂 deleted {deleted} entries in DB not more present",log)
-            # update scan date if modifications presents
-            if deleted or total_added:
-                set_dwarf_scan_date(conn, dwarf_id)
-        else:
-            deleted = delete_notpresent_backup_entries_and_dwarf_data(conn, backup_drive_id, valid_ids)
-            if deleted == 1:
-                print_log(f"📂 Deleted 1 entry in DB not more present",log)
-            elif deleted and deleted > 1:
-                print_log(f"📂 deleted {deleted} entries in DB not more present",log)
-            # update scan date if modifications presents
-            if deleted or total_added:
-                set_backup_scan_date(conn, backup_drive_id)
+        astro_object_id, new = insert_astro_object(conn, astro_name)
+        if not astro_object_id:
+            break
+        if new:
+            print_log(f"add astro object : {astro_name}",log)
+
+        names = {entry["name"] for entry in entries if entry["type"] == "file"}
+        session_rel_dir = os.path.join(*session.split("/"))
+        thumbnail = os.path.join(session_rel_dir, "stacked_thumbnail.jpg") if "stacked_thumbnail.jpg" in names else None
+
+        stacked_name = next((name for name in sorted(names) if name.startswith("stacked") and name.endswith(".fits")), None)
+        stacked_path = f"{session}/{stacked_name}" if stacked_name else None
+        stacked_md5 = None
+        if stacked_name and dwarf_dir:
+            local_stacked = os.path.join(dwarf_dir, session_rel_dir, stacked_name)
+            if os.path.exists(local_stacked):
+                stacked_md5 = compute_md5(local_stacked)
+
+        session_added = 0
+        data_ids = set()
+        for entry in entries:
+            if entry["type"] != "file" or not entry["name"].lower().endswith(("stacked.jpg", "stacked.png")):
+                continue
+            dwarf_data_id, data_id = insert_DwarfData(conn, os.path.join(session_rel_dir, entry["name"]), entry["modify"], thumbnail, entry["size"],
+                meta.get('dec'), meta.get('ra'), meta.get('target'),
+                meta.get('binning'), meta.get('format'), meta.get('exp_time'),
+                meta.get('gain'), meta.get('shotsToTake'), meta.get('shotsTaken'),
+                meta.get('shotsStacked'), meta.get('ircut'), meta.get('maxTemp'), meta.get('minTemp'),
+                "0","0", 4, stacked_path, stacked_md5)
+            if dwarf_data_id:
+                new_id = insert_DwarfEntry(conn, dwarf_id, astro_object_id, dwarf_data_id, session_date.strftime("%Y-%m-%d %H:%M:%S.%f"), session_dir)
+                session_added += 1 if new_id != 0 else 0
+            if data_id:
+                valid_ids.add(data_id)
+                data_ids.add(data_id)
+
+        if data_ids:
+            dir_mtime, files, subdirs = ftp_session_listing(entries)
+            store_session_stats(conn, data_ids, session, dir_mtime, len(files), lambda: compute_session_stats(session, dir_mtime, files, subdirs))
+            if dwarf_dir:
+                # only the stacked files are mirrored: their headers give the exposure of restacked sessions
+                index_session_subframes(conn, data_ids, os.path.join(dwarf_dir, session_rel_dir))
+
+        if session_added:
+            print_log(f"📂 New Session: {session_dir}",log)
+            if dwarf_dir and new_sessions is not None:
+                new_sessions.append(os.path.join(dwarf_dir, session_rel_dir))
+        total_added += session_added
+
+    # delete data that are not more present
+    deleted = delete_notpresent_dwarf_entries_and_dwarf_data(conn, dwarf_id, valid_ids)
+    if deleted == 1:
+        print_log(f"📂 Deleted 1 entry in DB not more present",log)
+    elif deleted and deleted > 1:
+        print_log(f"📂 deleted {deleted} entries in DB not more present",log)
+    if deleted or total_added:
+        set_dwarf_scan_date(conn, dwarf_id)
 
     commit_db(conn)
     close_db(conn)
+    print_log(f"✅ FTP scan complete: {total_added} new sessions.", log)
     return total_added, deleted
-
@@ -1,17 +1,34 @@
+import os
+import hashlib
 import posixpath
 import socket
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 import asyncssh
 # Encoding changed to UTF-8
 log = logging.getLogger(__name__)
 
+SFTP_PORT = 22
+# Number of files uploaded at the same time on the SFTP connection
+SFTP_CONCURRENT_PUTS = 4
+SFTP_READ_CHUNK_SIZE = 256 * 1024
+# Same tolerance as the local copies (FAT 2 seconds resolution)
+SFTP_MTIME_TOLERANCE = 2
+
+def local_md5(path):
+    hash_md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        while chunk := f.read(SFTP_READ_CHUNK_SIZE):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
 @asynccontextmanager
-async def asyncssh_sftp_session(ip_address, username="root", password="rockchip"):
+async def asyncssh_sftp_session(ip_address, username="root", password="rockchip", port=SFTP_PORT):
     ssh = None
     sftp = None
     try:
-        ssh = await asyncssh.connect(ip_address, username=username, password=password, known_hosts=None)
+        ssh = await asyncssh.connect(ip_address, port=port, username=username, password=password, known_hosts=None)
         sftp = await ssh.start_sftp_client()
         yield sftp
     except (socket.timeout, EOFError, OSError) as e:
@@ -61,3 +78,162 @@ async def async_sftp_upload(ip_address, remote_file_path, local_file_path, creat
             except Exception as e:
                 log.error(f"SSH/SFTP async_sftp_upload failed: {e}")
                 raise
+
+class SftpTransferClient:
+    """
+    One SSH connection and SFTP client kept for a whole restore.
+    Remote directories are created level by level with concurrent requests and remembered,
+    files are uploaded with up to max_concurrent puts in flight.
+    """
+    def __init__(self, ip_address, username="root", password="rockchip", port=SFTP_PORT, max_concurrent=SFTP_CONCURRENT_PUTS):
+        self.ip_address = ip_address
+        self.username = username
+        self.password = password
+        self.port = port
+        self.max_concurrent = max_concurrent
+        self.session = None
+        self.sftp = None
+        self.known_dirs = set()
+
+    async def __aenter__(self):
+        self.session = asyncssh_sftp_session(self.ip_address, self.username, self.password, self.port)
+        self.sftp = await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.__aexit__(exc_type, exc, tb)
+        self.sftp = None
+
+    async def _check_dir(self, path):
+        try:
+            await self.sftp.stat(path)
+            return path, True
+        except asyncssh.SFTPNoSuchFile:
+            return path, False
+
+    async def _make_dir(self, path):
+        try:
+            print(f"SFTP Creating remote dir: {path}")
+            await self.sftp.mkdir(path)
+        except asyncssh.SFTPFailure:
+            # created in the meantime
+            if not await self.sftp.isdir(path):
+                raise
+
+    async def ensure_dirs(self, remote_dirs):
+        """Create all the missing remote_dirs (and parents), one batch of requests per depth level."""
+        wanted = set()
+        for dir_path in remote_dirs:
+            current = dir_path.rstrip("/")
+            while current and current != "/" and current not in self.known_dirs and current not in wanted:
+                wanted.add(current)
+                current = posixpath.dirname(current)
+
+        levels = {}
+        for dir_path in wanted:
+            levels.setdefault(dir_path.count("/"), []).append(dir_path)
+
+        created = set()
+        for depth in sorted(levels):
+            paths = levels[depth]
+            # below a dir just created nothing exists yet, the other ones are checked
+            missing = [path for path in paths if posixpath.dirname(path) in created]
+            to_check = [path for path in paths if posixpath.dirname(path) not in created]
+            checks = await asyncio.gather(*(self._check_dir(path) for path in to_check))
+            missing += [path for path, exists in checks if not exists]
+            await asyncio.gather(*(self._make_dir(path) for path in missing))
+            created.update(missing)
+            self.known_dirs.update(paths)
+
+    async def put(self, local_path, remote_path):
+        # keep the local modification time, the next delta restore compares it
+        await self.sftp.put(local_path, remote_path, preserve=True)
+
+    async def remote_files(self, remote_root):
+        """
+        Size and mtime of all the files below remote_root: {remote_path: (size, mtime)}.
+        Each directory is read with one readdir (attributes included), sub directories concurrently.
+        """
+        result = {}
+
+        async def read_dir(path):
+            try:
+                entries = await self.sftp.readdir(path)
+            except asyncssh.SFTPNoSuchFile:
+                return
+            sub_dirs = []
+            for entry in entries:
+                if entry.filename in (".", ".."):
+                    continue
+                entry_path = posixpath.join(path, entry.filename)
+                if entry.attrs.type == asyncssh.FILEXFER_TYPE_DIRECTORY:
+                    sub_dirs.append(entry_path)
+                    self.known_dirs.add(entry_path)
+                else:
+                    result[entry_path] = (entry.attrs.size, entry.attrs.mtime)
+            await asyncio.gather(*(read_dir(sub_dir) for sub_dir in sub_dirs))
+
+        await read_dir(remote_root)
+        return result
+
+    async def remote_md5(self, remote_path):
+        hash_md5 = hashlib.md5()
+        async with self.sftp.open(remote_path, "rb") as f:
+            while chunk := await f.read(SFTP_READ_CHUNK_SIZE):
+                hash_md5.update(chunk)
+        return hash_md5.hexdigest()
+
+    async def plan_delta(self, all_files, check_digest=False):
+        """
+        Split all_files [(local_path, remote_path)] in the files to upload and the files the Dwarf
+        already has: same size and mtime (2 seconds tolerance), and same md5 when check_digest is set.
+        """
+        if not all_files:
+            return [], []
+        remote_root = posixpath.commonpath([posixpath.dirname(remote_path) for _, remote_path in all_files])
+        remote = await self.remote_files(remote_root)
+
+        to_upload = []
+        skipped = []
+        for local_path, remote_path in all_files:
+            remote_attrs = remote.get(remote_path)
+            local_stat = os.stat(local_path)
+            if (remote_attrs and remote_attrs[0] == local_stat.st_size and remote_attrs[1] is not None
+                    and abs(remote_attrs[1] - int(local_stat.st_mtime)) <= SFTP_MTIME_TOLERANCE):
+                if not check_digest or await self.remote_md5(remote_path) == local_md5(local_path):
+                    skipped.append((local_path, remote_path))
+                    continue
+            to_upload.append((local_path, remote_path))
+        return to_upload, skipped
+
+    async def upload_files(self, all_files, progress=None, cancel=None):
+        """
+        Upload all_files [(local_path, remote_path)].
+        progress(done_files, total_files) is called after each file, cancel() is checked before each file.
+        Return the list of files not uploaded.
+        """
+        await self.ensure_dirs({posixpath.dirname(remote_path) for _, remote_path in all_files})
+
+        total_files = len(all_files)
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        failed = []
+        done = 0
+
+        async def upload(local_path, remote_path):
+            nonlocal done
+            async with semaphore:
+                if cancel and cancel():
+                    failed.append((local_path, remote_path))
+                    return
+                try:
+                    await self.put(local_path, remote_path)
+                except (socket.timeout, EOFError, OSError, asyncssh.Error) as e:
+                    log.error(f"SFTP upload of {local_path} failed: {e}")
+                    failed.append((local_path, remote_path))
+                    return
+                done += 1
+                if progress:
+                    progress(done, total_files)
+
+        await asyncio.gather(*(upload(local_path, remote_path) for local_path, remote_path in all_files))
+        return failed
@@ -0,0 +1,174 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+
+from api.dwarf_backup_fct import get_app_data_dir, win_long_path
+
+JOURNAL_DIR = "Transfers"
+COPY_CHUNK_SIZE = 1024 * 1024
+# FAT formatted drives only keep the modification time with a 2 seconds resolution
+MTIME_TOLERANCE = 2
+
+def file_signature(path):
+    """Return (size, mtime) of a local file or None if it is not reachable."""
+    try:
+        st = os.stat(win_long_path(path))
+        return st.st_size, int(st.st_mtime)
+    except OSError:
+        return None
+
+def same_signature(sig_a, sig_b):
+    if not sig_a or not sig_b:
+        return False
+    return sig_a[0] == sig_b[0] and abs(sig_a[1] - sig_b[1]) <= MTIME_TOLERANCE
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def copy_file_with_digest(src_file, dest_file):
+    """
+    Copy src_file to dest_file (metadata included) and return the sha256 of the copied data.
+    Data is first written to a .part file, so an interrupted copy never looks complete, and the .part file
+    only gets its final name once the sha256 of what was written matches the source.
+    Raise OSError on a mismatch.
+    """
+    src_long = win_long_path(src_file)
+    dest_long = win_long_path(dest_file)
+    part_file = dest_long + ".part"
+    os.makedirs(os.path.dirname(dest_long), exist_ok=True)
+
+    digest = hashlib.sha256()
+    with open(src_long, 'rb') as fsrc, open(part_file, 'wb') as fdst:
+        while chunk := fsrc.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+            fdst.write(chunk)
+        # on the drive before it is read back
+        fdst.flush()
+        os.fsync(fdst.fileno())
+
+    if file_digest(part_file) != digest.hexdigest():
+        os.remove(part_file)
+        raise OSError(f"Checksum mismatch after copy: {src_file}")
+    shutil.copystat(src_long, part_file)
+    os.replace(part_file, dest_long)
+
+    return digest.hexdigest()
+
+class TransferJournal:
+    """
+    Per-transfer manifest stored on disk as JSON lines.
+    The first line describes the transfer, every next line is a planned or a verified file.
+    Replaying the lines gives the state of each file, so a cancelled or crashed transfer
+    resumes where it stopped and unchanged files are never copied twice.
+    """
+    def __init__(self, src_dir, dest_dir, journal_dir = None):
+        self.src_dir = os.path.normpath(src_dir)
+        self.dest_dir = os.path.normpath(dest_dir)
+        self.journal_dir = journal_dir or get_app_data_dir(JOURNAL_DIR)
+        key = hashlib.md5(f"{self.src_dir}|{self.dest_dir}".encode("utf-8")).hexdigest()
+        self.path = os.path.join(self.journal_dir, f"{key}.jsonl")
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # last line may be truncated after a crash
+                        continue
+                    if record.get("type") == "file":
+                        self.entries[record["rel"]] = record
+        except Exception as e:
+            print(f"Error reading transfer journal {self.path}: {e}")
+            self.entries = {}
+
+    def _append(self, records):
+        with self.lock:
+            new_file = not os.path.exists(self.path)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if new_file:
+                    f.write(json.dumps(self._header()) + "\n")
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+                    self.entries[record["rel"]] = record
+
+    def _header(self):
+        return {
+            "type": "transfer",
+            "src": self.src_dir,
+            "dest": self.dest_dir,
+            "created": datetime.now().isoformat(sep=' ', timespec='seconds')
+        }
+
+    def rel_path(self, src_file):
+        return os.path.relpath(src_file, self.src_dir).replace("\\", "/")
+
+    def is_done(self, src_file, dest_file, src_sig = None):
+        """A file is done when the destination still matches the source (size and mtime)."""
+        src_sig = src_sig or file_signature(src_file)
+        dest_sig = file_signature(dest_file)
+        if not same_signature(src_sig, dest_sig):
+            return False
+
+        entry = self.entries.get(self.rel_path(src_file))
+        if entry and entry.get("status") == "done":
+            return same_signature(src_sig, (entry.get("size"), entry.get("mtime", 0)))
+
+        # Copied before the journal existed (or by another tool): same size and mtime is enough
+        return True
+
+    def plan(self, all_files):
+        """
+        Split all_files [(src, dest)] in the files to copy and the files already up to date.
+        The planned files are written in the journal.
+        """
+        to_copy = []
+        skipped = []
+        records = []
+        for src_file, dest_file in all_files:
+            src_sig = file_signature(src_file)
+            if self.is_done(src_file, dest_file, src_sig):
+                skipped.append((src_file, dest_file))
+                continue
+            to_copy.append((src_file, dest_file))
+            size, mtime = src_sig if src_sig else (None, None)
+            records.append({"type": "file", "rel": self.rel_path(src_file), "size": size, "mtime": mtime, "status": "planned"})
+
+        if records:
+            self._append(records)
+        return to_copy, skipped
+
+    def record_done(self, src_file, digest = None):
+        src_sig = file_signature(src_file)
+        size, mtime = src_sig if src_sig else (None, None)
+        self._append([{"type": "file", "rel": self.rel_path(src_file), "size": size, "mtime": mtime, "digest": digest, "status": "done"}])
+
+    def pending(self):
+        return [rel for rel, entry in self.entries.items() if entry.get("status") != "done"]
+
+    def compact(self):
+        """Rewrite the journal with only the last state of each file."""
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps(self._header()) + "\n")
+                    for entry in self.entries.values():
+                        f.write(json.dumps(entry) + "\n")
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"Error compacting transfer journal {self.path}: {e}")
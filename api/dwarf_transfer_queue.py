@@ -0,0 +1,397 @@
+import os
+import json
+import uuid
+import asyncio
+import threading
+from datetime import datetime
+
+from api.dwarf_backup_fct import get_app_data_dir, scan_backup_folder
+from api.dwarf_backup_db import DB_NAME
+from api.dwarf_transfer_journal import TransferJournal, copy_file_with_digest
+from api.dwarf_backup_fct_ftp import download_ftp_tree, ftp_download_files_parallel, invalidate_ftp_cache
+from api.dwarf_backup_fct_sftp import SftpTransferClient
+
+QUEUE_FILE = "transfer_queue.json"
+
+TRANSPORT_USB = "USB"
+TRANSPORT_FTP = "FTP"
+TRANSPORT_SFTP = "SFTP"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_FINISHED = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {PRIORITY_HIGH: "High", PRIORITY_NORMAL: "Normal", PRIORITY_LOW: "Low"}
+
+# Only one transfer at a time on the same Dwarf or drive, parallel copies on the same medium are slower
+MAX_JOBS_PER_DEVICE = 1
+# Dwarf SD card path used by SFTP restore
+SFTP_BASE_PATH = "/mnt/sdcard"
+
+def device_key(transport, path, ip_address = None):
+    """Name of the device a transfer end point is on (Dwarf IP address or drive)."""
+    if transport in (TRANSPORT_FTP, TRANSPORT_SFTP) and ip_address:
+        return f"{transport.lower()}://{ip_address}"
+    path = os.path.abspath(path)
+    drive, tail = os.path.splitdrive(path)
+    if drive:
+        return drive.upper()
+    # posix: mount point of the drive (/media/user/DISK), the destination may not exist yet
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+class TransferJob:
+    def __init__(self, mode, transport, src_dir, dest_dir, priority = PRIORITY_NORMAL, ip_address = None, scans = None, label = None, job_id = None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.mode = mode  # "Archive" or "Restore"
+        self.transport = transport
+        self.src_dir = src_dir
+        self.dest_dir = dest_dir
+        self.priority = priority
+        self.ip_address = ip_address
+        # scan_backup_folder arguments (without db_name) to run once the files are copied
+        self.scans = scans or []
+        self.label = label or os.path.basename(os.path.normpath(src_dir))
+        self.status = JOB_QUEUED
+        self.message = ""
+        self.created = datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.started = None
+        self.ended = None
+        self.total_files = 0
+        self.done_files = 0
+        self.skipped_files = 0
+        self.cancel_requested = False
+
+    @property
+    def src_device(self):
+        if self.transport == TRANSPORT_FTP and self.mode == "Archive":
+            return device_key(self.transport, self.src_dir, self.ip_address)
+        return device_key(TRANSPORT_USB, self.src_dir)
+
+    @property
+    def dest_device(self):
+        if self.transport == TRANSPORT_SFTP and self.mode == "Restore":
+            return device_key(self.transport, self.dest_dir, self.ip_address)
+        return device_key(TRANSPORT_USB, self.dest_dir)
+
+    @property
+    def devices(self):
+        return {self.src_device, self.dest_device}
+
+    @property
+    def progress(self):
+        if self.status == JOB_DONE:
+            return 100
+        if not self.total_files:
+            return 0
+        return round(self.done_files / self.total_files * 100)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "transport": self.transport,
+            "src_dir": self.src_dir,
+            "dest_dir": self.dest_dir,
+            "priority": self.priority,
+            "ip_address": self.ip_address,
+            "scans": self.scans,
+            "label": self.label,
+            "status": self.status,
+            "message": self.message,
+            "created": self.created,
+            "started": self.started,
+            "ended": self.ended,
+            "total_files": self.total_files,
+            "done_files": self.done_files,
+            "skipped_files": self.skipped_files
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["mode"], data["transport"], data["src_dir"], data["dest_dir"],
+                  priority = data.get("priority", PRIORITY_NORMAL), ip_address = data.get("ip_address"),
+                  scans = data.get("scans"), label = data.get("label"), job_id = data.get("id"))
+        for key in ("status", "message", "created", "started", "ended", "total_files", "done_files", "skipped_files"):
+            if key in data:
+                setattr(job, key, data[key])
+        return job
+
+class TransferQueue:
+    """
+    Application wide transfer queue, independent of the pages.
+    Jobs are saved in the app data dir, a job interrupted by closing the application
+    is queued again at the next start and resumes thanks to its transfer journal.
+    """
+    def __init__(self, queue_file = None, max_per_device = MAX_JOBS_PER_DEVICE):
+        self.queue_file = queue_file or os.path.join(get_app_data_dir(), QUEUE_FILE)
+        self.max_per_device = max_per_device
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.wakeup = None
+        self.scheduler_task = None
+        self.running_tasks = {}
+        self.stopping = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.queue_file):
+            return
+        try:
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.jobs = [TransferJob.from_dict(item) for item in data.get("jobs", [])]
+            for job in self.jobs:
+                if job.status == JOB_RUNNING:
+                    job.status = JOB_QUEUED
+                    job.message = "Resumed after restart"
+        except Exception as e:
+            print(f"Error reading transfer queue {self.queue_file}: {e}")
+            self.jobs = []
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.queue_file + ".tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"jobs": [job.to_dict() for job in self.jobs]}, f, indent=2)
+                os.replace(tmp_path, self.queue_file)
+            except Exception as e:
+                print(f"Error saving transfer queue {self.queue_file}: {e}")
+
+    def start(self):
+        """Start the scheduler, must be called from the running event loop (app startup)."""
+        if self.scheduler_task and not self.scheduler_task.done():
+            return
+        self.wakeup = asyncio.Event()
+        self.scheduler_task = asyncio.create_task(self._scheduler())
+
+    async def stop(self):
+        self.stopping = True
+        for job in self.jobs:
+            if job.status == JOB_RUNNING:
+                job.cancel_requested = True
+        if self.scheduler_task:
+            self.scheduler_task.cancel()
+        self.save()
+
+    def _notify(self):
+        if self.wakeup:
+            self.wakeup.set()
+
+    def add_job(self, mode, transport, src_dir, dest_dir, priority = PRIORITY_NORMAL, ip_address = None, scans = None, label = None):
+        for job in self.jobs:
+            if job.status in (JOB_QUEUED, JOB_RUNNING) and job.src_dir == src_dir and job.dest_dir == dest_dir:
+                print(f"⚠️ Transfer already queued: {src_dir} ➜ {dest_dir}")
+                return job
+
+        job = TransferJob(mode, transport, src_dir, dest_dir, priority, ip_address, scans, label)
+        self.jobs.append(job)
+        self.save()
+        self._notify()
+        return job
+
+    def get_job(self, job_id):
+        return next((job for job in self.jobs if job.id == job_id), None)
+
+    def cancel_job(self, job_id):
+        job = self.get_job(job_id)
+        if not job:
+            return False
+        if job.status == JOB_QUEUED:
+            job.status = JOB_CANCELLED
+            job.ended = datetime.now().isoformat(sep=' ', timespec='seconds')
+            self.save()
+        elif job.status == JOB_RUNNING:
+            job.cancel_requested = True
+        return True
+
+    def retry_job(self, job_id):
+        job = self.get_job(job_id)
+        if job and job.status in (JOB_FAILED, JOB_CANCELLED):
+            job.status = JOB_QUEUED
+            job.message = ""
+            job.cancel_requested = False
+            self.save()
+            self._notify()
+
+    def set_priority(self, job_id, priority):
+        job = self.get_job(job_id)
+        if job and job.status == JOB_QUEUED:
+            job.priority = priority
+            self.save()
+            self._notify()
+
+    def clear_finished(self):
+        self.jobs = [job for job in self.jobs if job.status not in JOB_FINISHED]
+        self.save()
+
+    def counts(self):
+        result = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0, JOB_CANCELLED: 0}
+        for job in self.jobs:
+            result[job.status] = result.get(job.status, 0) + 1
+        return result
+
+    def next_jobs(self):
+        """Queued jobs that can start now: by priority then age, within the per device limit."""
+        busy = {}
+        for job in self.jobs:
+            if job.status == JOB_RUNNING:
+                for device in job.devices:
+                    busy[device] = busy.get(device, 0) + 1
+
+        ready = []
+        for job in sorted((job for job in self.jobs if job.status == JOB_QUEUED), key=lambda job: (job.priority, job.created)):
+            if all(busy.get(device, 0) < self.max_per_device for device in job.devices):
+                ready.append(job)
+                for device in job.devices:
+                    busy[device] = busy.get(device, 0) + 1
+        return ready
+
+    async def _scheduler(self):
+        while True:
+            self.wakeup.clear()
+            for job in self.next_jobs():
+                job.status = JOB_RUNNING
+                job.started = datetime.now().isoformat(sep=' ', timespec='seconds')
+                self.running_tasks[job.id] = asyncio.create_task(self._run_job(job))
+            self.save()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_job(self, job):
+        job.cancel_requested = False
+        job.message = "Listing files..."
+        try:
+            if job.transport == TRANSPORT_FTP and job.mode == "Archive":
+                result = await asyncio.to_thread(self._run_ftp_download, job)
+            elif job.transport == TRANSPORT_SFTP and job.mode == "Restore":
+                result = await self._run_sftp_upload(job)
+            else:
+                result = await asyncio.to_thread(self._run_local_copy, job)
+
+            if self.stopping:
+                # still running when the application closed: resumed at the next start
+                return
+            if job.cancel_requested:
+                job.status = JOB_CANCELLED
+                job.message = f"Cancelled after {job.done_files}/{job.total_files} files"
+            elif result:
+                job.message = "Scanning..."
+                for scan_args in job.scans:
+                    await asyncio.to_thread(scan_backup_folder, DB_NAME, *scan_args)
+                job.status = JOB_DONE
+                job.message = f"✅ {job.done_files} files copied, {job.skipped_files} unchanged"
+            else:
+                job.status = JOB_FAILED
+
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.message = f"❌ {e}"
+            print(f"❌ Transfer {job.label} failed: {e}")
+
+        job.ended = datetime.now().isoformat(sep=' ', timespec='seconds')
+        self.running_tasks.pop(job.id, None)
+        self.save()
+        self._notify()
+
+    def _run_local_copy(self, job):
+        all_files = []
+        for root, _, files in os.walk(job.src_dir):
+            for file in files:
+                src_path = os.path.join(root, file)
+                all_files.append((src_path, os.path.join(job.dest_dir, os.path.relpath(src_path, job.src_dir))))
+
+        journal = TransferJournal(job.src_dir, job.dest_dir)
+        to_copy, skipped = journal.plan(all_files)
+        job.total_files = len(to_copy)
+        job.skipped_files = len(skipped)
+        job.done_files = 0
+        job.message = "Copying..."
+
+        for src_file, dest_file in to_copy:
+            if job.cancel_requested:
+                return False
+            digest = copy_file_with_digest(src_file, dest_file)
+            if os.path.getsize(src_file) != os.path.getsize(dest_file):
+                job.message = f"❌ Size mismatch after copy: {src_file}"
+                return False
+            journal.record_done(src_file, digest)
+            job.done_files += 1
+
+        journal.compact()
+        return True
+
+    def _run_ftp_download(self, job):
+        all_files = download_ftp_tree(job.ip_address, job.src_dir, job.dest_dir)
+        job.total_files = len(all_files)
+        job.done_files = 0
+        job.message = "Downloading..."
+        if not all_files:
+            job.message = "❌ No files found on the Dwarf"
+            return False
+
+        def on_progress(done_files, total_files, nb_bytes):
+            job.done_files = done_files
+
+        failed = ftp_download_files_parallel(job.ip_address, all_files, progress=on_progress, cancel=lambda: job.cancel_requested)
+        if failed and not job.cancel_requested:
+            job.message = f"❌ {len(failed)} files could not be downloaded"
+        return not failed
+
+    async def _run_sftp_upload(self, job):
+        all_files = []
+        for root, _, files in os.walk(job.src_dir):
+            for file in files:
+                src_path = os.path.join(root, file)
+                rel_path = os.path.relpath(src_path, job.src_dir).replace("\\", "/")
+                all_files.append((src_path, f'{SFTP_BASE_PATH}{job.dest_dir.rstrip("/")}/{rel_path}'))
+        job.total_files = len(all_files)
+        job.done_files = 0
+        job.message = "Uploading..."
+
+        def on_progress(done_files, total_files):
+            job.done_files = done_files
+
+        async with SftpTransferClient(job.ip_address) as client:
+            # only the files missing or different on the Dwarf are sent
+            to_upload, skipped = await client.plan_delta(all_files)
+            job.total_files = len(to_upload)
+            job.skipped_files = len(skipped)
+            failed = await client.upload_files(to_upload, progress=on_progress, cancel=lambda: job.cancel_requested)
+        if failed:
+            if not job.cancel_requested:
+                job.message = f"❌ {len(failed)} files could not be uploaded"
+            return False
+        invalidate_ftp_cache(job.ip_address, job.dest_dir)
+        return True
+
+_transfer_queue = None
+_transfer_queue_lock = threading.Lock()
+
+def get_transfer_queue():
+    """Application transfer queue, created with its saved jobs on first use."""
+    global _transfer_queue
+    with _transfer_queue_lock:
+        if _transfer_queue is None:
+            _transfer_queue = TransferQueue()
+        return _transfer_queue
+
+def start_transfer_queue():
+    get_transfer_queue().start()
+
+async def stop_transfer_queue():
+    if _transfer_queue is not None:
+        await _transfer_queue.stop()
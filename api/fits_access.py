@@ -0,0 +1,127 @@
+# fits_access.py
+
+import numpy as np
+from astropy.io import fits
+
+# Sections are read with at least this factor over the preview size, the area resize does the rest
+FITS_SECTION_OVERSAMPLE = 2
+FITS_BLOCK_SIZE = 2880
+FITS_CARD_SIZE = 80
+# a header longer than this is not a Dwarf frame, stop reading
+FITS_MAX_HEADER_BLOCKS = 64
+
+def read_fits_header(fits_path, hdu=0):
+    """Header only, the data blocks are not read."""
+    return fits.getheader(fits_path, hdu)
+
+def read_fits_keyword(fits_path, keyword, default=None):
+    return read_fits_header(fits_path).get(keyword, default)
+
+def parse_card_value(text):
+    text = text.strip()
+    if text.startswith("'"):
+        # string, '' is an escaped quote
+        value = []
+        i = 1
+        while i < len(text):
+            if text[i] == "'":
+                if text[i + 1:i + 2] == "'":
+                    value.append("'")
+                    i += 2
+                    continue
+                break
+            value.append(text[i])
+            i += 1
+        return "".join(value).rstrip()
+
+    value = text.split("/", 1)[0].strip()
+    if value in ("T", "F"):
+        return value == "T"
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value.replace("D", "E"))
+    except ValueError:
+        return value or None
+
+def read_fits_header_blocks(fits_path, keywords=None):
+    """(values, header_size) of the primary header, read block by block until the END card."""
+    values = {}
+    with open(fits_path, "rb") as f:
+        for block_index in range(FITS_MAX_HEADER_BLOCKS):
+            block = f.read(FITS_BLOCK_SIZE)
+            if len(block) < FITS_BLOCK_SIZE:
+                raise ValueError(f"Truncated FITS header: {fits_path}")
+            for i in range(0, FITS_BLOCK_SIZE, FITS_CARD_SIZE):
+                card = block[i:i + FITS_CARD_SIZE].decode("ascii", "replace")
+                key = card[:8].rstrip()
+                if key == "END":
+                    return values, (block_index + 1) * FITS_BLOCK_SIZE
+                if card[8:10] == "= " and (keywords is None or key in keywords):
+                    values[key] = parse_card_value(card[10:])
+    raise ValueError(f"No END card in FITS header: {fits_path}")
+
+def read_fits_header_fast(fits_path, keywords=None):
+    """
+    Values of the primary header read straight from the 2880 bytes header blocks (no astropy, data never touched).
+    Only the keywords given are parsed when keywords is set.
+    """
+    return read_fits_header_blocks(fits_path, keywords)[0]
+
+FITS_BITPIX_DTYPES = {8: ">u1", 16: ">i2", 32: ">i4", -32: ">f4", -64: ">f8"}
+FITS_MEMMAP_KEYS = {"BITPIX", "NAXIS", "NAXIS1", "NAXIS2", "NAXIS3", "BSCALE", "BZERO"}
+
+def open_fits_memmap(fits_path):
+    """
+    (raw, bscale, bzero): read-only memory map of the unscaled primary image, without astropy (cheap to open
+    for hundreds of frames). raw is (NAXIS2, NAXIS1) or (NAXIS3, NAXIS2, NAXIS1).
+    """
+    header, header_size = read_fits_header_blocks(fits_path, FITS_MEMMAP_KEYS)
+    dtype = FITS_BITPIX_DTYPES.get(header.get("BITPIX"))
+    naxis = header.get("NAXIS", 0)
+    if dtype is None or naxis not in (2, 3):
+        raise ValueError(f"Unsupported FITS image {fits_path}: BITPIX {header.get('BITPIX')}, NAXIS {naxis}")
+    shape = tuple(header[f"NAXIS{axis}"] for axis in range(naxis, 0, -1))
+    raw = np.memmap(fits_path, dtype=dtype, mode="r", offset=header_size, shape=shape)
+    return raw, float(header.get("BSCALE", 1)), float(header.get("BZERO", 0))
+
+def fits_section_step(shape, max_size):
+    if not max_size:
+        return 1
+    return max(1, max(shape[-2:]) // (max_size * FITS_SECTION_OVERSAMPLE))
+
+def read_fits_section(fits_path, max_size=None):
+    """
+    Image data of the primary HDU as float32, with BSCALE/BZERO applied: (data, header).
+    The file is memory mapped and, when max_size is given, only every n-th row/column is read
+    so that the result is still at least FITS_SECTION_OVERSAMPLE * max_size wide.
+    2D frames keep their 2x2 Bayer cells so they can still be debayered.
+    """
+    with fits.open(fits_path, memmap=True, do_not_scale_image_data=True) as hdul:
+        header = hdul[0].header
+        raw = hdul[0].data
+        if raw is None:
+            raise ValueError("FITS file has no data")
+        raw = raw.squeeze()
+        step = fits_section_step(raw.shape, max_size)
+
+        if raw.ndim == 2 and step > 1:
+            cells = [raw[row::2 * step, col::2 * step] for row in (0, 1) for col in (0, 1)]
+            height = min(cell.shape[0] for cell in cells)
+            width = min(cell.shape[1] for cell in cells)
+            data = np.empty((2 * height, 2 * width), dtype=np.float32)
+            data[0::2, 0::2], data[0::2, 1::2], data[1::2, 0::2], data[1::2, 1::2] = (cell[:height, :width] for cell in cells)
+        elif raw.ndim == 3:
+            data = np.array(raw[:, ::step, ::step], dtype=np.float32)
+        else:
+            data = np.array(raw, dtype=np.float32)
+
+    bscale = float(header.get("BSCALE", 1))
+    bzero = float(header.get("BZERO", 0))
+    if bscale != 1:
+        data *= bscale
+    if bzero != 0:
+        data += bzero
+    return data, header
@@ -0,0 +1,130 @@
+# frame_quality.py
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+import numpy as np
+
+from api.dwarf_backup_db import connect_db, close_db
+from api.dwarf_backup_db_api import get_subframes, set_subframe_quality
+from api.dwarf_backup_fct import print_log
+from api.fits_access import read_fits_section
+from api.preview_pregen import lower_process_priority
+
+QUALITY_WORKERS = os.cpu_count() or 1
+# Frames are analyzed on memory mapped sections of at least 2x this size, as 2x2 superpixels
+QUALITY_MAX_SIZE = 2048
+# Star detection threshold over the background, in noise sigma
+QUALITY_DETECTION_SIGMA = 5
+QUALITY_MIN_STAR_AREA = 3
+QUALITY_MAX_STAR_AREA = 400
+# Elongated blobs (satellite trails, hot columns) are not stars
+QUALITY_MAX_STAR_ELONGATION = 3
+# Stars close to the frame maximum are saturated, their FWHM is meaningless
+QUALITY_SATURATION = 0.9
+
+def load_luminance(fits_path):
+    """(luminance, scale): luminance as float32 superpixels, scale is the size of one of its pixels in frame pixels."""
+    data, header = read_fits_section(fits_path, QUALITY_MAX_SIZE)
+    if data.ndim == 3:
+        luminance = data.mean(axis=0)
+    else:
+        height, width = data.shape[0] // 2 * 2, data.shape[1] // 2 * 2
+        data = data[:height, :width]
+        luminance = (data[0::2, 0::2] + data[0::2, 1::2] + data[1::2, 0::2] + data[1::2, 1::2]) * 0.25
+    frame_width = header.get("NAXIS1") or luminance.shape[1]
+    return np.ascontiguousarray(luminance, dtype=np.float32), frame_width / luminance.shape[1]
+
+def measure_frame(luminance, scale=1):
+    """(background, noise, star_count, fwhm) of a luminance image, fwhm in frame pixels (None without usable star)."""
+    sample = luminance[::2, ::2]
+    background = float(np.median(sample))
+    noise = float(1.4826 * np.median(np.abs(sample - background)))
+    if noise <= 0:
+        return background, noise, 0, None
+
+    signal = luminance - background
+    threshold = QUALITY_DETECTION_SIGMA * noise
+    mask = cv2.GaussianBlur(signal, (3, 3), 0) > threshold
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask.view(np.uint8), connectivity=8)
+
+    areas = stats[:, cv2.CC_STAT_AREA]
+    widths = stats[:, cv2.CC_STAT_WIDTH]
+    heights = stats[:, cv2.CC_STAT_HEIGHT]
+    elongation = np.maximum(widths, heights) / np.maximum(1, np.minimum(widths, heights))
+    stars = (areas >= QUALITY_MIN_STAR_AREA) & (areas <= QUALITY_MAX_STAR_AREA) & (elongation <= QUALITY_MAX_STAR_ELONGATION)
+    stars[0] = False
+    star_count = int(stars.sum())
+    if not star_count:
+        return background, noise, 0, None
+
+    # peak and half maximum area of each component, only on the detected pixels
+    ids = labels[mask]
+    values = signal[mask]
+    peaks = np.zeros(count, dtype=np.float32)
+    np.maximum.at(peaks, ids, values)
+    half_areas = np.bincount(ids[values >= peaks[ids] * 0.5], minlength=count)
+
+    # the half maximum must be above the detection threshold to be inside the component
+    usable = stars & (peaks >= 2 * threshold) & (peaks < QUALITY_SATURATION * (float(luminance.max()) - background))
+    if not usable.any():
+        return background, noise, star_count, None
+    fwhm = 2 * np.sqrt(half_areas[usable] / np.pi)
+    return background, noise, star_count, float(np.median(fwhm) * scale)
+
+def analyze_frame(fits_path):
+    """Worker task: quality values of one frame."""
+    luminance, scale = load_luminance(fits_path)
+    return measure_frame(luminance, scale)
+
+def analyze_session_quality(db_name, dwarf_data_id, session_dir, log=None, cancel=None, max_workers=QUALITY_WORKERS, force=False):
+    """
+    Measure background, noise, star count and FWHM of the FITS sub-frames of a session on a pool of low priority processes
+    and store them in the SubFrame index. Frames already analyzed and unchanged are skipped unless force is set.
+    Return (analyzed, failed).
+    """
+    conn = connect_db(db_name)
+    try:
+        frames = get_subframes(conn, dwarf_data_id, ("light", "failed"))
+        frames = [frame for frame in frames if frame["format"] == "fits" and (force or frame["quality_mtime"] != frame["modification_time"])]
+        if not frames:
+            print_log("✅ All frames already analyzed", log)
+            return 0, 0
+
+        total = len(frames)
+        print_log(f"🔬 Analyzing {total} frames with {max_workers} workers", log)
+        analyzed = 0
+        failed = 0
+        results = []
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=lower_process_priority)
+        try:
+            running = {executor.submit(analyze_frame, os.path.join(session_dir, frame["file_name"])): frame for frame in frames}
+            while running:
+                if cancel and cancel():
+                    print_log(f"⛔ Analysis cancelled, {len(running)} frames skipped", log)
+                    break
+                done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    frame = running.pop(future)
+                    try:
+                        results.append((frame["file_name"], *future.result(), frame["modification_time"]))
+                        analyzed += 1
+                    except Exception as e:
+                        print(f"❌ Quality analysis failed for {frame['file_name']}: {e}")
+                        failed += 1
+                    if (analyzed + failed) % 10 == 0 or not running:
+                        print_log(f"🔬 Frames {analyzed + failed}/{total}", log)
+        except BrokenProcessPool as e:
+            print_log(f"❌ Analysis workers stopped: {e}", log)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        # the finished frames are kept even when cancelled
+        set_subframe_quality(conn, dwarf_data_id, results)
+        print_log(f"✅ {analyzed} frames analyzed" + (f", {failed} failed" if failed else ""), log)
+        return analyzed, failed
+    finally:
+        close_db(conn)
@@ -0,0 +1,74 @@
+# object_search.py
+
+import re
+import html
+from collections import defaultdict
+
+# Texts are compared without case, spaces and punctuation: "m31", "M 31" and "M-31" are the same
+SEARCH_IGNORED = re.compile(r"[\W_]+")
+SEARCH_GRAM_SIZE = 3
+
+def search_key(text):
+    return SEARCH_IGNORED.sub("", (text or "").lower())
+
+def match_pattern(query):
+    """Regex finding query in a displayed text, spaces and punctuation allowed between its characters. None for an empty query."""
+    key = search_key(query)
+    if not key:
+        return None
+    return re.compile(r"[\W_]*".join(re.escape(char) for char in key), re.IGNORECASE)
+
+def highlight_match(text, pattern):
+    """Escaped HTML of text with the first match of pattern in <mark>, None when it doesn't match."""
+    match = pattern.search(text) if pattern else None
+    if not match:
+        return None
+    return f"{html.escape(text[:match.start()])}<mark>{html.escape(match.group())}</mark>{html.escape(text[match.end():])}"
+
+class ObjectSearchIndex:
+    """
+    In memory search over the objects of the explore page, built once per load.
+    Every entry is indexed by the trigrams of its texts (names, descriptions, catalog designations and alternate names),
+    a query is answered from the smallest trigram sets and checked on the texts of these candidates only.
+    """
+    def __init__(self, entries):
+        """entries: {entry key: [texts]}."""
+        self.texts = {}
+        self.keys = {}
+        self.grams = defaultdict(set)
+        for entry_key, texts in entries.items():
+            texts = [text for text in dict.fromkeys(texts) if search_key(text)]
+            self.texts[entry_key] = texts
+            # one string per entry, the separator can't be in a query
+            joined = "\n".join(search_key(text) for text in texts)
+            self.keys[entry_key] = joined
+            grams = {joined[i:i + SEARCH_GRAM_SIZE] for i in range(len(joined) - SEARCH_GRAM_SIZE + 1)}
+            for gram in grams:
+                if "\n" not in gram:
+                    self.grams[gram].add(entry_key)
+        self.last_key = None
+        self.last_matches = None
+
+    def search(self, query):
+        """Set of the entry keys matching query, None for an empty query (no filter)."""
+        key = search_key(query)
+        if not key:
+            return None
+
+        if self.last_key and key.startswith(self.last_key):
+            # typing more characters only narrows the previous result
+            candidates = self.last_matches
+        elif len(key) < SEARCH_GRAM_SIZE:
+            candidates = self.keys
+        else:
+            gram_sets = sorted((self.grams.get(key[i:i + SEARCH_GRAM_SIZE], set()) for i in range(len(key) - SEARCH_GRAM_SIZE + 1)), key=len)
+            candidates = gram_sets[0].intersection(*gram_sets[1:])
+
+        matches = {entry_key for entry_key in candidates if key in self.keys[entry_key]}
+        self.last_key = key
+        self.last_matches = matches
+        return matches
+
+    def matched_text(self, entry_key, pattern):
+        """First text of an entry matching pattern (the alternate name found by the query), None if none."""
+        return next((text for text in self.texts.get(entry_key, []) if pattern.search(text)), None)
@@ -0,0 +1,165 @@
+# preview_cache.py
+
+import os
+import json
+import hashlib
+import threading
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+
+from api.dwarf_backup_fct import get_app_data_dir
+
+PREVIEW_CACHE_SUBDIR = "Previews"
+# Default size cap of the preview cache (app setting preview_cache_max_mb), the least recently used previews are removed above it
+PREVIEW_CACHE_MAX_MB = 512
+PREVIEW_CACHE_EXT = ".png"
+# Part of the keys, to increase when the rendering changes (previous previews are then evicted with time)
+PREVIEW_CACHE_VERSION = 2
+
+class PreviewCache:
+    """
+    Rendered previews stored in the app data directory, never next to the source images.
+    A preview is found by a key built from the source path, size, mtime and the render parameters,
+    so a changed source or other parameters give a new preview and the old one ages out (LRU on access time).
+    """
+    def __init__(self, cache_dir=None, max_bytes=PREVIEW_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir or get_app_data_dir(PREVIEW_CACHE_SUBDIR)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        # one render at a time per key, other requests for the same preview wait for it: {key: [lock, users]}
+        self.key_locks = {}
+
+    def make_key(self, src_path, params=None):
+        stat = os.stat(src_path)
+        key_data = json.dumps([PREVIEW_CACHE_VERSION, os.path.abspath(src_path), stat.st_size, stat.st_mtime_ns, params or {}], sort_keys=True)
+        return hashlib.sha1(key_data.encode("utf-8")).hexdigest()
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, key + PREVIEW_CACHE_EXT)
+
+    def is_cached_path(self, path):
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.cache_dir)
+
+    def has(self, src_path, params=None):
+        try:
+            return os.path.isfile(self.cache_path(self.make_key(src_path, params)))
+        except OSError:
+            return False
+
+    def get(self, src_path, render, params=None):
+        """
+        Return the cached preview of src_path, render(src_path, dest_path, **params) builds it on a miss.
+        Return None when the source can't be read or the render fails.
+        """
+        try:
+            key = self.make_key(src_path, params)
+        except OSError as e:
+            print(f"❌ Preview source not reachable {src_path}: {e}")
+            return None
+
+        preview_path = self.cache_path(key)
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, [threading.Lock(), 0])
+            # removed by the last user only, a waiting request must render under the same lock
+            key_lock[1] += 1
+
+        try:
+            with key_lock[0]:
+                if os.path.isfile(preview_path):
+                    with self.lock:
+                        self.hits += 1
+                    print(f"🖼️ Preview cache hit for {src_path} ({self.hits} hits / {self.misses} misses)")
+                    # access time kept by hand, atime is often disabled
+                    try:
+                        os.utime(preview_path)
+                    except OSError:
+                        pass
+                    return preview_path
+
+                with self.lock:
+                    self.misses += 1
+                print(f"🖼️ Preview cache miss for {src_path}, rendering")
+                tmp_path = preview_path + ".part"
+                try:
+                    render(src_path, tmp_path, **(params or {}))
+                    os.replace(tmp_path, preview_path)
+                except Exception as e:
+                    print(f"❌ Preview generation failed for {src_path}: {e}")
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    return None
+        finally:
+            with self.lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self.key_locks[key]
+
+        self.evict()
+        return preview_path
+
+    def entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(PREVIEW_CACHE_EXT):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Remove the least recently used previews until the cache is under its size cap."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self.lock:
+                self.evictions += 1
+            if total <= self.max_bytes:
+                break
+
+    def set_max_size(self, max_mb):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.evict()
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        entries = self.entries()
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0,
+            "evictions": self.evictions,
+            "files": len(entries),
+            "size": sum(size for _, size, _ in entries),
+            "max_size": self.max_bytes
+        }
+
+    def build_url(self, preview_path):
+        return f'/preview_cache/{os.path.basename(preview_path)}'
+
+    def serve(self, name: str):
+        # only the flat key files of the cache can be served
+        key = name[:-len(PREVIEW_CACHE_EXT)] if name.endswith(PREVIEW_CACHE_EXT) else ""
+        if not key or not all(c in "0123456789abcdef" for c in key):
+            raise HTTPException(status_code=403, detail="Access denied")
+        preview_path = self.cache_path(key)
+        if not os.path.isfile(preview_path):
+            raise HTTPException(status_code=404, detail="File not found")
+        return FileResponse(preview_path, headers={"Cache-Control": "max-age=31536000, immutable"})
+
+preview_cache = PreviewCache()
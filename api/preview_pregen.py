@@ -0,0 +1,105 @@
+# preview_pregen.py
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from api.dwarf_backup_fct import (
+    check_files, get_extension, print_log, render_fits_preview, render_image_preview,
+    PREVIEW_MAX_SIZE, PREVIEW_THUMBNAIL_SIZE
+)
+from api.preview_cache import preview_cache, PreviewCache
+
+# One worker per core, they run with a lower priority than the app
+PREVIEW_PREGEN_WORKERS = os.cpu_count() or 1
+PREVIEW_PREGEN_NICE = 10
+# FITS decodes need the most memory, only a few of them at the same time
+PREVIEW_MAX_FITS_DECODES = 2
+BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+
+def lower_process_priority():
+    try:
+        if hasattr(os, "nice"):
+            os.nice(PREVIEW_PREGEN_NICE)
+        else:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+    except Exception as e:
+        print(f"⚠️ Could not lower the preview worker priority: {e}")
+
+def render_cached_preview(cache_dir, max_bytes, src_path, max_size):
+    """Worker task: render src_path in the preview cache (size cap max_bytes), return True when the preview is available."""
+    render = render_fits_preview if get_extension(src_path) == "fits" else render_image_preview
+    return PreviewCache(cache_dir, max_bytes).get(src_path, render, {"max_size": max_size}) is not None
+
+def session_preview_tasks(session_dir):
+    """(src_path, max_size) to render for a session: FITS/TIFF previews and one thumbnail."""
+    files = check_files(os.path.join(session_dir, "stacked.jpg"))
+    tasks = [(files[kind], PREVIEW_MAX_SIZE) for kind in ("fits", "tiff") if files.get(kind)]
+    for kind in ("jpg", "png", "tiff", "fits"):
+        if files.get(kind):
+            tasks.append((files[kind], PREVIEW_THUMBNAIL_SIZE))
+            break
+    return tasks
+
+def pregenerate_previews(session_dirs, log=None, cancel=None, max_workers=PREVIEW_PREGEN_WORKERS, max_fits_decodes=PREVIEW_MAX_FITS_DECODES):
+    """
+    Render the previews and thumbnails of session_dirs in the preview cache with a pool of low priority processes.
+    cancel() is checked between files, the renders already started are finished.
+    Return (rendered, failed).
+    """
+    tasks = [task for session_dir in session_dirs for task in session_preview_tasks(session_dir)]
+    tasks = [(src_path, max_size) for src_path, max_size in tasks if not preview_cache.has(src_path, {"max_size": max_size})]
+    if not tasks:
+        return 0, 0
+
+    total = len(tasks)
+    print_log(f"🖼️ Pre-generating {total} previews with {max_workers} workers", log)
+
+    rendered = 0
+    failed = 0
+    pending = list(tasks)
+    running = {}
+    cache_dir = os.path.abspath(preview_cache.cache_dir)
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=lower_process_priority)
+    try:
+        while pending or running:
+            if cancel and cancel():
+                print_log(f"⛔ Preview pre-generation cancelled, {total - rendered - failed} previews skipped", log)
+                break
+
+            # keep the workers busy, without more FITS decodes than allowed
+            fits_running = sum(1 for src_path, _ in running.values() if get_extension(src_path) == "fits")
+            for task in list(pending):
+                if len(running) >= max_workers:
+                    break
+                if get_extension(task[0]) == "fits":
+                    if fits_running >= max_fits_decodes:
+                        continue
+                    fits_running += 1
+                pending.remove(task)
+                running[executor.submit(render_cached_preview, cache_dir, preview_cache.max_bytes, *task)] = task
+
+            done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                src_path, _ = running.pop(future)
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"❌ Preview worker failed for {src_path}: {e}")
+                    ok = False
+                if ok:
+                    rendered += 1
+                else:
+                    failed += 1
+                print_log(f"🖼️ Previews {rendered + failed}/{total} : {os.path.basename(os.path.dirname(src_path))}", log)
+    except BrokenProcessPool as e:
+        print_log(f"❌ Preview workers stopped: {e}", log)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    print_log(f"✅ {rendered} previews ready" + (f", {failed} failed" if failed else ""), log)
+    return rendered, failed
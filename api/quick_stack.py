@@ -0,0 +1,232 @@
+# quick_stack.py
+
+import os
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+import numpy as np
+from astropy.io import fits
+
+from api.dwarf_backup_db import connect_db, close_db
+from api.dwarf_backup_db_api import get_subframes
+from api.dwarf_backup_fct import get_app_data_dir, print_log, bayer_superpixel
+from api.fits_access import open_fits_memmap
+from api.preview_pregen import lower_process_priority
+
+QUICK_STACK_SUBDIR = "QuickStacks"
+QUICK_STACK_METHODS = {"mean": "Mean", "median": "Sigma-clipped median"}
+# The frames are read by bands of rows, the band height is chosen so that all the workers together
+# never hold more than this for the frames being combined
+QUICK_STACK_MEMORY_MB = 512
+QUICK_STACK_WORKERS = min(4, os.cpu_count() or 1)
+QUICK_STACK_SIGMA = 3.0
+# Center crop (superpixels) used to find the translation of each frame against the reference
+QUICK_STACK_ALIGN_SIZE = 512
+# Stacks kept on disk, the oldest are removed
+QUICK_STACK_MAX_FILES = 10
+
+reference_crop = None
+
+def init_align_worker(reference):
+    global reference_crop
+    lower_process_priority()
+    reference_crop = reference
+
+def read_cells(raw, bscale, bzero, rows, cols):
+    """Superpixel RGB (rows, cols, 3) of the 2x2 cell ranges rows/cols of a memory mapped Bayer frame."""
+    data = np.asarray(raw[2 * rows[0]:2 * rows[1], 2 * cols[0]:2 * cols[1]], dtype=np.float32)
+    if bscale != 1:
+        data *= bscale
+    if bzero != 0:
+        data += bzero
+    return bayer_superpixel(data)
+
+def center_crop(fits_path):
+    """Luminance of the center QUICK_STACK_ALIGN_SIZE superpixels of a frame, with its median (background)."""
+    raw, bscale, bzero = open_fits_memmap(fits_path)
+    if raw.ndim != 2:
+        raise ValueError(f"Not a Bayer frame: {raw.shape}")
+    height, width = raw.shape[0] // 2, raw.shape[1] // 2
+    size = min(QUICK_STACK_ALIGN_SIZE, height, width)
+    top, left = (height - size) // 2, (width - size) // 2
+    luminance = read_cells(raw, bscale, bzero, (top, top + size), (left, left + size)).mean(axis=2)
+    return luminance, float(np.median(luminance)), (height, width)
+
+def align_frame(fits_path):
+    """Worker task: ((dy, dx) superpixel shift of the frame against the reference, background, superpixel shape)."""
+    luminance, background, shape = center_crop(fits_path)
+    if luminance.shape != reference_crop.shape:
+        raise ValueError(f"Frame size differs from the reference: {shape}")
+    window = cv2.createHanningWindow(luminance.shape[::-1], cv2.CV_32F)
+    (dx, dy), _ = cv2.phaseCorrelate(reference_crop, luminance, window)
+    return (int(round(dy)), int(round(dx))), background, shape
+
+def sigma_clipped_median(stack, sigma=QUICK_STACK_SIGMA):
+    """Mean of the values within sigma robust deviations (MAD) of the median, along the frame axis."""
+    median = np.median(stack, axis=0)
+    deviation = np.abs(stack - median)
+    spread = np.median(deviation, axis=0) * 1.4826
+    keep = deviation <= sigma * spread + 1e-6
+    count = keep.sum(axis=0)
+    total = np.where(keep, stack, 0).sum(axis=0)
+    return np.where(count > 0, total / np.maximum(count, 1), median).astype(np.float32)
+
+def stack_band(frames, rows, cols, method):
+    """
+    Worker task: combined superpixel RGB (rows, cols, 3) of a band of the output.
+    frames: (fits_path, (dy, dx), offset) with offset the background normalization added to the frame.
+    """
+    stack = np.empty((len(frames), rows[1] - rows[0], cols[1] - cols[0], 3), dtype=np.float32)
+    for i, (fits_path, (dy, dx), offset) in enumerate(frames):
+        raw, bscale, bzero = open_fits_memmap(fits_path)
+        stack[i] = read_cells(raw, bscale, bzero, (rows[0] + dy, rows[1] + dy), (cols[0] + dx, cols[1] + dx))
+        stack[i] += offset
+        del raw
+    if method == "median":
+        return sigma_clipped_median(stack)
+    return stack.mean(axis=0)
+
+def quick_stack_path(frames, method):
+    key_data = json.dumps([method, [(frame["file_name"], frame["file_size"], frame["modification_time"]) for frame in frames]])
+    return os.path.join(get_app_data_dir(QUICK_STACK_SUBDIR), hashlib.sha1(key_data.encode("utf-8")).hexdigest() + ".fits")
+
+def cleanup_quick_stacks():
+    stack_dir = get_app_data_dir(QUICK_STACK_SUBDIR)
+    stacks = sorted((entry.stat().st_mtime, entry.path) for entry in os.scandir(stack_dir) if entry.name.endswith(".fits"))
+    for _, path in stacks[:-QUICK_STACK_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def get_session_panels(db_name, dwarf_data_id):
+    """Panel sub-directories of a mosaic session, from the SubFrame index."""
+    conn = connect_db(db_name)
+    try:
+        frames = get_subframes(conn, dwarf_data_id, ("light",))
+        return sorted({frame["file_name"].split("/", 1)[0] for frame in frames if "/" in frame["file_name"]})
+    finally:
+        close_db(conn)
+
+def quick_stack_session(db_name, dwarf_data_id, session_dir, method="mean", panel=None, log=None, cancel=None, max_workers=QUICK_STACK_WORKERS):
+    """
+    Quick look stack of the light FITS frames of a session (or of one panel of a mosaic), excluded frames left out.
+    Frames are debayered as 2x2 superpixels, aligned by translation (phase correlation on a center crop),
+    normalized on the background of the reference and combined by bands of rows on a process pool,
+    the output is cropped to the area covered by all the frames.
+    Return the path of the stacked RGB FITS (kept in the app data directory), None when cancelled or failed.
+    """
+    conn = connect_db(db_name)
+    try:
+        frames = get_subframes(conn, dwarf_data_id, ("light",))
+    finally:
+        close_db(conn)
+    frames = [frame for frame in frames if frame["format"] == "fits" and not frame["excluded"]
+              and (panel is None or frame["file_name"].startswith(panel + "/"))]
+    if len(frames) < 2:
+        print_log("❌ At least 2 indexed light frames are needed, scan the session again", log)
+        return None
+
+    output_path = quick_stack_path(frames, method)
+    if os.path.isfile(output_path):
+        print_log("✅ Quick stack already done", log)
+        os.utime(output_path)
+        return output_path
+
+    paths = [os.path.join(session_dir, frame["file_name"]) for frame in frames]
+    context = multiprocessing.get_context("spawn")
+
+    # 1. alignment and background of each frame against the first one
+    try:
+        reference, reference_background, shape = center_crop(paths[0])
+    except Exception as e:
+        print_log(f"❌ Could not read the reference frame: {e}", log)
+        return None
+    print_log(f"🧭 Aligning {len(paths)} frames with {max_workers} workers", log)
+    aligned = []
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=init_align_worker, initargs=(reference,))
+    try:
+        futures = {executor.submit(align_frame, path): path for path in paths}
+        while futures:
+            if cancel and cancel():
+                print_log("⛔ Quick stack cancelled", log)
+                return None
+            done, _ = wait(futures, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = futures.pop(future)
+                try:
+                    shift, background, frame_shape = future.result()
+                    if frame_shape == shape:
+                        aligned.append((path, shift, reference_background - background))
+                except Exception as e:
+                    print(f"⚠️ Frame left out of the stack {os.path.basename(path)}: {e}")
+    except BrokenProcessPool as e:
+        print_log(f"❌ Stack workers stopped: {e}", log)
+        return None
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if len(aligned) < 2:
+        print_log("❌ Not enough frames could be aligned", log)
+        return None
+
+    # 2. area covered by all the frames, in reference superpixels
+    height, width = shape
+    top = max(0, -min(shift[0] for _, shift, _ in aligned))
+    bottom = min(height, height - max(shift[0] for _, shift, _ in aligned))
+    left = max(0, -min(shift[1] for _, shift, _ in aligned))
+    right = min(width, width - max(shift[1] for _, shift, _ in aligned))
+    if bottom - top < 16 or right - left < 16:
+        print_log("❌ The frames don't overlap, alignment failed", log)
+        return None
+
+    # 3. combination by bands, memory bounded by QUICK_STACK_MEMORY_MB over all the workers
+    # the stack and the temporaries of the sigma clipping
+    row_bytes = len(aligned) * (right - left) * 3 * 4 * 3
+    band_rows = max(1, int(QUICK_STACK_MEMORY_MB * 1024 * 1024 / max_workers // row_bytes))
+    bands = [(row, min(row + band_rows, bottom)) for row in range(top, bottom, band_rows)]
+    output = np.empty((bottom - top, right - left, 3), dtype=np.float32)
+    print_log(f"🧮 Stacking {len(aligned)} frames ({QUICK_STACK_METHODS.get(method, method)}) in {len(bands)} bands", log)
+
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=lower_process_priority)
+    try:
+        pending = list(bands)
+        running = {}
+        done_bands = 0
+        while pending or running:
+            if cancel and cancel():
+                print_log("⛔ Quick stack cancelled", log)
+                return None
+            # a few bands in flight only, the finished bands are copied in the output as they arrive
+            while pending and len(running) < max_workers:
+                rows = pending.pop(0)
+                running[executor.submit(stack_band, aligned, rows, (left, right), method)] = rows
+            done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows = running.pop(future)
+                output[rows[0] - top:rows[1] - top] = future.result()
+                done_bands += 1
+                if done_bands % 10 == 0 or not (pending or running):
+                    print_log(f"🧮 Bands {done_bands}/{len(bands)}", log)
+    except BrokenProcessPool as e:
+        print_log(f"❌ Stack workers stopped: {e}", log)
+        return None
+    except Exception as e:
+        print_log(f"❌ Quick stack failed: {e}", log)
+        return None
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    # same layout as the stacked FITS of the Dwarf (3, height, width), rendered by the preview pipeline
+    header = fits.Header()
+    header["NCOMBINE"] = (len(aligned), "Number of stacked frames")
+    header["STACKMTD"] = (method, "Quick look stacking method")
+    tmp_path = output_path + ".part"
+    fits.PrimaryHDU(np.ascontiguousarray(np.transpose(output, (2, 0, 1))), header=header).writeto(tmp_path, overwrite=True)
+    os.replace(tmp_path, output_path)
+    cleanup_quick_stacks()
+    print_log(f"✅ Quick stack of {len(aligned)} frames ready", log)
+    return output_path
@@ -0,0 +1,120 @@
+# session_prefetch.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from api.dwarf_backup_db import connect_db, close_db
+from api.dwarf_backup_db_api import (
+    get_subframe_summary, get_session_stats, get_session_present_in_Dwarf, get_session_present_in_backupDrive
+)
+from api.dwarf_backup_fct import check_files, get_preview_renderer, PREVIEW_MAX_SIZE
+from api.preview_cache import preview_cache
+from api.session_stats import read_session_stats
+
+# Sessions kept in memory, the least recently shown are dropped
+SESSION_PREFETCH_SIZE = 16
+# Prefetched details older than this (seconds) are read again, the session may have changed on the disk
+SESSION_PREFETCH_TTL = 120
+# The worker thread (and its connection) stops after this idle time (seconds)
+SESSION_PREFETCH_IDLE = 30
+
+def load_session_details(conn, dwarf_data_id, full_path, mode):
+    """
+    Everything the explore page reads to show a session (stacked image full_path), the FITS / TIFF preview rendered in the preview cache.
+    session_stats are the stored ones, or computed from the directory for the sessions not scanned since.
+    """
+    directory = os.path.dirname(full_path)
+    session_dir = os.path.basename(directory)
+    session_stats = get_session_stats(conn, dwarf_data_id)
+    if not session_stats and os.path.isdir(directory):
+        session_stats = read_session_stats(directory)
+    if mode == "backup":
+        presence = get_session_present_in_Dwarf(conn, session_dir)
+    else:
+        presence = get_session_present_in_backupDrive(conn, session_dir)
+
+    render = get_preview_renderer(full_path)
+    if render and os.path.isfile(full_path):
+        preview_cache.get(full_path, render, {"max_size": PREVIEW_MAX_SIZE})
+
+    return {
+        "astro_files": check_files(full_path),
+        "subframe_summary": get_subframe_summary(conn, dwarf_data_id),
+        "session_stats": session_stats,
+        "presence": (session_dir, presence),
+    }
+
+class SessionPrefetcher:
+    """
+    Details of the sessions next to the one shown, loaded by a background thread with its own connection
+    and kept in a small LRU cache keyed by the stacked image path of the session.
+    """
+    def __init__(self, db_name, mode, max_entries=SESSION_PREFETCH_SIZE, ttl=SESSION_PREFETCH_TTL):
+        self.db_name = db_name
+        self.mode = mode
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache = OrderedDict()
+        self.pending = []
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def get(self, full_path):
+        """Prefetched details of a session, None when not (or no more) in the cache."""
+        with self.condition:
+            entry = self.cache.get(full_path)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self.cache[full_path]
+                return None
+            self.cache.move_to_end(full_path)
+            return entry[1]
+
+    def put(self, full_path, details):
+        with self.condition:
+            self.cache[full_path] = (time.monotonic(), details)
+            self.cache.move_to_end(full_path)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+
+    def prefetch(self, sessions):
+        """
+        Load sessions [(dwarf_data_id, full_path)] in the background, in this order.
+        They replace the sessions still waiting: only the neighbours of the last session shown are useful.
+        """
+        with self.condition:
+            now = time.monotonic()
+            self.pending = [session for session in sessions
+                            if session[1] not in self.cache or now - self.cache[session[1]][0] > self.ttl]
+            if not self.pending:
+                return
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="session-prefetch", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        # sqlite connections can't be shared with the UI thread
+        conn = connect_db(self.db_name)
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending:
+                        if not self.condition.wait(timeout=SESSION_PREFETCH_IDLE) and not self.pending:
+                            self.thread = None
+                            return
+                    dwarf_data_id, full_path = self.pending.pop(0)
+                try:
+                    details = load_session_details(conn, dwarf_data_id, full_path, self.mode)
+                except Exception as e:
+                    print(f"⚠️ Session prefetch failed for {full_path}: {e}")
+                    continue
+                self.put(full_path, details)
+        finally:
+            with self.condition:
+                if self.thread is threading.current_thread():
+                    self.thread = None
+            close_db(conn)
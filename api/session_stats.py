@@ -0,0 +1,105 @@
+# session_stats.py
+
+import os
+
+from api.dwarf_backup_db_api import get_session_stats, set_session_stats
+
+SESSION_IMAGE_EXTENSIONS = ("jpg", "jpeg", "png")
+
+def is_panel_dir(name):
+    return not name.startswith(".") and not name.startswith("Thumbnail")
+
+def walk_session_dir(session_dir):
+    """
+    (dir_mtime, files, subdirs) of a session: latest mtime of its directories, the DirEntry of every file with its
+    directory relative to the session ('' for the session directory, '/' separated) and the session subdirectories.
+    No file stat, symbolic links to directories are not followed.
+    """
+    dir_mtime = 0
+    files = []
+    subdirs = []
+    pending = [(session_dir, "")]
+    while pending:
+        directory, relative = pending.pop()
+        dir_mtime = max(dir_mtime, int(os.stat(directory).st_mtime))
+        for entry in os.scandir(directory):
+            if entry.is_dir(follow_symlinks=False):
+                pending.append((entry.path, f"{relative}/{entry.name}" if relative else entry.name))
+                if not relative:
+                    subdirs.append(entry.name)
+            elif entry.is_file():
+                files.append((entry, relative))
+    return dir_mtime, files, subdirs
+
+def compute_session_stats(session_dir, dir_mtime, files, subdirs):
+    """
+    Statistics of a session from its files [(name, directory, size)] and subdirectories, as given by walk_session_dir.
+    Frames are counted like count_fits_files and the other counters of the explore page: in the panel directories
+    only for a mosaic that has some, failed and TIFF frames in the session directory only.
+    """
+    stats = {
+        "dir_mtime": dir_mtime, "file_count": len(files), "total_size": 0,
+        "fits_size": 0, "tiff_size": 0, "image_size": 0, "other_size": 0,
+        "fits_count": 0, "failed_fits_count": 0, "tiff_count": 0, "failed_tiff_count": 0, "panel_count": 0
+    }
+    mosaic = "_MOSAIC_" in session_dir and any(is_panel_dir(name) for name in subdirs)
+    panels = set()
+    for name, directory, size in files:
+        ext = os.path.splitext(name)[1].lower().lstrip(".")
+        stats["total_size"] += size
+        if ext in ("fits", "tiff"):
+            stats[f"{ext}_size"] += size
+        elif ext in SESSION_IMAGE_EXTENSIONS:
+            stats["image_size"] += size
+        else:
+            stats["other_size"] += size
+
+        if not name.endswith((".fits", ".tiff")):
+            continue
+        frame_type = name[-4:]
+        depth = directory.count("/") + 1 if directory else 0
+        if name.startswith("failed_"):
+            if depth == 0:
+                stats[f"failed_{frame_type}_count"] += 1
+        elif not name.startswith("stacked-"):
+            if frame_type == "fits" and depth == (1 if mosaic else 0):
+                stats["fits_count"] += 1
+            elif frame_type == "tiff" and depth == 0:
+                stats["tiff_count"] += 1
+            if depth == 1 and is_panel_dir(directory):
+                panels.add(directory)
+
+    stats["panel_count"] = len(panels)
+    return stats
+
+def read_session_stats(session_dir):
+    """Statistics of session_dir read from the disk."""
+    dir_mtime, files, subdirs = walk_session_dir(session_dir)
+    return compute_session_stats(session_dir, dir_mtime, [(entry.name, directory, entry.stat().st_size) for entry, directory in files], subdirs)
+
+def update_session_stats(conn, dwarf_data_ids, session_dir):
+    """
+    Store the statistics of session_dir for each DwarfData id.
+    The files are only stat'ed when the directory mtime or file count changed since the last scan.
+    """
+    try:
+        dir_mtime, files, subdirs = walk_session_dir(session_dir)
+    except OSError as e:
+        print(f"❌ Could not read session directory {session_dir}: {e}")
+        return None
+
+    return store_session_stats(conn, dwarf_data_ids, session_dir, dir_mtime, len(files),
+        lambda: compute_session_stats(session_dir, dir_mtime, [(entry.name, directory, entry.stat().st_size) for entry, directory in files], subdirs))
+
+def store_session_stats(conn, dwarf_data_ids, session_dir, dir_mtime, file_count, compute):
+    """Store compute() for each DwarfData id whose stored statistics don't have this dir_mtime and file_count."""
+    stats = None
+    for dwarf_data_id in dwarf_data_ids:
+        stored = get_session_stats(conn, dwarf_data_id)
+        if stored and stored["dir_mtime"] == dir_mtime and stored["file_count"] == file_count:
+            continue
+        if stats is None:
+            stats = compute()
+        set_session_stats(conn, dwarf_data_id, stats)
+        print(f"📊 Session stats of {os.path.basename(os.path.normpath(session_dir))}: {file_count} files, {stats['total_size']} bytes")
+    return stats
@@ -0,0 +1,110 @@
+# subframe_index.py
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from api.fits_access import read_fits_header_fast
+from api.dwarf_backup_db_api import get_subframe_signatures, upsert_subframes, delete_subframes
+
+# Header reads are small I/O bound reads, a few threads hide the disk (or network share) latency
+SUBFRAME_WORKERS = 8
+SUBFRAME_FORMATS = ("fits", "tiff")
+# Header keywords by column, the first one found is used
+SUBFRAME_KEYWORDS = {
+    "date_obs": ("DATE-OBS", "DATE"),
+    "exp_time": ("EXPTIME", "EXPOSURE"),
+    "gain": ("GAIN",),
+    "filter": ("FILTER",),
+    "ccd_temp": ("CCD-TEMP", "CCDTEMP", "TEMP"),
+}
+SUBFRAME_HEADER_KEYS = {key for keys in SUBFRAME_KEYWORDS.values() for key in keys}
+
+def get_frame_type(file_name):
+    name = os.path.basename(file_name)
+    if name.startswith("failed_"):
+        return "failed"
+    if name.startswith("stacked"):
+        return "stacked"
+    return "light"
+
+def list_session_frames(session_dir):
+    """{file_name: (format, file_size, mtime)} of the frames of a session, file_name relative to session_dir (mosaic panels included)."""
+    frames = {}
+    dirs = [session_dir]
+    for entry in os.scandir(session_dir):
+        if entry.is_dir() and not entry.name.startswith(".") and not entry.name.startswith("Thumbnail"):
+            dirs.append(entry.path)
+
+    for directory in dirs:
+        for entry in os.scandir(directory):
+            ext = os.path.splitext(entry.name)[1].lower().lstrip(".")
+            if ext in SUBFRAME_FORMATS and entry.is_file():
+                stat = entry.stat()
+                file_name = os.path.relpath(entry.path, session_dir).replace("\\", "/")
+                frames[file_name] = (ext, stat.st_size, int(stat.st_mtime))
+    return frames
+
+def first_value(header, keys):
+    for key in keys:
+        if header.get(key) is not None:
+            return header[key]
+    return None
+
+def read_subframe_values(path):
+    """(date_obs, exp_time, gain, filter, ccd_temp) from the header of a FITS frame."""
+    header = read_fits_header_fast(path, SUBFRAME_HEADER_KEYS)
+    values = {column: first_value(header, keys) for column, keys in SUBFRAME_KEYWORDS.items()}
+    for column in ("exp_time", "ccd_temp"):
+        if not isinstance(values[column], (int, float)):
+            values[column] = None
+    if not isinstance(values["gain"], int):
+        values["gain"] = int(values["gain"]) if isinstance(values["gain"], float) else None
+    return tuple(values[column] for column in SUBFRAME_KEYWORDS)
+
+def read_subframe_row(session_dir, file_name, frame):
+    file_format, file_size, mtime = frame
+    values = (None, None, None, None, None)
+    if file_format == "fits":
+        try:
+            values = read_subframe_values(os.path.join(session_dir, file_name))
+        except Exception as e:
+            print(f"⚠️ Could not read FITS header of {file_name}: {e}")
+    return (file_name, file_format, get_frame_type(file_name), *values, file_size, mtime)
+
+def index_session_subframes(conn, dwarf_data_ids, session_dir):
+    """
+    Store the header values of the sub-frames of session_dir for each DwarfData id (stacked.jpg and stacked.png of a session).
+    Only the new or changed frames are read, the frames not on the disk anymore are removed.
+    Return the number of headers read.
+    """
+    try:
+        frames = list_session_frames(session_dir)
+    except OSError as e:
+        print(f"❌ Could not list frames of {session_dir}: {e}")
+        return 0
+
+    # changes of every id first: the rows are read once, in one pool, and shared by the ids of the same session
+    changes = []
+    to_read = set()
+    for dwarf_data_id in dwarf_data_ids:
+        signatures = get_subframe_signatures(conn, dwarf_data_id)
+        changed = [file_name for file_name, frame in frames.items() if signatures.get(file_name) != frame[1:]]
+        removed = [file_name for file_name in signatures if file_name not in frames]
+        changes.append((dwarf_data_id, changed, removed))
+        to_read.update(changed)
+
+    rows = {}
+    if to_read:
+        with ThreadPoolExecutor(max_workers=SUBFRAME_WORKERS) as executor:
+            for row in executor.map(lambda file_name: read_subframe_row(session_dir, file_name, frames[file_name]), sorted(to_read)):
+                rows[row[0]] = row
+
+    for dwarf_data_id, changed, removed in changes:
+        if changed:
+            upsert_subframes(conn, dwarf_data_id, [rows[file_name] for file_name in changed])
+        if removed:
+            delete_subframes(conn, dwarf_data_id, removed)
+        if changed or removed:
+            print(f"🗂️ Sub-frames of {os.path.basename(os.path.normpath(session_dir))}: {len(changed)} indexed, {len(removed)} removed")
+
+    return len(rows)
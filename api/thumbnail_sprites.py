@@ -0,0 +1,170 @@
+# thumbnail_sprites.py
+
+import os
+import re
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+
+from api.dwarf_backup_fct import (
+    get_app_data_dir, check_files, read_display_image, get_preview_renderer, render_image_preview, PREVIEW_THUMBNAIL_SIZE
+)
+from api.preview_cache import preview_cache
+
+SPRITES_SUBDIR = "Sprites"
+SPRITE_CELL_SIZE = 160
+SPRITE_COLUMNS = 10
+# 50 thumbnails by sheet: a gallery page of 200 sessions is 4 requests
+SPRITE_PER_SHEET = 50
+SPRITE_QUALITY = 85
+SPRITE_WORKERS = 8
+# Sheets kept on disk, the least recently used are removed
+SPRITE_MAX_SHEETS = 200
+SPRITE_BACKGROUND = (32, 32, 32)
+
+SHEET_NAME_PATTERN = re.compile(r"^([0-9a-f]{40})\.jpg$")
+
+def find_session_thumbnail(stacked_path):
+    """
+    Small image of a session: stacked_thumbnail.jpg, a stacked image of the Thumbnail folder,
+    otherwise a thumbnail rendered in the preview cache from the stacked files. None when nothing can be shown.
+    """
+    session_dir = os.path.dirname(stacked_path)
+    thumbnail_path = os.path.join(session_dir, "stacked_thumbnail.jpg")
+    if os.path.isfile(thumbnail_path):
+        return thumbnail_path
+
+    thumbnail_dir = os.path.join(session_dir, "Thumbnail")
+    if os.path.isdir(thumbnail_dir):
+        for name in sorted(os.listdir(thumbnail_dir)):
+            if name.lower().startswith("stacked") and name.lower().endswith((".jpg", ".png")):
+                return os.path.join(thumbnail_dir, name)
+
+    files = check_files(stacked_path)
+    for kind in ("jpg", "png", "tiff", "fits"):
+        if files.get(kind):
+            # same cache entry as the thumbnails pre-generated after the scans
+            render = get_preview_renderer(files[kind]) or render_image_preview
+            return preview_cache.get(files[kind], render, {"max_size": PREVIEW_THUMBNAIL_SIZE})
+    return None
+
+class SpriteSheets:
+    """
+    Thumbnails of the sessions packed in JPG sprite sheets stored in the app data directory.
+    A sheet is found by a key built from its thumbnails (path, size, mtime) and the cell size, so the same
+    page of a gallery is never rebuilt while its sessions don't change.
+    """
+    def __init__(self, sprites_dir=None, cell_size=SPRITE_CELL_SIZE, per_sheet=SPRITE_PER_SHEET, columns=SPRITE_COLUMNS):
+        self.sprites_dir = sprites_dir or get_app_data_dir(SPRITES_SUBDIR)
+        self.cell_size = cell_size
+        self.per_sheet = per_sheet
+        self.columns = columns
+        self.lock = threading.Lock()
+
+    def make_key(self, sources):
+        signature = []
+        for source in sources:
+            if source and preview_cache.is_cached_path(source):
+                # the cache key already depends on the source image, its mtime is touched on every hit
+                signature.append(os.path.basename(source))
+                continue
+            try:
+                stat = os.stat(source)
+                signature.append([os.path.abspath(source), stat.st_size, stat.st_mtime_ns])
+            except (OSError, TypeError):
+                signature.append(None)
+        key_data = json.dumps([self.cell_size, self.columns, signature])
+        return hashlib.sha1(key_data.encode("utf-8")).hexdigest()
+
+    def sheet_path(self, key):
+        return os.path.join(self.sprites_dir, key + ".jpg")
+
+    def load_cell(self, source):
+        cell = np.full((self.cell_size, self.cell_size, 3), SPRITE_BACKGROUND, dtype=np.uint8)
+        if not source:
+            return cell
+        try:
+            image = read_display_image(source, self.cell_size)
+        except Exception as e:
+            print(f"⚠️ Thumbnail not readable {source}: {e}")
+            return cell
+        # centered, aspect ratio kept
+        height, width = image.shape[:2]
+        top, left = (self.cell_size - height) // 2, (self.cell_size - width) // 2
+        cell[top:top + height, left:left + width] = image[:, :, :3]
+        return cell
+
+    def build_sheet(self, sources):
+        key = self.make_key(sources)
+        sheet_path = self.sheet_path(key)
+        if os.path.isfile(sheet_path):
+            os.utime(sheet_path)
+            return sheet_path
+
+        rows = -(-len(sources) // self.columns)
+        sheet = np.full((rows * self.cell_size, self.columns * self.cell_size, 3), SPRITE_BACKGROUND, dtype=np.uint8)
+        with ThreadPoolExecutor(max_workers=SPRITE_WORKERS) as executor:
+            for index, cell in enumerate(executor.map(self.load_cell, sources)):
+                row, col = divmod(index, self.columns)
+                sheet[row * self.cell_size:(row + 1) * self.cell_size, col * self.cell_size:(col + 1) * self.cell_size] = cell
+
+        ok, jpg = cv2.imencode(".jpg", sheet, [cv2.IMWRITE_JPEG_QUALITY, SPRITE_QUALITY])
+        if not ok:
+            raise ValueError("Sprite sheet encoding failed")
+        tmp_path = sheet_path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(jpg.tobytes())
+        os.replace(tmp_path, sheet_path)
+        return sheet_path
+
+    def build(self, stacked_paths):
+        """
+        Sprite sheets of the sessions of stacked_paths (stacked.jpg paths), in this order.
+        Return (sheet urls, [(sheet index, x, y)] for each session), x/y are the pixel offsets of the cell.
+        """
+        with ThreadPoolExecutor(max_workers=SPRITE_WORKERS) as executor:
+            sources = list(executor.map(self.find_thumbnail, stacked_paths))
+
+        urls = []
+        cells = []
+        with self.lock:
+            for start in range(0, len(sources), self.per_sheet):
+                urls.append(self.build_url(self.build_sheet(sources[start:start + self.per_sheet])))
+                for index in range(min(self.per_sheet, len(sources) - start)):
+                    row, col = divmod(index, self.columns)
+                    cells.append((len(urls) - 1, col * self.cell_size, row * self.cell_size))
+        self.cleanup()
+        return urls, cells
+
+    def find_thumbnail(self, stacked_path):
+        try:
+            return find_session_thumbnail(stacked_path)
+        except OSError as e:
+            print(f"⚠️ No thumbnail for {stacked_path}: {e}")
+            return None
+
+    def cleanup(self):
+        sheets = sorted((entry.stat().st_mtime, entry.path) for entry in os.scandir(self.sprites_dir) if entry.name.endswith(".jpg"))
+        for _, path in sheets[:-SPRITE_MAX_SHEETS]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def build_url(self, sheet_path):
+        return f"/sprites/{os.path.basename(sheet_path)}"
+
+    def serve(self, name: str):
+        if not SHEET_NAME_PATTERN.match(name):
+            raise HTTPException(status_code=403, detail="Access denied")
+        sheet_path = os.path.join(self.sprites_dir, name)
+        if not os.path.isfile(sheet_path):
+            raise HTTPException(status_code=404, detail="File not found")
+        return FileResponse(sheet_path, headers={"Cache-Control": "max-age=31536000, immutable"})
+
+sprite_sheets = SpriteSheets()
@@ -0,0 +1,251 @@
+# tile_pyramid.py
+
+import os
+import re
+import math
+import json
+import shutil
+import hashlib
+import threading
+import cv2
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, HTMLResponse
+
+from api.dwarf_backup_fct import get_app_data_dir, get_extension, read_display_image, render_fits_preview
+from api.preview_cache import preview_cache
+
+TILES_SUBDIR = "Tiles"
+TILE_SIZE = 256
+TILE_OVERLAP = 1
+# "jpg" or "webp"
+TILE_FORMAT = "jpg"
+TILE_QUALITY = 90
+# FITS are rendered (preview pipeline) at this size before tiling
+TILE_FITS_MAX_SIZE = 8192
+# Pyramids kept on disk, the least recently opened are removed
+TILE_MAX_PYRAMIDS = 20
+
+TILE_NAME_PATTERN = re.compile(r"^(\d+)_(\d+)\.(jpg|webp)$")
+KEY_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+class TilePyramid:
+    """
+    DeepZoom tile pyramids of the stacked images, stored in the app data directory:
+    <key>/info.json and <key>/<level>/<col>_<row>.<format>, level 0 is 1x1 pixel, the last level is the full image.
+    The key is built from the source path, size and mtime like the preview cache.
+    """
+    def __init__(self, tiles_dir=None, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, tile_format=TILE_FORMAT):
+        self.tiles_dir = tiles_dir or get_app_data_dir(TILES_SUBDIR)
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.tile_format = tile_format
+        self.lock = threading.Lock()
+
+    def make_key(self, image_path):
+        stat = os.stat(image_path)
+        key_data = json.dumps([os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns, self.tile_size, self.overlap, self.tile_format])
+        return hashlib.sha1(key_data.encode("utf-8")).hexdigest()
+
+    def pyramid_dir(self, key):
+        return os.path.join(self.tiles_dir, key)
+
+    def load_image(self, image_path):
+        if get_extension(image_path) == "fits":
+            # full size render of the FITS goes through the preview cache
+            preview_path = preview_cache.get(image_path, render_fits_preview, {"max_size": TILE_FITS_MAX_SIZE})
+            if not preview_path:
+                raise ValueError(f"FITS render failed for {image_path}")
+            image_path = preview_path
+        return read_display_image(image_path)
+
+    def build(self, image_path):
+        """Build the pyramid of image_path if needed, return its key."""
+        key = self.make_key(image_path)
+        pyramid_dir = self.pyramid_dir(key)
+        info_path = os.path.join(pyramid_dir, "info.json")
+
+        with self.lock:
+            if os.path.isfile(info_path):
+                # last use kept for the cleanup
+                os.utime(info_path)
+                return key
+
+            print(f"🧩 Building tile pyramid for {image_path}")
+            image = self.load_image(image_path)
+            height, width = image.shape[:2]
+            max_level = math.ceil(math.log2(max(width, height)))
+
+            shutil.rmtree(pyramid_dir, ignore_errors=True)
+            # each level is the previous one halved (block mean), from the full image down to 1x1
+            level_image = image
+            for level in range(max_level, -1, -1):
+                self.write_level(pyramid_dir, level, level_image)
+                if level:
+                    level_height, level_width = level_image.shape[:2]
+                    level_image = cv2.resize(level_image, (max(1, math.ceil(level_width / 2)), max(1, math.ceil(level_height / 2))),
+                                             interpolation=cv2.INTER_AREA)
+
+            # written last, a pyramid without info.json is incomplete
+            with open(info_path, "w") as f:
+                json.dump({"width": width, "height": height, "tile_size": self.tile_size, "overlap": self.overlap,
+                           "format": self.tile_format, "max_level": max_level}, f)
+            print(f"🧩 Tile pyramid ready: {width}x{height}, {max_level + 1} levels")
+
+        self.cleanup()
+        return key
+
+    def write_level(self, pyramid_dir, level, image):
+        level_dir = os.path.join(pyramid_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        height, width = image.shape[:2]
+        params = [cv2.IMWRITE_WEBP_QUALITY, TILE_QUALITY] if self.tile_format == "webp" else [cv2.IMWRITE_JPEG_QUALITY, TILE_QUALITY]
+
+        for row in range(math.ceil(height / self.tile_size)):
+            for col in range(math.ceil(width / self.tile_size)):
+                x0 = max(0, col * self.tile_size - self.overlap)
+                y0 = max(0, row * self.tile_size - self.overlap)
+                x1 = min(width, (col + 1) * self.tile_size + self.overlap)
+                y1 = min(height, (row + 1) * self.tile_size + self.overlap)
+                ok, tile = cv2.imencode(f".{self.tile_format}", np.ascontiguousarray(image[y0:y1, x0:x1]), params)
+                if not ok:
+                    raise ValueError(f"Tile encoding failed level {level} {col}_{row}")
+                with open(os.path.join(level_dir, f"{col}_{row}.{self.tile_format}"), "wb") as f:
+                    f.write(tile.tobytes())
+
+    def cleanup(self):
+        """Keep only the TILE_MAX_PYRAMIDS most recently opened pyramids."""
+        pyramids = []
+        for entry in os.scandir(self.tiles_dir):
+            info_path = os.path.join(entry.path, "info.json")
+            if entry.is_dir() and os.path.isfile(info_path):
+                pyramids.append((os.path.getmtime(info_path), entry.path))
+        for _, path in sorted(pyramids, reverse=True)[TILE_MAX_PYRAMIDS:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def viewer_url(self, key):
+        return f"/tiles/{key}/viewer"
+
+    def check_key(self, key):
+        if not KEY_PATTERN.match(key):
+            raise HTTPException(status_code=403, detail="Access denied")
+        info_path = os.path.join(self.pyramid_dir(key), "info.json")
+        if not os.path.isfile(info_path):
+            raise HTTPException(status_code=404, detail="Pyramid not found")
+        return info_path
+
+    def serve_tile(self, key: str, level: int, name: str):
+        self.check_key(key)
+        if not TILE_NAME_PATTERN.match(name):
+            raise HTTPException(status_code=403, detail="Access denied")
+        tile_path = os.path.join(self.pyramid_dir(key), str(level), name)
+        if not os.path.isfile(tile_path):
+            raise HTTPException(status_code=404, detail="Tile not found")
+        return FileResponse(tile_path, headers={"Cache-Control": "max-age=31536000, immutable"})
+
+    def serve_viewer(self, key: str):
+        with open(self.check_key(key)) as f:
+            info = f.read()
+        return HTMLResponse(VIEWER_HTML.replace("__INFO__", info).replace("__BASE__", f"/tiles/{key}"))
+
+tile_pyramid = TilePyramid()
+
+# Zoom viewer without external dependency (works offline): only the visible tiles of the level
+# matching the zoom are loaded, the lower levels already loaded are drawn below while they arrive.
+VIEWER_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Zoom</title>
+<style>html,body{margin:0;height:100%;overflow:hidden;background:#000}canvas{display:block;cursor:grab}
+#zoom{position:fixed;right:12px;bottom:8px;color:#aaa;font:12px sans-serif}</style></head>
+<body><canvas id="view"></canvas><div id="zoom"></div>
+<script>
+const info = __INFO__;
+const base = "__BASE__";
+const canvas = document.getElementById("view");
+const ctx = canvas.getContext("2d");
+const zoomLabel = document.getElementById("zoom");
+const tiles = new Map();
+const MAX_TILES = 600;
+let scale = 1, offsetX = 0, offsetY = 0, minScale = 1, pending = false;
+
+function fit() {
+  canvas.width = window.innerWidth; canvas.height = window.innerHeight;
+  minScale = Math.min(canvas.width / info.width, canvas.height / info.height);
+  scale = minScale;
+  offsetX = (canvas.width - info.width * scale) / 2;
+  offsetY = (canvas.height - info.height * scale) / 2;
+  draw();
+}
+
+function getTile(level, col, row) {
+  const key = level + "/" + col + "_" + row;
+  let tile = tiles.get(key);
+  if (tile) { tiles.delete(key); tiles.set(key, tile); return tile; }
+  tile = new Image();
+  tile.onload = draw;
+  tile.src = base + "/" + key + "." + info.format;
+  tiles.set(key, tile);
+  if (tiles.size > MAX_TILES) tiles.delete(tiles.keys().next().value);
+  return tile;
+}
+
+function drawLevel(level, load) {
+  const factor = Math.pow(2, info.max_level - level);
+  const size = info.tile_size, overlap = info.overlap;
+  const levelWidth = Math.ceil(info.width / factor), levelHeight = Math.ceil(info.height / factor);
+  const s = scale * factor;
+  const col0 = Math.max(0, Math.floor(-offsetX / s / size)), row0 = Math.max(0, Math.floor(-offsetY / s / size));
+  const col1 = Math.min(Math.ceil(levelWidth / size) - 1, Math.floor((canvas.width - offsetX) / s / size));
+  const row1 = Math.min(Math.ceil(levelHeight / size) - 1, Math.floor((canvas.height - offsetY) / s / size));
+  for (let row = row0; row <= row1; row++) {
+    for (let col = col0; col <= col1; col++) {
+      const key = level + "/" + col + "_" + row;
+      const tile = load ? getTile(level, col, row) : tiles.get(key);
+      if (!tile || !tile.complete || !tile.naturalWidth) continue;
+      const x = col * size - (col ? overlap : 0), y = row * size - (row ? overlap : 0);
+      ctx.drawImage(tile, offsetX + x * s, offsetY + y * s, tile.naturalWidth * s, tile.naturalHeight * s);
+    }
+  }
+}
+
+function draw() {
+  if (pending) return;
+  pending = true;
+  requestAnimationFrame(() => {
+    pending = false;
+    ctx.fillStyle = "#000"; ctx.fillRect(0, 0, canvas.width, canvas.height);
+    const level = Math.max(0, Math.min(info.max_level, Math.ceil(info.max_level + Math.log2(scale * window.devicePixelRatio))));
+    // coarse levels already loaded fill the holes while the tiles of the current level arrive
+    for (let l = Math.max(0, level - 4); l < level; l++) drawLevel(l, false);
+    drawLevel(level, true);
+    zoomLabel.textContent = Math.round(scale * 100) + "%";
+  });
+}
+
+function zoomAt(factor, x, y) {
+  const newScale = Math.max(minScale, Math.min(scale * factor, 4));
+  offsetX = x - (x - offsetX) * newScale / scale;
+  offsetY = y - (y - offsetY) * newScale / scale;
+  scale = newScale;
+  draw();
+}
+
+canvas.addEventListener("wheel", e => { e.preventDefault(); zoomAt(Math.exp(-e.deltaY * 0.002), e.clientX, e.clientY); }, {passive: false});
+canvas.addEventListener("dblclick", e => zoomAt(2, e.clientX, e.clientY));
+let drag = null;
+canvas.addEventListener("pointerdown", e => { drag = {x: e.clientX, y: e.clientY}; canvas.setPointerCapture(e.pointerId); canvas.style.cursor = "grabbing"; });
+canvas.addEventListener("pointermove", e => {
+  if (!drag) return;
+  offsetX += e.clientX - drag.x; offsetY += e.clientY - drag.y;
+  drag = {x: e.clientX, y: e.clientY};
+  draw();
+});
+canvas.addEventListener("pointerup", () => { drag = null; canvas.style.cursor = "grab"; });
+window.addEventListener("keydown", e => {
+  if (e.key === "+" || e.key === "=") zoomAt(1.5, canvas.width / 2, canvas.height / 2);
+  else if (e.key === "-") zoomAt(1 / 1.5, canvas.width / 2, canvas.height / 2);
+  else if (e.key === "0") fit();
+});
+window.addEventListener("resize", fit);
+fit();
+</script></body></html>
+"""
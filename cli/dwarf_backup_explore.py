@@ -2,8 +2,10 @@ import os
 import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
-from astropy.io import fits
+import numpy as np
+import cv2
 from datetime import datetime
+from api.fits_access import read_fits_section
 from api.dwarf_backup_fct import get_Backup_fullpath, open_folder
 from api.dwarf_backup_db_api import get_dwarf_Names, get_Objects_dwarf, get_countObjects_dwarf, get_ObjectSelect_dwarf
 from api.dwarf_backup_db_api import get_backupDrive_Names, get_backupDrive_dwarfId, get_backupDrive_dwarfNames, get_Objects_backup, get_countObjects_backup, get_ObjectSelect_backup
@@ -261,26 +263,26 @@ class ExploreApp:
 
     def load_fits_preview(self,fits_path):
         try:
-            with fits.open(fits_path) as hdul:
-                data = hdul[0].data
-                data = np.nan_to_num(data).squeeze()
+            # memory mapped strided section, large enough for the 400x400 display
+            data, _ = read_fits_section(fits_path, 400)
+            data = np.nan_to_num(data)
 
-                if data.ndim != 2:
-                    raise ValueError(f"Unsupported FITS data shape: {data.shape}")
+            if data.ndim != 2:
+                raise ValueError(f"Unsupported FITS data shape: {data.shape}")
 
-                # Normalize to 8-bit
-                norm_data = cv2.normalize(data, None, 0, 255, cv2.NORM_MINMAX)
-                norm_data = norm_data.astype(np.uint8)
+            # Normalize to 8-bit
+            norm_data = cv2.normalize(data, None, 0, 255, cv2.NORM_MINMAX)
+            norm_data = norm_data.astype(np.uint8)
 
-                # Debayer assuming RGGB (you may need to test BG, GR, GB depending on your camera)
-                rgb_image = cv2.cvtColor(norm_data, cv2.COLOR_BAYER_RG2RGB)
+            # Debayer assuming RGGB (you may need to test BG, GR, GB depending on your camera)
+            rgb_image = cv2.cvtColor(norm_data, cv2.COLOR_BAYER_RG2RGB)
 
-                # Resize to display size
-                rgb_image = cv2.resize(rgb_image, (400, 400), interpolation=cv2.INTER_AREA)
+            # Resize to display size
+            rgb_image = cv2.resize(rgb_image, (400, 400), interpolation=cv2.INTER_AREA)
 
-                # Convert to PIL for Tkinter display
-                img = Image.fromarray(rgb_image)
-                return ImageTk.PhotoImage(img)
+            # Convert to PIL for Tkinter display
+            img = Image.fromarray(rgb_image)
+            return ImageTk.PhotoImage(img)
 
         except Exception as e:
             print(f"Error loading FITS: {e}")
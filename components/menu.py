@@ -1,6 +1,9 @@
 # components/menu.py
 from nicegui import ui, app
 
+from components.transfer_status import transfer_status
+from components.preview_cache_settings import preview_cache_dialog
+
 def setStyle(color_primary = '#00ae83'):
 
     ui.colors(
@@ -22,7 +25,9 @@ def menu(title):
 
         #ui.button('Dwarf Connect').classes('text-sm')
 
-        with ui.button(icon='menu').classes('text-sm ml-auto'):
+        transfer_status()
+
+        with ui.button(icon='menu').classes('text-sm'):
             with ui.menu():
                 ui.menu_item('Home', on_click=lambda: ui.navigate.to('/'))
                 ui.menu_item('Dwarfs Settings', on_click=lambda: ui.navigate.to('/Dwarf'))
@@ -30,8 +35,10 @@ def menu(title):
                 ui.menu_item('Explore', on_click=lambda: ui.navigate.to('/Explore'))
                 ui.menu_item('Transfer', on_click=lambda: ui.navigate.to('/Transfer'))
                 ui.menu_item('TransferFtp', on_click=lambda: ui.navigate.to('/TransferFtp'))
+                ui.menu_item('Transfer Queue', on_click=lambda: ui.navigate.to('/TransferQueue'))
                 ui.menu_item('MtpDevice', on_click=lambda: ui.navigate.to('/MtpDevice'))
                 ui.menu_item('Catalog', on_click=lambda: ui.navigate.to('/Catalog'))
+                ui.menu_item('Preview Cache', on_click=lambda: preview_cache_dialog())
                 ui.menu_item('Dark Mode', on_click=lambda: dark_mode())
                 ui.menu_item('Light Mode', on_click=lambda: light_mode())
 
@@ -0,0 +1,46 @@
+from nicegui import ui, app
+
+from api.preview_cache import preview_cache, PREVIEW_CACHE_MAX_MB
+
+PREVIEW_CACHE_SETTING = 'preview_cache_max_mb'
+PREVIEW_CACHE_MIN_MB = 16
+
+def apply_preview_cache_setting():
+    """Size cap of the preview cache from the app settings, applied at startup."""
+    preview_cache.set_max_size(app.storage.general.get(PREVIEW_CACHE_SETTING, PREVIEW_CACHE_MAX_MB))
+
+def preview_cache_dialog():
+    """Usage of the preview cache and its size cap, opened from the menu."""
+
+    def show_stats():
+        stats = preview_cache.stats()
+        stats_label.set_text(
+            f"{stats['files']} previews, {stats['size'] / 1024 / 1024:.1f} MB of {stats['max_size'] / 1024 / 1024:.0f} MB | "
+            f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), {stats['evictions']} evicted"
+        )
+
+    def save():
+        if max_mb.value is None or max_mb.value < PREVIEW_CACHE_MIN_MB:
+            ui.notify(f"The size cap must be at least {PREVIEW_CACHE_MIN_MB} MB", type="negative")
+            return
+        app.storage.general[PREVIEW_CACHE_SETTING] = int(max_mb.value)
+        apply_preview_cache_setting()
+        show_stats()
+        ui.notify("✅ Preview cache size saved", type="positive")
+
+    def clear():
+        preview_cache.clear()
+        show_stats()
+
+    with ui.dialog() as dialog, ui.card().style('min-width: 500px'):
+        ui.label("Preview Cache").classes("text-lg font-bold")
+        stats_label = ui.label()
+        max_mb = ui.number("Size cap (MB)", value=app.storage.general.get(PREVIEW_CACHE_SETTING, PREVIEW_CACHE_MAX_MB),
+                           min=PREVIEW_CACHE_MIN_MB, step=64, format='%d')
+        with ui.row():
+            ui.button("Save", on_click=save)
+            ui.button("Clear", on_click=clear)
+            ui.button("Close", on_click=dialog.close)
+
+    show_stats()
+    dialog.open()
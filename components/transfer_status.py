@@ -0,0 +1,32 @@
+from nicegui import ui
+
+from api.dwarf_transfer_queue import get_transfer_queue, JOB_QUEUED, JOB_RUNNING, JOB_FAILED
+
+def transfer_status():
+    """Small indicator of the background transfer queue, shown by the menu on every page."""
+    transfer_queue = get_transfer_queue()
+
+    with ui.button(icon='sync', on_click=lambda: ui.navigate.to('/TransferQueue')).props('flat dense').classes('text-sm') as button:
+        badge = ui.badge('', color='orange').props('floating')
+        tooltip = ui.tooltip('Transfer Queue')
+
+    def refresh():
+        counts = transfer_queue.counts()
+        running = counts[JOB_RUNNING]
+        pending = running + counts[JOB_QUEUED]
+        running_jobs = [job for job in transfer_queue.jobs if job.status == JOB_RUNNING]
+        badge.set_text(str(pending) if pending else '')
+        badge.visible = bool(pending) or bool(counts[JOB_FAILED])
+        if counts[JOB_FAILED] and not pending:
+            badge.set_text('!')
+            badge.props('color=negative')
+        else:
+            badge.props('color=orange')
+        button.props(f'icon={"sync" if running else "sync_disabled" if not pending else "schedule"}')
+        if running_jobs:
+            tooltip.set_text(", ".join(f"{job.label} {job.progress}%" for job in running_jobs))
+        else:
+            tooltip.set_text(f"Transfer Queue: {counts[JOB_QUEUED]} waiting")
+
+    refresh()
+    ui.timer(1.0, refresh)
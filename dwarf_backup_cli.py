@@ -9,9 +9,11 @@ from datetime import datetime
 import re
 import platform
 import subprocess
+import time
+import tempfile
 import tkinter as tk
 from cli.dwarf_backup_ui import ConfigApp 
-from api.dwarf_backup_fct import scan_backup_folder
+from api.dwarf_backup_fct import scan_backup_folder, render_fits_preview
 
 from api.dwarf_backup_db import DB_NAME, connect_db, init_db, close_db, get_backup_entries, get_astro_object_summary
 
@@ -32,14 +34,72 @@ def show_astro_object_summary(conn):
     for name, count in get_astro_object_summary(conn):
         print(f"{name}: {count} file(s)")
 
+def legacy_fits_preview(fits_path):
+    """Reference for the benchmark: the previous full resolution preview (8 bits before debayering)."""
+    import numpy as np
+    import cv2
+    from astropy.io import fits
+    from auto_stretch import apply_stretch
+
+    with fits.open(fits_path) as hdul:
+        data = hdul[0].data
+    if data.ndim == 3:
+        image = np.transpose(data, (1, 2, 0)).astype(np.float32)
+        image = np.clip(image / np.max(image), 0, 1)
+    else:
+        data = data.astype(np.float32)
+        data -= np.min(data)
+        data /= np.max(data)
+        image = cv2.demosaicing((data * 255).astype(np.uint8), cv2.COLOR_BayerRG2RGB).astype(np.float32) / 255.0
+    height, width, channels = image.shape
+    image = apply_stretch(image.reshape(height, width * channels)).reshape(height, width, channels)
+    image = 1 / (1 + np.exp(-10 * (image - 0.5)))
+    image[..., 1] = np.clip(image[..., 1] - 0.45 * image[..., 1].mean(), 0, 1)
+    return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+def faint_levels(image):
+    """Distinct gray levels in the darker half of the image: posterized previews have few of them."""
+    import numpy as np
+    gray = image.astype(np.float32).mean(axis=2)
+    return len(np.unique(np.round(gray[gray <= np.median(gray)] * 3)))
+
+def median_level(image):
+    """Median gray level: the background brightness, the same stretch gives about the same value."""
+    import numpy as np
+    return float(np.median(image.astype(np.float32).mean(axis=2)))
+
+def benchmark_preview(fits_path, runs=3):
+    import cv2
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        preview_path = os.path.join(tmp_dir, "preview.png")
+        for name, render in (("legacy", legacy_fits_preview), ("current", lambda path: render_fits_preview(path, preview_path))):
+            durations = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                output = render(fits_path)
+                durations.append(time.perf_counter() - start)
+            image = output if name == "legacy" else cv2.imread(preview_path)
+            results[name] = (min(durations), image.shape, faint_levels(image), median_level(image))
+
+    print(f"📊 Preview benchmark: {fits_path} (best of {runs})")
+    for name, (duration, shape, levels, median) in results.items():
+        print(f"  {name:8} {duration:7.3f}s  {shape[1]}x{shape[0]}  {levels} faint levels  median {median:.0f}")
+    print(f"  speedup x{results['legacy'][0] / results['current'][0]:.1f}")
+
 def main():
     parser = argparse.ArgumentParser(description="Dwarf Backup Tool (Minimal CLI)")
     parser.add_argument("--gui", action="store_true", help="Launch the GUI for viewing Dwarf backup data")
     parser.add_argument("--dwarf-id", type=int, default=None, help="ID of the Dwarf device")
     parser.add_argument("--db", help="Database file", default=DB_NAME)
+    parser.add_argument("--bench-preview", metavar="FITS", help="Benchmark the FITS preview rendering on this file")
     parser.add_argument("folder", nargs="?", help="Backup folder to scan")
     args = parser.parse_args()
 
+    if args.bench_preview:
+        benchmark_preview(args.bench_preview)
+        return
+
 
     if args.gui:
         # Launch the Tkinter GUI
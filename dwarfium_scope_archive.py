@@ -13,16 +13,49 @@ import pages.dwarf_backup_ui_explore
 import pages.dwarf_mtp_devices
 import pages.dwarf_transfer
 import pages.dwarf_transfer_ftp
+import pages.dwarf_transfer_queue
 import pages.dwarf_dso_catalog
 
 from api.image_preview import serve_preview
+from api.preview_cache import preview_cache
+from api.tile_pyramid import tile_pyramid
+from api.thumbnail_sprites import sprite_sheets
+from api.archive_api import archive_api
+from api.dwarf_transfer_queue import start_transfer_queue, stop_transfer_queue
+from api.dwarf_backup_fct_ftp import close_ftp_sessions
+from components.preview_cache_settings import apply_preview_cache_setting
 
 app.native.settings['ALLOW_DOWNLOADS'] = True
 
+# Background transfers run independently of the pages
+app.on_startup(start_transfer_queue)
+app.on_shutdown(stop_transfer_queue)
+app.on_shutdown(close_ftp_sessions)
+app.on_startup(apply_preview_cache_setting)
+
 @app.get('/preview/{file_path:path}')
 def preview_image(file_path: str):
     return serve_preview(file_path)
 
+@app.get('/preview_cache/{name}')
+def preview_cache_image(name: str):
+    return preview_cache.serve(name)
+
+@app.get('/tiles/{key}/viewer')
+def tiles_viewer(key: str):
+    return tile_pyramid.serve_viewer(key)
+
+@app.get('/tiles/{key}/{level}/{name}')
+def tiles_image(key: str, level: int, name: str):
+    return tile_pyramid.serve_tile(key, level, name)
+
+@app.get('/sprites/{name}')
+def sprite_sheet(name: str):
+    return sprite_sheets.serve(name)
+
+# Read-only JSON queries of the archive (objects, sessions, drives, Dwarfs, stats)
+app.include_router(archive_api)
+
 
 ui.run( title="Dwarfium Scope Archive",
         storage_secret='Dwarfiumscopearchive key to secure the browser session cookie',
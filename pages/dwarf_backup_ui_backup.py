@@ -6,6 +6,7 @@ from nicegui import native, app, run, ui
 
 from api.dwarf_backup_db import DB_NAME, connect_db, close_db, init_db
 from api.dwarf_backup_fct import scan_backup_folder, insert_or_get_backup_drive 
+from api.preview_pregen import pregenerate_previews
 
 from api.dwarf_backup_db_api import get_dwarf_Names
 from api.dwarf_backup_db_api import get_backupDrive_detail, set_backupDrive_detail, get_backupDrive_list, get_backupDrive_id_from_location, add_backupDrive_detail, del_backupDrive
@@ -34,6 +35,7 @@ class ConfigApp:
         self.backupDrive_id = BackupId
         self.backup_scan_date = None
 
+        self.cancel_previews = False
         self.WinLog = WinLog()
         self.build_ui()
 
@@ -297,16 +299,26 @@ class ConfigApp:
 
             # Dialog to block interaction and show progress
             with ui.dialog().props('persistent')  as dialog, ui.card().style('width: 800px; max-width: none'):
-                ui.label(f"🔍 Scanning: {location}-{astroDir}, please wait...")
+                status_label = ui.label(f"🔍 Scanning: {location}-{astroDir}, please wait...")
                 ui.spinner(size="lg")
                 log = ui.log(max_lines=20).classes('w-full').style('height: 400px; overflow: hidden;')
+                skip_previews_btn = ui.button("Skip previews", on_click=self.skip_previews)
+                skip_previews_btn.visible = False
 
             dialog.open()  # show the dialog
 
             ui.notify(f"🔍 Scanning: {location}-{astroDir}")
-            total, deleted = await run.io_bound (scan_backup_folder,DB_NAME, location, astroDir, dwarf_id, backup_drive_id, None, log)
+            new_sessions = []
+            total, deleted = await run.io_bound (scan_backup_folder,DB_NAME, location, astroDir, dwarf_id, backup_drive_id, None, log, new_sessions)
             ui.notify(f"✅ Analysis Complete: {total} new sessions found, {deleted} sessions deleted.", type="positive")
 
+            if new_sessions:
+                # previews of the new sessions are ready before the first visit in Explore
+                status_label.set_text("🖼️ Preparing previews of the new sessions...")
+                self.cancel_previews = False
+                skip_previews_btn.visible = True
+                await run.io_bound (pregenerate_previews, new_sessions, log, lambda: self.cancel_previews)
+
         except Exception as e:
             ui.notify(f"❌ Error: {str(e)}", type="negative")
 
@@ -314,6 +326,9 @@ class ConfigApp:
             dialog.close()  # close dialog even if error occurs
             self.load_selected_backupDrive(None)
 
+    def skip_previews(self):
+        self.cancel_previews = True
+
     async def confirm_and_delete_BackupDrive(self):
         if self.backupDrive_id is None:
             ui.notify("No Backup Drive selected", type="negative")
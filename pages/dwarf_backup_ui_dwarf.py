@@ -4,7 +4,8 @@ import os
 import re
 from api.dwarf_backup_db import DB_NAME, connect_db, close_db, init_db
 from api.dwarf_backup_fct import create_local_dwarf_dir, get_local_dwarf_dir, sync_dwarf_sessions, scan_backup_folder, insert_or_get_backup_drive
-from api.dwarf_backup_fct_ftp import ftp_conn, check_ftp_connection, connect_to_dwarf, ftp_sync_dwarf_sessions
+from api.preview_pregen import pregenerate_previews
+from api.dwarf_backup_fct_ftp import check_ftp_connection, connect_to_dwarf, scan_dwarf_ftp
 from api.dwarf_backup_fct_ftp import DWARF2_FTP_PATH, DWARF3_FTP_PATH
 
 from api.dwarf_backup_mtp_handler import MTPManager 
@@ -44,6 +45,7 @@ class ConfigApp:
         self.device_path = None
         self.dwarf_scan_date = None
         self.mtp_status_label = None
+        self.cancel_previews = False
         self.WinLog = WinLog()
         self.build_ui()
 
@@ -56,6 +58,7 @@ class ConfigApp:
             with ui.grid(columns=2):
                 ui.button("Show All Current Dwarf Data", on_click=lambda: ui.navigate.to(self.get_explore_url()))
                 ui.button("Analyze Dwarf Drive", on_click=self.analyze_usb_drive)
+            self.ftp_local_copy = ui.checkbox("Keep a local copy of the sessions when analyzing over FTP", value=True)
 
             ui.separator()
 
@@ -391,7 +394,6 @@ class ConfigApp:
             ui.notify("Dwarf Device not connected", type="negative")
             return
 
-        ftp = None
         if self.dwarf_status == "USB":
             dwarf_location = self.dwarf_astroDir.value.strip()
             if not dwarf_location:
@@ -408,9 +410,7 @@ class ConfigApp:
             else:
                 ui.notify("Unsupported Device", type="negative")
                 return
-            ftp_ctx = ftp_conn(self.dwarf_ip_sta_mode.value) if self.dwarf_ip_sta_mode.value else None
-            ftp = ftp_ctx.__enter__() if ftp_ctx else None
-            if not ftp:
+            if not self.dwarf_ip_sta_mode.value:
                 ui.notify("FTP disconnected", type="negative")
                 return
         else:
@@ -419,25 +419,36 @@ class ConfigApp:
 
         # Dialog to block interaction and show progress
         with ui.dialog().props('persistent')  as dialog, ui.card().style('width: 800px; max-width: none'):
-            ui.label("🔍 Scanning Dwarf drive, please wait...")
+            status_label = ui.label("🔍 Scanning Dwarf drive, please wait...")
             ui.spinner(size="lg")
             log = ui.log(max_lines=20).classes('w-full').style('height: 400px; overflow: hidden;')
+            skip_previews_btn = ui.button("Skip previews", on_click=self.skip_previews)
+            skip_previews_btn.visible = False
 
         dialog.open()  # show the dialog
 
         try:
+            if self.dwarf_status == "FTP":
+                # Sessions are read directly on the Dwarf, the local copy is optional
+                local_Main_Dwarf_dir = create_local_dwarf_dir() if self.ftp_local_copy.value else None
+                ui.notify("Starting FTP Analysis ...")
+                new_sessions = []
+                total, deleted = await run.io_bound (scan_dwarf_ftp, DB_NAME, self.dwarf_ip_sta_mode.value, dwarf_location, self.dwarf_id, local_Main_Dwarf_dir, log, new_sessions=new_sessions)
+                ui.notify(f"✅ Analysis Complete: {total} new sessions found, {deleted} sessions deleted.", type="positive")
+                await self.pregenerate_new_previews(new_sessions, status_label, skip_previews_btn, log)
+                return
+
             local_Main_Dwarf_dir = create_local_dwarf_dir()
             if local_Main_Dwarf_dir:
                 ui.notify("Starting Local Sync ...")
-                if self.dwarf_status == "USB":
-                    await run.io_bound (sync_dwarf_sessions, self.dwarf_id, dwarf_location, local_Main_Dwarf_dir,log)
-                if self.dwarf_status == "FTP":
-                    await run.io_bound (ftp_sync_dwarf_sessions, ftp, self.dwarf_id, dwarf_location, local_Main_Dwarf_dir,log)
+                await run.io_bound (sync_dwarf_sessions, self.dwarf_id, dwarf_location, local_Main_Dwarf_dir,log)
                 local_Dwarf_dir = get_local_dwarf_dir(self.dwarf_id)
                 print(local_Dwarf_dir)
                 ui.notify("Starting Analysis ...")
-                total, deleted = await run.io_bound (scan_backup_folder, DB_NAME, local_Dwarf_dir, None, self.dwarf_id, None,  None, log)
+                new_sessions = []
+                total, deleted = await run.io_bound (scan_backup_folder, DB_NAME, local_Dwarf_dir, None, self.dwarf_id, None,  None, log, new_sessions)
                 ui.notify(f"✅ Analysis Complete: {total} new sessions found, {deleted} sessions deleted.", type="positive")
+                await self.pregenerate_new_previews(new_sessions, status_label, skip_previews_btn, log)
             else:
                ui.notify(f"❌ Error: can't create Local Dwarf Directory", type="negative")
 
@@ -448,6 +459,18 @@ class ConfigApp:
             dialog.close()  # close dialog even if error occurs
             await self.load_selected_dwarf(None)
 
+    async def pregenerate_new_previews(self, new_sessions, status_label, skip_previews_btn, log):
+        if not new_sessions:
+            return
+        # previews of the new sessions are ready before the first visit in Explore
+        status_label.set_text("🖼️ Preparing previews of the new sessions...")
+        self.cancel_previews = False
+        skip_previews_btn.visible = True
+        await run.io_bound (pregenerate_previews, new_sessions, log, lambda: self.cancel_previews)
+
+    def skip_previews(self):
+        self.cancel_previews = True
+
     async def confirm_and_delete_Dwarf(self):
         if self.dwarf_id is None:
             ui.notify("No Dwarf selected", type="negative")
@@ -1,4 +1,5 @@
 import os
+import html
 import mimetypes
 from astropy.io import fits
 from datetime import datetime
@@ -6,27 +7,42 @@ from collections import defaultdict
 from pathlib import Path
 import subprocess
 
-from nicegui import app, ui
+from nicegui import app, run, ui
 from api.dwarf_backup_db import DB_NAME, connect_db
 from api.dwarf_backup_db_api import (
     get_dwarf_Names, get_dwarf_detail, get_Objects_dwarf, get_countObjects_dwarf, get_ObjectSelect_dwarf,
     get_backupDrive_Names, get_backupDrive_dwarfId, get_backupDrive_dwarfNames,
     get_Objects_backup, get_countObjects_backup, get_ObjectSelect_backup,
     get_Objects_duplicate_backup, get_countObjects_duplicate_backup, get_ObjectSelect_duplicate_backup,
-    get_session_present_in_Dwarf, get_session_present_in_backupDrive, toggle_favorite
+    get_session_present_in_Dwarf, get_session_present_in_backupDrive, toggle_favorite, get_subframe_summary,
+    get_session_stats, get_sessions_quality, get_subframes, set_subframes_excluded, get_dso_search_terms
 )
 from api.dwarf_backup_fct import (
-    get_Backup_fullpath, get_extension, check_files, get_file_path, generate_fits_preview, show_date_session,
+    get_Backup_fullpath, get_extension, check_files, get_file_path, get_preview_renderer, PREVIEW_MAX_SIZE, show_date_session,
     get_directory_size, count_fits_files, count_failed_fits_files, count_tiff_files, count_failed_tiff_files,
     hours_to_hms, deg_to_dms, is_path_local_dwarf_dir, get_total_exposure
 )
 from api.image_preview import set_base_folder, build_preview_url
+from api.preview_cache import preview_cache
+from api.tile_pyramid import tile_pyramid
+from api.frame_quality import analyze_session_quality
+from api.thumbnail_sprites import sprite_sheets, SPRITE_CELL_SIZE
+from api.quick_stack import quick_stack_session, get_session_panels, QUICK_STACK_METHODS
+from api.object_search import ObjectSearchIndex, match_pattern, highlight_match
+from api.session_prefetch import SessionPrefetcher
 from components.menu import menu
 
 ALL_BACKUPS = "(All Backups)"
 ALL_DWARFS = "(All Dwarfs)"
 TAKEN = "Taken"
 RESTACK = "Restack"
+PREVIEW_ERROR_IMAGE = "image/image-error.png"
+GALLERY_PAGE_SIZE = 200
+SESSION_SORTS = {"date": "Date", "fwhm": "Best FWHM", "stars": "Most stars", "noise": "Lowest noise"}
+# Delay (ms) after the last keystroke before the object filter is applied
+OBJECT_FILTER_DEBOUNCE = 250
+# Sessions before and after the one shown whose details are loaded in the background
+SESSION_PREFETCH_NEIGHBOURS = 1
 @ui.page('/Explore/')
 def dwarf_explore(BackupDriveId:int = None, DwarfId:int = None, mode:str = 'backup', back_url:str = None):
 
@@ -52,7 +68,16 @@ class ExploreApp:
         self.dwarf_options = []
         self.backup_options = []
         self.all_files_rows = []
+        # rows of the sessions selector by entry id (BackupEntry / DwarfEntry), the keys of its options
+        self.session_rows = {}
+        self.session_order = {}
+        # details of the sessions next to the one shown, loaded in the background
+        self.session_prefetcher = SessionPrefetcher(database, mode)
+        self.session_details = None
         self.objects = []
+        self.object_entries = []
+        self.object_search = ObjectSearchIndex({})
+        self.object_rows = {}
         self.base_folder = None
         self.selected_object = None
         self.selected_object_description = None
@@ -64,6 +89,10 @@ class ExploreApp:
         self.backup_session_icon = {}
         self.image_dialog = {}
         self.selected_path = ""
+        self.selected_data_id = None
+        self.subframe_summary = None
+        self.session_stats = None
+        self.selected_object_args = None
         self.build_ui()
 
     def build_ui(self):
@@ -113,23 +142,46 @@ class ExploreApp:
 
                     self.count_label = ui.label("Total matching sessions: 0")
                     with ui.card().tight().classes('w-full'):
-                        self.object_filter = ui.input(placeholder='🔍 Filter objects...', on_change=lambda e: self.load_objects_ui() ).classes('m-4').props('clearable')
-                        self.object_list = ui.list().classes('h-150 overflow-y-auto')
+                        self.object_filter = ui.input(placeholder='🔍 Filter objects...', on_change=lambda e: self.load_objects_ui() ).classes('m-4').props(f'clearable debounce={OBJECT_FILTER_DEBOUNCE}')
+                        ui.label('List Objects').classes('text-bold px-4')
+                        # virtual scroll: only the visible rows are rendered, the selection is a CSS rule
+                        self.object_list = ui.table(columns=[{'name': 'label', 'label': 'Object', 'field': 'label', 'align': 'left'}],
+                                                    rows=[], row_key='key', pagination={'rowsPerPage': 0}).classes('h-150 w-full')
+                        self.object_list.props('virtual-scroll flat dense hide-header hide-bottom')
+                        self.object_list.add_slot('body', r'''
+                          <q-tr :props="props" :data-key="props.row.key" class="object-row cursor-pointer" @click="$parent.$emit('select_object', props.row.key)">
+                            <q-td key="label" :props="props" :class="props.row.all ? 'font-bold text-blue-600' : ''">
+                              <span v-if="props.row.html" v-html="props.row.html"></span>
+                              <span v-else>{{ props.row.label }}</span>
+                            </q-td>
+                          </q-tr>
+                        ''')
+                        self.object_list.on('select_object', lambda e: self.on_object_row_click(e.args))
+                        self.object_highlight = ui.html('', sanitize=False)
 
                 with ui.column().classes('w-full'):
                     # Create the dialog that simulates fullscreen
                     with ui.dialog().props('maximized') as self.image_dialog, ui.card().classes("w-full h-full no-padding"):
-                        self.fullscreen_image = ui.image().classes('w-full h-full object-contain')
+                        # zoom viewer on the tile pyramid of the image (only the visible tiles are loaded)
+                        self.fullscreen_image = ui.element('iframe').classes('w-full h-full').style('border: none')
+                        ui.button(icon='close', on_click=self.image_dialog.close).props('flat round color=white').classes('absolute top-2 right-2')
 
                     with ui.row().classes('w-full'):
                         with ui.column().classes('w-full'):
-                            ui.label('Session List')
+                            with ui.row().classes('w-full items-center'):
+                                ui.label('Session List')
+                                # quality of the analyzed frames (frame quality dialog)
+                                self.session_sort = ui.select(SESSION_SORTS, value="date", label="Sort by", on_change=self.on_session_sort_change).props('dense outlined').classes('w-40')
+                                self.only_analyzed = ui.checkbox("Only analyzed sessions", on_change=self.on_session_sort_change)
+                                ui.button("🖼️ Gallery", on_click=self.open_session_gallery).props('dense')
                             self.file_list = ui.select(options=[], on_change=self.on_file_selected).props('outlined').style('overflow-x: auto;')
                             self.file_list.style('overflow: hidden; text-overflow: ellipsis;')
 
                         with ui.row().classes('items-center gap-4') as self.icon_row:
                             self.open_folder_icon = ui.button("🗁 Open", on_click=lambda: self.open_folder()).classes('h-16')
                             self.fullscreen_icon = ui.button("Show Fullscreen Image", on_click=self.show_fullscreen_image).classes('h-16')
+                            self.quality_icon = ui.button("🔬 Frame Quality", on_click=self.open_quality_dialog).classes('h-16')
+                            self.quick_stack_icon = ui.button("🧮 Quick Stack", on_click=self.open_quick_stack_dialog).classes('h-16')
                             self.backup_session_icon = ui.button("Backup Session", on_click=lambda: ui.navigate.to(self.get_backup_url())).classes('h-16')
                             self.backup_session_icon.visible = False
                             self.update_preview_icons()  # populate icons
@@ -161,11 +213,23 @@ class ExploreApp:
             self.populate_dwarf_filter()
 
         self.selected_path = ""
+        self.subframe_summary = None
+        self.session_stats = None
 
-    def show_fullscreen_image(self):
+    async def show_fullscreen_image(self):
         if self.fullscreen_image.visible: 
-            self.image_dialog.open()
-            ui.notify("Press ESC to close the image", position="top", type="info")
+            await self.open_zoom_viewer(self.preview_image_path)
+
+    async def open_zoom_viewer(self, image_path):
+        ui.notify("Preparing the zoomable image...", position="top", type="info")
+        try:
+            key = await run.io_bound(tile_pyramid.build, image_path)
+        except Exception as e:
+            ui.notify(f"❌ Error: {str(e)}", type="negative")
+            return
+        self.fullscreen_image.props(f'src="{tile_pyramid.viewer_url(key)}"')
+        self.image_dialog.open()
+        ui.notify("Scroll to zoom, drag to move, press ESC to close the image", position="top", type="info")
 
     def populate_backup_filter(self):
         print(f"backup_filter: {self.BackupDriveId}")
@@ -269,8 +333,23 @@ class ExploreApp:
         print (f"Total objects: {[f"{oid} - {name} {dso_id}" for oid, name, dso_id in self.objects]}")
         self.selected_object = None
         self.selected_object_description = None
+        self.object_entries = self.build_object_entries(self.objects)
+        self.object_search = self.build_object_search(self.object_entries)
         self.load_objects_ui()
 
+    def build_object_entries(self, objects):
+        """Names parsed once per load: (oid, name, name_object, main_part, dso_id)."""
+        entries = []
+        for oid, name, dso_id in objects:
+            name_object, main_part = self.get_name_object(name)
+            entries.append((oid, name, name_object, main_part, dso_id))
+        return entries
+
+    def build_object_search(self, entries):
+        """Search index of the objects on their names and descriptions, and the designation and alternate names of their DSO."""
+        dso_terms = get_dso_search_terms(self.conn, {entry[4] for entry in entries if entry[4] is not None})
+        return ObjectSearchIndex({oid: [name_object, name, *dso_terms.get(dso_id, [])] for oid, name, name_object, _, dso_id in entries})
+
     def get_name_object(self, name):
         name_object = name #name.split(" (")[0]
         # Get before " (" if present
@@ -285,73 +364,78 @@ class ExploreApp:
         return name_object, main_part
 
     def load_objects_ui(self, init_view = True):
-
-        self.object_list.clear()
+        search = self.object_filter.value or ""
+        matches = self.object_search.search(search)
+        pattern = match_pattern(search)
         filter_dso = set()
-        visible_names = []
-
         dso_id_counts = defaultdict(int)
-        for _, name, dso_id in self.objects:
-            name_object, main_part = self.get_name_object(name)
+        visible = []
+        for entry in self.object_entries:
+            dso_id = entry[4]
             # Apply filter
-            if self.object_filter.value and self.object_filter.value.lower() not in name_object.lower():
+            if matches is not None and entry[0] not in matches:
                 if dso_id is not None:
                     filter_dso.add(dso_id)
                 continue
-
+            visible.append(entry)
             if dso_id is not None:
                 dso_id_counts[dso_id] += 1
 
-        # Step 2 – Track if [ALL] line was already shown
+        # [ALL] line before the first object of a DSO when all its objects are shown
+        rows = []
+        self.object_rows = {}
         shown_all_for_dso = set()
-
-        with self.object_list:
-            ui.item_label('List Objects').props('header').classes('text-bold')
-            ui.separator()
-            for oid, name, dso_id in self.objects:
-                name_object, main_part = self.get_name_object(name)
-
-                # Apply filter
-                if self.object_filter.value and self.object_filter.value.lower() not in name_object.lower():
-                    continue
-
-                visible_names.append(name_object)
-
-                # Insert the [ALL] line if needed
-                if dso_id is not None and dso_id_counts[dso_id] > 1 and dso_id not in shown_all_for_dso and dso_id not in filter_dso :
-                    all_name = f"{main_part} [ALL]"
-                    visible_names.append(all_name)  # 👈 ADD [ALL] entry to visible_names
-                    item_all = ui.item(all_name, on_click=lambda dso_id=dso_id, name=all_name, desc=name : self._handle_object_click(None, name, desc, dso_id))
-                    item_all.classes('font-bold text-blue-600')  # Optional styling
-                    if all_name == self.selected_object:
-                        item_all.classes('bg-primary text-white')
-                    else:
-                        item_all.classes('bg-transparent')
-                    shown_all_for_dso.add(dso_id)
-
-                # Add the actual object
-                item = ui.item(name_object, on_click=lambda oid=oid, name=name_object, desc=name : self._handle_object_click(oid, name, desc, None))
-
-                # Highlight if selected
-                if name_object == self.selected_object:
-                    item.classes('bg-primary text-white')  # Change background and text color
-                else:
-                    item.classes('bg-transparent')  # Normal background
+        for oid, name, name_object, main_part, dso_id in visible:
+            if dso_id is not None and dso_id_counts[dso_id] > 1 and dso_id not in shown_all_for_dso and dso_id not in filter_dso:
+                all_name = f"{main_part} [ALL]"
+                key = f"a{dso_id}"
+                rows.append({'key': key, 'label': all_name, 'all': True, 'html': highlight_match(all_name, pattern)})
+                self.object_rows[key] = (None, all_name, name, dso_id)
+                shown_all_for_dso.add(dso_id)
+            key = f"o{oid}"
+            rows.append({'key': key, 'label': name_object, 'all': False, 'html': self.object_match_html(oid, name_object, pattern)})
+            self.object_rows[key] = (oid, name_object, name, None)
+
+        self.object_list.rows = rows
+        self.object_list.update()
 
         # ❗ Clear selection if it's no longer in the filtered results
-        if self.selected_object not in visible_names:
+        if self.selected_object not in {row['label'] for row in rows}:
             self.selected_object = None
             self.clear_selected_object()
- 
-        # Force UI update after setting selected_object
-        self.object_list.update()  # Refresh the list
-        ui.update()  # Refresh the UI
+        self.update_object_highlight()
+
+    def object_match_html(self, oid, name_object, pattern):
+        """Name with the match of the filter marked, or followed by the catalog name that matched."""
+        if pattern is None:
+            return None
+        marked = highlight_match(name_object, pattern)
+        if marked:
+            return marked
+        matched = self.object_search.matched_text(oid, pattern)
+        marked_match = highlight_match(matched, pattern) if matched else None
+        if not marked_match:
+            return None
+        return f'{html.escape(name_object)} <span class="text-grey-6">({marked_match})</span>'
+
+    def update_object_highlight(self):
+        key = next((key for key, row in self.object_rows.items() if row[1] == self.selected_object), None)
+        if key is None:
+            self.object_highlight.set_content('')
+        else:
+            self.object_highlight.set_content(f'<style>.object-row[data-key="{key}"] {{ background: var(--q-primary); color: white; }}</style>')
+
+    def on_object_row_click(self, key):
+        row = self.object_rows.get(key)
+        if row:
+            oid, name, desc, dso_id = row
+            self._handle_object_click(oid, name, desc, dso_id)
 
     def _handle_object_click(self, oid, name, desc, dso_id):
         self.selected_object = name 
         self.selected_object_description = desc 
         self.select_object(oid, dso_id)
-        self.load_objects_ui()
+        self.update_object_highlight()
 
     def clear_selected_object(self):
         self.fullscreen_image.visible = False
@@ -360,24 +444,21 @@ class ExploreApp:
         self.details_files.clear()
         self.details_preview.clear()
         self.reset_preview_icons()
+        self.session_rows = {}
+        self.session_order = {}
+        self.session_details = None
         self.file_list.set_options([])
 
     def select_object(self, object_id, dso_id):
-        dwarf_id = self.get_selected_dwarf_id()
         details = []
         self.clear_selected_object()
-
-        if self.mode == "backup":
-            show_only_duplicates = self.only_duplicates_backup.value if self.only_duplicates_backup else False
-            if show_only_duplicates:
-                files = get_ObjectSelect_duplicate_backup(self.conn, object_id, dso_id, self.BackupDriveId, dwarf_id, self.only_on_dwarf.value, self.only_on_backup.value)
-            else:
-                files = get_ObjectSelect_backup(self.conn, object_id, dso_id, self.BackupDriveId, dwarf_id, self.only_on_dwarf.value, self.only_on_backup.value)
-        else:
-            files = get_ObjectSelect_dwarf(self.conn, object_id, dso_id, dwarf_id, self.only_on_dwarf.value, self.only_on_backup.value)
+        self.selected_object_args = (object_id, dso_id)
+        files = self.sort_session_rows(self.fetch_session_rows(object_id, dso_id))
 
         # Store all rows globally so we can access them later
         self.all_files_rows = files
+        self.session_rows = {row[16]: row for row in files}
+        self.session_order = {row[16]: index for index, row in enumerate(files)}
     
         if len(files) == 0:
      
@@ -392,25 +473,17 @@ class ExploreApp:
 
             full_path = get_Backup_fullpath (backup_path, "", file_path)
             
-            select_file = [file_path]
-            self.file_list.set_options(select_file, value=select_file[0])
+            self.file_list.set_options({files[0][16]: file_path}, value=files[0][16])
 
         else:
             # Populate combobox with readable file names
             self.all_files_rows = files
             details = []
-            select_file = [f'Select a session for {self.selected_object}']
+            select_file = {'': f'Select a session for {self.selected_object}'}
             stackeds = 0
             total_time_exp = 0
 
             for row in files:
-                # Extracting values for clarity
-                device = row[9]
-                session_date = show_date_session(row[7])
-                lens = "(W) " if ("_WIDE_") in row[8] else ""
-                exp = f"{row[2]}s" if row[2] is not None else "N/A"
-                gain = row[3] if row[3] is not None else "N/A"
-                astro_filter = row[4]
                 stacks = row[5]
                 is_favorite = row[12]  # The favorite column (0 or 1)
                 stackeds += stacks
@@ -419,24 +492,218 @@ class ExploreApp:
 
                 # Displaying star icon based on favorite status only in backup mode
                 star_icon = '⭐ ' if is_favorite else '☆ '
-                info_stack = RESTACK if self.is_Restacked(row[8]) else TAKEN
+                label = self.session_label(row)
                 # Building the details string with the star icon
-                details.append(
-                    f"{star_icon}{info_stack} with {device} {lens}| {session_date}, exp {exp}, gain {gain}, filter {astro_filter}, stacks {stacks}"
-                )
-
-                select_file.append(
-                    f"{info_stack} with {device} {lens}| {session_date}, exp {exp}, gain {gain}, filter {astro_filter}, stacks {stacks}"
-                )
+                details.append((row[16], f"{star_icon}{label}"))
+                select_file[row[16]] = label
 
-            self.file_list.set_options(select_file, value=f'Select a session for {self.selected_object}')
+            self.file_list.set_options(select_file, value='')
 
             with self.details_files:
                 ui.item_label(f"{len(files)} sessions were found, totaling {stackeds} stacks and a total exposure time of {self.format_seconds_hms(total_time_exp)}.").props('header').classes('text-bold')
                 ui.separator()
 
-                for data_detail in details:
-                   ui.item(data_detail, on_click=lambda i=data_detail.lstrip('⭐').lstrip('☆').strip(): self.file_list.set_value(i)).props('clickable').classes('cursor-pointer')
+                for entry_id, data_detail in details:
+                   ui.item(data_detail, on_click=lambda i=entry_id: self.file_list.set_value(i)).props('clickable').classes('cursor-pointer')
+
+    def fetch_session_rows(self, object_id=None, dso_id=None):
+        """Sessions of an object, or all the sessions of the current filters without object."""
+        dwarf_id = self.get_selected_dwarf_id()
+        if self.mode == "backup":
+            show_only_duplicates = self.only_duplicates_backup.value if self.only_duplicates_backup else False
+            if show_only_duplicates:
+                return get_ObjectSelect_duplicate_backup(self.conn, object_id, dso_id, self.BackupDriveId, dwarf_id, self.only_on_dwarf.value, self.only_on_backup.value)
+            return get_ObjectSelect_backup(self.conn, object_id, dso_id, self.BackupDriveId, dwarf_id, self.only_on_dwarf.value, self.only_on_backup.value)
+        return get_ObjectSelect_dwarf(self.conn, object_id, dso_id, dwarf_id, self.only_on_dwarf.value, self.only_on_backup.value)
+
+    def session_label(self, row):
+        lens = "(W) " if ("_WIDE_") in row[8] else ""
+        exp = f"{row[2]}s" if row[2] is not None else "N/A"
+        gain = row[3] if row[3] is not None else "N/A"
+        info_stack = RESTACK if self.is_Restacked(row[8]) else TAKEN
+        return f"{info_stack} with {row[9]} {lens}| {show_date_session(row[7])}, exp {exp}, gain {gain}, filter {row[4]}, stacks {row[5]}"
+
+    async def open_session_gallery(self):
+        # sessions of the selected object, otherwise all the sessions of the drive / Dwarf
+        object_gallery = bool(self.selected_object_args and self.all_files_rows)
+        rows = self.all_files_rows if object_gallery else self.fetch_session_rows()
+        if not rows:
+            ui.notify("No session to show", position="top", type="warning")
+            return
+        title = self.selected_object if object_gallery else f"{len(rows)} sessions"
+        pages = -(-len(rows) // GALLERY_PAGE_SIZE)
+        dwarf_id = self.get_selected_dwarf_id()
+
+        async def show_page(page):
+            page_rows = rows[(page - 1) * GALLERY_PAGE_SIZE:page * GALLERY_PAGE_SIZE]
+            paths = [get_Backup_fullpath(row[6], "", row[1], dwarf_id) for row in page_rows]
+            status.text = "Loading thumbnails..."
+            urls, cells = await run.io_bound(sprite_sheets.build, paths)
+            status.text = f"{len(rows)} sessions"
+            grid.clear()
+            with grid:
+                for row, path, (sheet, x, y) in zip(page_rows, paths, cells):
+                    tile = ui.element('div').classes('cursor-pointer rounded hover:opacity-80').style(
+                        f'width: {SPRITE_CELL_SIZE}px; height: {SPRITE_CELL_SIZE}px; background: url("{urls[sheet]}") -{x}px -{y}px')
+                    tile.tooltip(f"{row[13] or ''} | {show_date_session(row[7])}")
+                    tile.on('click', lambda _, row=row, path=path: open_session(row, path))
+
+        async def open_session(row, path):
+            if object_gallery:
+                dialog.close()
+                self.file_list.set_value(row[16])
+            else:
+                await self.open_zoom_viewer(path)
+
+        with ui.dialog().props('maximized') as dialog, ui.card().classes('w-full h-full'):
+            with ui.row().classes('w-full items-center'):
+                ui.label(f'🖼️ {title}').classes('text-lg font-semibold mr-auto')
+                status = ui.label("")
+                if pages > 1:
+                    ui.pagination(1, pages, direction_links=True, on_change=lambda e: show_page(e.value))
+                ui.button("Close", on_click=dialog.close)
+            grid = ui.row().classes('w-full gap-1 overflow-y-auto')
+
+        dialog.open()
+        await show_page(1)
+
+    def sort_session_rows(self, files):
+        """Order (and filter) the sessions by the quality of their analyzed frames."""
+        sort_key = self.session_sort.value
+        if sort_key == "date" and not self.only_analyzed.value:
+            return files
+        quality = get_sessions_quality(self.conn, [row[0] for row in files])
+        if self.only_analyzed.value:
+            files = [row for row in files if row[0] in quality]
+        if sort_key == "fwhm":
+            return sorted(files, key=lambda row: (quality.get(row[0], (0, None))[1] is None, quality.get(row[0], (0, 0))[1] or 0))
+        if sort_key == "stars":
+            return sorted(files, key=lambda row: -(quality.get(row[0], (0, 0, 0))[2] or 0))
+        if sort_key == "noise":
+            return sorted(files, key=lambda row: (row[0] not in quality, quality.get(row[0], (0, 0, 0, 0))[3] or 0))
+        return files
+
+    def on_session_sort_change(self):
+        if self.selected_object_args:
+            self.select_object(*self.selected_object_args)
+
+    async def open_quality_dialog(self):
+        if not self.selected_data_id or not self.selected_path:
+            ui.notify("Select a session first", position="top", type="warning")
+            return
+        data_id = self.selected_data_id
+        session_dir = self.selected_path
+
+        columns = [
+            {'name': 'file_name', 'label': 'Frame', 'field': 'file_name', 'sortable': True, 'align': 'left'},
+            {'name': 'frame_type', 'label': 'Type', 'field': 'frame_type', 'sortable': True},
+            {'name': 'date_obs', 'label': 'Date', 'field': 'date_obs', 'sortable': True},
+            {'name': 'star_count', 'label': 'Stars', 'field': 'star_count', 'sortable': True},
+            {'name': 'fwhm', 'label': 'FWHM (px)', 'field': 'fwhm', 'sortable': True},
+            {'name': 'background', 'label': 'Background', 'field': 'background', 'sortable': True},
+            {'name': 'noise', 'label': 'Noise', 'field': 'noise', 'sortable': True},
+        ]
+
+        def load_rows():
+            rows = []
+            for frame in get_subframes(self.conn, data_id, ("light", "failed")):
+                if frame["format"] != "fits":
+                    continue
+                analyzed = frame["quality_mtime"] == frame["modification_time"]
+                rows.append({
+                    'file_name': frame["file_name"],
+                    'frame_type': frame["frame_type"],
+                    'date_obs': frame["date_obs"] or "",
+                    'star_count': frame["star_count"] if analyzed else None,
+                    'fwhm': round(frame["fwhm"], 2) if analyzed and frame["fwhm"] is not None else None,
+                    'background': round(frame["background"], 1) if analyzed and frame["background"] is not None else None,
+                    'noise': round(frame["noise"], 2) if analyzed and frame["noise"] is not None else None,
+                    'excluded': bool(frame["excluded"]),
+                })
+            table.rows = rows
+            table.selected = [row for row in rows if row['excluded']]
+            table.update()
+            status.text = f"{len(rows)} frames, {len(table.selected)} excluded" if rows else "No indexed frame for this session, scan it again."
+
+        quality_state = {"cancel": False}
+
+        async def analyze():
+            analyze_button.disable()
+            log.clear()
+            quality_state["cancel"] = False
+            await run.io_bound(analyze_session_quality, DB_NAME, data_id, session_dir, log, lambda: quality_state["cancel"])
+            analyze_button.enable()
+            load_rows()
+
+        def save_exclusions():
+            set_subframes_excluded(self.conn, data_id, [row['file_name'] for row in table.selected])
+            self.subframe_summary = get_subframe_summary(self.conn, data_id)
+            ui.notify(f"{len(table.selected)} frames excluded", position="top", type="positive")
+            load_rows()
+
+        def close():
+            quality_state["cancel"] = True
+            dialog.close()
+
+        with ui.dialog().props('persistent') as dialog, ui.card().classes('w-full').style('max-width: 1400px'):
+            with ui.row().classes('w-full items-center'):
+                ui.label('🔬 Frame Quality').classes('text-lg font-semibold mr-auto')
+                analyze_button = ui.button("Analyze frames", on_click=analyze)
+                ui.button("Save exclusions", on_click=save_exclusions)
+                ui.button("Close", on_click=close)
+            status = ui.label("")
+            ui.label("Select the frames to exclude before restacking.").classes('text-gray-500')
+            table = ui.table(columns=columns, rows=[], row_key='file_name', selection='multiple', pagination=50).classes('w-full')
+            log = ui.log(max_lines=10).classes('w-full h-24')
+
+        load_rows()
+        dialog.open()
+
+    async def open_quick_stack_dialog(self):
+        if not self.selected_data_id or not self.selected_path:
+            ui.notify("Select a session first", position="top", type="warning")
+            return
+        data_id = self.selected_data_id
+        session_dir = self.selected_path
+        panels = await run.io_bound(get_session_panels, DB_NAME, data_id)
+        stack_state = {"path": None, "cancel": False}
+
+        async def stack():
+            stack_button.disable()
+            zoom_button.disable()
+            log.clear()
+            stack_state["cancel"] = False
+            path = await run.io_bound(quick_stack_session, DB_NAME, data_id, session_dir, method.value,
+                                      panel.value if panels else None, log, lambda: stack_state["cancel"])
+            stack_button.enable()
+            if not path:
+                return
+            stack_state["path"] = path
+            preview_path = await run.io_bound(self.set_preview, path)
+            result.set_source(self.get_preview_url(preview_path))
+            result.visible = True
+            zoom_button.enable()
+
+        def close():
+            stack_state["cancel"] = True
+            dialog.close()
+
+        with ui.dialog().props('persistent') as dialog, ui.card().classes('w-full').style('max-width: 1400px'):
+            with ui.row().classes('w-full items-center'):
+                ui.label('🧮 Quick Stack').classes('text-lg font-semibold mr-auto')
+                method = ui.select(QUICK_STACK_METHODS, value="mean", label="Method").props('dense outlined').classes('w-56')
+                panel = ui.select(panels, value=panels[0] if panels else None, label="Panel").props('dense outlined').classes('w-40')
+                panel.visible = bool(panels)
+                stack_button = ui.button("Stack", on_click=stack)
+                zoom_button = ui.button("Zoom", on_click=lambda: self.open_zoom_viewer(stack_state["path"]))
+                zoom_button.disable()
+                ui.button("Close", on_click=close)
+            ui.label("Quick look of the light frames of the session, the excluded frames are left out.").classes('text-gray-500')
+            log = ui.log(max_lines=10).classes('w-full h-24')
+            result = ui.image().classes('w-full').props('fit=contain')
+            result.visible = False
+
+        dialog.open()
 
     def open_folder(self, directory = None):
         if not self.selected_path and not directory:
@@ -553,146 +820,151 @@ class ExploreApp:
         dialog.open()
 
     def on_file_selected(self):
-        selection_index = None
         selected_value = self.file_list.value
         print(f"Selected value: {selected_value}")
         details = []
 
-        if not selected_value or selected_value.startswith('Select a session'):
+        # the options are keyed by entry id, '' is the placeholder of the sessions list
+        row = self.session_rows.get(selected_value)
+        if row is None:
             return
 
         self.details_files.clear()
         self.details_preview.clear()
         self.reset_preview_icons()
 
-        details_files_text = ""
-        if selected_value and len(self.all_files_rows) == 1:
-            selection_index = 0
+        file_path = row[1]
+        backup_path = row[6]  # location from BackupDrive or USB Dwarf
+        is_favorite = row[12]  # The favorite column (0 or 1)
+        info_stack = RESTACK if self.is_Restacked(row[8]) else TAKEN
+        star_icon = '⭐ ' if is_favorite else '☆ '
+        full_path = get_Backup_fullpath (backup_path, "", file_path, self.get_selected_dwarf_id())
+        self.selected_path = os.path.dirname(full_path)
+        self.selected_data_id = row[0]
+        # prefetched when a neighbour session was shown, otherwise read now
+        self.session_details = self.session_prefetcher.get(full_path)
+        if self.session_details:
+            self.subframe_summary = self.session_details["subframe_summary"]
+            self.session_stats = self.session_details["session_stats"]
+        else:
+            # sub-frame headers indexed at scan time, None for sessions not indexed yet
+            self.subframe_summary = get_subframe_summary(self.conn, self.selected_data_id)
+            # size and frame counts stored at scan time, None for sessions not scanned since
+            self.session_stats = get_session_stats(self.conn, self.selected_data_id)
+
+        # Store the base folder once
+        self.base_folder = full_path.replace("\\", "/").rsplit(file_path.replace("\\", "/"), 1)[0]
+        set_base_folder(full_path.replace("\\", "/").rsplit(file_path.replace("\\", "/"), 1)[0])
+        lens = "(Wide)" if ("_WIDE_") in row[8] else "(Tele)"
+
+        details_files_text = f"{star_icon}{info_stack} with {row[9]} {lens} on {show_date_session(row[7])}"
+
+        # details
+
+        #details.append(f"{show_date_session(row[7])}")
+        session_dir = row[8]
+        #details.append(f"Session: {session_dir}")
+        init_target = row[13]
+        details.append(f"Dwarf Target: {init_target}")
+        if self.selected_object_description != init_target:
+            details.append(f"Classified as: {self.selected_object_description.rsplit(" [")[0]}")
+        declination = row[14]
+        right_ascencion = row[15]
+        details.append(f"RA: {hours_to_hms(right_ascencion)} | Dec: {deg_to_dms(declination)}")
+
+        lens = "Wide" if ("_WIDE_") in row[8] else "Tele"
+        exp = f"{row[2]}s" if row[2] is not None else "N/A"
+        gain = row[3] if row[3] is not None else "N/A"
+
+        details.append(f"Lens : {lens} | Exposure: {exp} | Gain: {gain} | Filter: {row[4]}")
+        if row[10] and row[11]:
+            details.append(f"MinTemp: {row[10]} | MaxTemp: {row[11]}")
+        details.append(f"Stacks: {row[5]}")
+
+        self.astro_files = self.session_details["astro_files"] if self.session_details else check_files(full_path)
+        self.update_preview_icons()
+
+        with self.details_files:
+            label = ui.item_label(f"{details_files_text}").props('header').classes('text-bold').props('clickable').classes(f'cursor-pointer {self.get_hover_class()} transition-colors duration-200 rounded')
+            # Set the tooltip text based on the favorite state
+            tooltip_text = "Click to Remove from Favorites" if is_favorite else "Click to Add to Favorites"
+            # Add tooltip
+            label.props(f'title="{tooltip_text}"')
+            # Make the label clickable to toggle favorite
+            label.on('click', lambda _, eid=row[0], lbl=label, mode=self.mode: self.toggle_favorite_ui(eid, lbl, mode))
+            ui.separator()
 
-        # Try to find the selected value in the options and get the corresponding index
-        try:
+            # Add colored details
+            ui.item(f"Session: {session_dir}").classes('text-blue-800')
+            ui.item(f"Dwarf Target: {init_target}").classes('text-green-600')
 
-            if  selection_index is None:
-
-                # Map the selected value back to the corresponding row
-                for idx, row in enumerate(self.all_files_rows):
-                    # Build the label that matches the options shown
-                    #label = f"{row[1]} (Taken with {row[9]} | {show_date_session(row[7])}, exp {row[2]}s, gain {row[3]}, filter {row[4]}, stacks {row[5]})"
-                    lens = "(W) " if ("_WIDE_") in row[8] else ""
-                    exp = f"{row[2]}s" if row[2] is not None else "N/A"
-                    gain = row[3] if row[3] is not None else "N/A"
-                    is_favorite = row[12]  # The favorite column (0 or 1)
-                    star_icon = '⭐ ' if is_favorite else '☆ '
-                    info_stack = RESTACK if self.is_Restacked(row[8]) else TAKEN
-                    label = f"{info_stack} with {row[9]} {lens}| {show_date_session(row[7])}, exp {exp}, gain {gain}, filter {row[4]}, stacks {row[5]}"
-                    # Strip out the star icon to compare only the text portion
-                    comparison_label = label.lstrip('⭐').lstrip('☆').strip()
-                    # Strip the star icon from the selected value for comparison
-                    selected_value_stripped = selected_value.lstrip('⭐').lstrip('☆').strip()
-                
-                    # Check if this label matches the selected value
-                    if selected_value_stripped == label:
-                        selection_index = idx
-                        lens = "(Wide)" if ("_WIDE_") in row[8] else "(Tele)"
-
-                        details_files_text = f"{star_icon}{info_stack} with {row[9]} {lens} on {show_date_session(row[7])}"
-                        break
-
-        except ValueError:
-            print("Selected value not found")
-
-        if selection_index is not None:
-
-            row = self.all_files_rows[selection_index]
-
-            file_path = row[1]
-            backup_path = row[6]  # location from BackupDrive or USB Dwarf
-            is_favorite = row[12]  # The favorite column (0 or 1)
-            info_stack = RESTACK if self.is_Restacked(row[8]) else TAKEN
-            star_icon = '⭐ ' if is_favorite else '☆ '
-            full_path = get_Backup_fullpath (backup_path, "", file_path, self.get_selected_dwarf_id())
-            self.selected_path = os.path.dirname(full_path)
-
-            # Store the base folder once
-            self.base_folder = full_path.replace("\\", "/").rsplit(file_path.replace("\\", "/"), 1)[0]
-            set_base_folder(full_path.replace("\\", "/").rsplit(file_path.replace("\\", "/"), 1)[0])
-            lens = "(Wide)" if ("_WIDE_") in row[8] else "(Tele)"
-
-            details_files_text = f"{star_icon}{info_stack} with {row[9]} {lens} on {show_date_session(row[7])}"
-
-            # details
-
-            #details.append(f"{show_date_session(row[7])}")
-            session_dir = row[8]
-            #details.append(f"Session: {session_dir}")
-            init_target = row[13]
-            details.append(f"Dwarf Target: {init_target}")
             if self.selected_object_description != init_target:
-                details.append(f"Classified as: {self.selected_object_description.rsplit(" [")[0]}")
-            declination = row[14]
-            right_ascencion = row[15]
-            details.append(f"RA: {hours_to_hms(right_ascencion)} | Dec: {deg_to_dms(declination)}")
+                classified = self.selected_object_description.rsplit(" [")[0]
+                ui.item(f"Classified as: {classified}").classes('text-gray-500')
+
+            ui.item(f"RA: {hours_to_hms(right_ascencion)} | Dec: {deg_to_dms(declination)}").classes('text-purple-600')
 
             lens = "Wide" if ("_WIDE_") in row[8] else "Tele"
             exp = f"{row[2]}s" if row[2] is not None else "N/A"
+            exp_value = self.parse_exposure(exp) if exp != "N/A" else 0
             gain = row[3] if row[3] is not None else "N/A"
+            with ui.row().classes('w-full gap-8 items-start'):
+                ui.item(f"Lens : {lens} | Exposure: {exp} | Gain: {gain} | Filter: {row[4]}").classes('text-yellow-700')
 
-            details.append(f"Lens : {lens} | Exposure: {exp} | Gain: {gain} | Filter: {row[4]}")
-            if row[10] and row[11]:
-                details.append(f"MinTemp: {row[10]} | MaxTemp: {row[11]}")
-            details.append(f"Stacks: {row[5]}")
+                if row[10] and row[11]:
+                    ui.item(f"MinTemp: {row[10]} | MaxTemp: {row[11]}").classes('text-sky-700')
 
-            self.astro_files = check_files(full_path)
-            self.update_preview_icons()
-
-            with self.details_files:
-                label = ui.item_label(f"{details_files_text}").props('header').classes('text-bold').props('clickable').classes(f'cursor-pointer {self.get_hover_class()} transition-colors duration-200 rounded')
-                # Set the tooltip text based on the favorite state
-                tooltip_text = "Click to Remove from Favorites" if is_favorite else "Click to Add to Favorites"
-                # Add tooltip
-                label.props(f'title="{tooltip_text}"')
-                # Make the label clickable to toggle favorite
-                label.on('click', lambda _, eid=row[0], lbl=label, mode=self.mode: self.toggle_favorite_ui(eid, lbl, mode))
-                ui.separator()
-
-                # Add colored details
-                ui.item(f"Session: {session_dir}").classes('text-blue-800')
-                ui.item(f"Dwarf Target: {init_target}").classes('text-green-600')
-
-                if self.selected_object_description != init_target:
-                    classified = self.selected_object_description.rsplit(" [")[0]
-                    ui.item(f"Classified as: {classified}").classes('text-gray-500')
-
-                ui.item(f"RA: {hours_to_hms(right_ascencion)} | Dec: {deg_to_dms(declination)}").classes('text-purple-600')
-
-                lens = "Wide" if ("_WIDE_") in row[8] else "Tele"
-                exp = f"{row[2]}s" if row[2] is not None else "N/A"
-                exp_value = self.parse_exposure(exp) if exp != "N/A" else 0
-                gain = row[3] if row[3] is not None else "N/A"
-                with ui.row().classes('w-full gap-8 items-start'):
-                    ui.item(f"Lens : {lens} | Exposure: {exp} | Gain: {gain} | Filter: {row[4]}").classes('text-yellow-700')
-
-                    if row[10] and row[11]:
-                        ui.item(f"MinTemp: {row[10]} | MaxTemp: {row[11]}").classes('text-sky-700')
-
-                stacks = row[5]
-                color = 'text-red-600' if stacks < 100 else 'text-indigo-600'
-                
-                # get exposure for Restacked session
-                exposure_time = self.format_seconds_hms(exp_value * stacks)
-                if self.is_Restacked(row[8]):
+            stacks = row[5]
+            color = 'text-red-600' if stacks < 100 else 'text-indigo-600'
+            
+            # get exposure for Restacked session
+            exposure_time = self.format_seconds_hms(exp_value * stacks)
+            summary = self.subframe_summary
+            if self.is_Restacked(row[8]):
+                if summary and summary["stacked_exposure"] is not None:
+                    exposure_time = self.format_seconds_hms(summary["stacked_exposure"])
+                else:
                     fits_path = self.astro_files.get('fits')
                     if fits_path and os.path.isfile(fits_path):
                         exposure_time = self.format_seconds_hms(get_total_exposure(fits_path))
 
-                ui.item(f"{stacks} stacked shots for a total exposure time of {exposure_time}").classes(color)
+            ui.item(f"{stacks} stacked shots for a total exposure time of {exposure_time}").classes(color)
+
+            if summary and summary["integration"]:
+                ui.item(f"{summary['fits']} sub-frames on the disk for an integration time of {self.format_seconds_hms(summary['integration'])}").classes('text-gray-500')
+            if summary and summary["analyzed"]:
+                fwhm = f"{summary['fwhm']:.2f} px" if summary["fwhm"] is not None else "N/A"
+                excluded = f", {summary['excluded']} excluded" if summary["excluded"] else ""
+                ui.item(f"Quality: {summary['analyzed']} frames analyzed, FWHM {fwhm}, {summary['stars']:.0f} stars{excluded}").classes('text-gray-500')
+
+            # add Mosaic Panel Info
+            #for data_detail in details:
+            #   ui.item(data_detail)
 
-                # add Mosaic Panel Info
-                #for data_detail in details:
-                #   ui.item(data_detail)
+        self.preview_image_path = full_path
+        self.update_preview(full_path)
+        self.prefetch_adjacent_sessions(row[16])
 
-            self.preview_image_path = full_path
-            self.update_preview(full_path)
+    def prefetch_adjacent_sessions(self, entry_id):
+        """Load the next and previous sessions of the list in the background, the user often steps through them."""
+        index = self.session_order.get(entry_id)
+        if index is None:
+            return
+        rows = self.all_files_rows
+        neighbours = []
+        for distance in range(1, SESSION_PREFETCH_NEIGHBOURS + 1):
+            neighbours += [rows[i] for i in (index + distance, index - distance) if 0 <= i < len(rows)]
+        dwarf_id = self.get_selected_dwarf_id()
+        self.session_prefetcher.prefetch([(row[0], get_Backup_fullpath(row[6], "", row[1], dwarf_id)) for row in neighbours])
+
+    def get_session_presence(self, session_dir):
+        """Same session on a Dwarf (backup mode) or on a backup drive (Dwarf mode), from the prefetched details when available."""
+        details = self.session_details
+        if details and details["presence"][0] == session_dir:
+            return details["presence"][1]
+        if self.mode == "backup":
+            return get_session_present_in_Dwarf(self.conn, session_dir)
+        return get_session_present_in_backupDrive(self.conn, session_dir)
 
     def get_hover_class(self):
         return 'hover:bg-gray-700' if app.storage.user.get('ui_mode', 0) == 'dark' else 'hover:bg-gray-300'
@@ -718,9 +990,9 @@ class ExploreApp:
         self.preview_image_type = get_extension(preview_image_path)
         self.preview_image_path = preview_image_path
 
-        # convert Fits for preview
+        # convert Fits for preview (rendered in the preview cache)
         preview_image_path = self.set_preview(self.preview_image_path)
-        file_path = get_file_path(preview_image_path, self.base_folder)
+        file_path = get_file_path(self.preview_image_path, self.base_folder)
         print(file_path)
 
         size_dir_kb = None
@@ -731,18 +1003,29 @@ class ExploreApp:
         nb_failed_fits_files = None
         nb_tiff_files = None
         nb_failed_tiff_files = None
+        nb_panels = None
         restacked_session = False
         try:
             directory = os.path.dirname(self.preview_image_path)
             restacked_session = self.is_Restacked(os.path.basename(directory))
-            size_dir_kb = get_directory_size(directory) / 1024
+            stats = self.session_stats if directory == self.selected_path else None
+            if stats:
+                # size and frame counts from the scan, no directory walk
+                size_dir_kb = stats["total_size"] / 1024
+                nb_fits_files = stats["fits_count"]
+                nb_failed_fits_files = stats["failed_fits_count"]
+                nb_tiff_files = stats["tiff_count"]
+                nb_failed_tiff_files = stats["failed_tiff_count"]
+                nb_panels = stats["panel_count"]
+            else:
+                size_dir_kb = get_directory_size(directory) / 1024
+                nb_fits_files = count_fits_files(directory)
+                nb_failed_fits_files = count_failed_fits_files(directory)
+                nb_tiff_files = count_tiff_files(directory)
+                nb_failed_tiff_files = count_failed_tiff_files(directory)
             size_dir_mb = size_dir_kb / 1024
             size_kb = os.path.getsize(self.preview_image_path) / 1024
             size_mb = size_kb / 1024
-            nb_fits_files = count_fits_files(directory)
-            nb_failed_fits_files = count_failed_fits_files(directory)
-            nb_tiff_files = count_tiff_files(directory)
-            nb_failed_tiff_files = count_failed_tiff_files(directory)
 
         except FileNotFoundError:
             print("File not found")
@@ -754,6 +1037,8 @@ class ExploreApp:
             size_kb = None
             size_mb = None
 
+        if nb_panels:
+            details_preview.append(f"Mosaic of {nb_panels} panels")
         if nb_fits_files is not None and nb_fits_files == 1:
             details_preview.append(f"Found one fits image on the disk")
         if nb_fits_files is not None and nb_fits_files > 1:
@@ -795,20 +1080,19 @@ class ExploreApp:
             self.preview_image.visible = False
             details_preview.append(f"Image File is not reachable - Preview is disable")
 
-        elif file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.tiff')):
+        elif preview_image_path.lower().endswith(('.jpg', '.jpeg', '.png', '.tiff')):
             # To show a local file, we need to serve it. Quick way:
             #url_path = f'/preview/{quote(file_path.replace("\\", "/"))}'
-            url_path = build_preview_url(file_path)
+            url_path = self.get_preview_url(preview_image_path)
             self.preview_image.visible = True
             self.preview_image.source = url_path
             self.fullscreen_image.visible = True
-            self.fullscreen_image.source = url_path
 
         else:
             self.preview_image.visible = False
 
         with self.details_preview:
-            if not self.mode == "backup" and is_path_local_dwarf_dir(preview_image_path):
+            if not self.mode == "backup" and is_path_local_dwarf_dir(self.preview_image_path):
                 ui.item(f"DWARF device not connected. Using offline session archive").props('header').classes('text-bold').classes('text-red-600')
 
             toggle = ui.toggle({True:'Show Details', False:'Hide Details'}, value=True).classes("m-4")
@@ -833,7 +1117,7 @@ class ExploreApp:
             session_dir = os.path.basename(os.path.dirname(preview_image_path))
 
             if self.mode == "backup":
-                result_on_Dwarf = get_session_present_in_Dwarf(self.conn, session_dir)
+                result_on_Dwarf = self.get_session_presence(session_dir)
                 print(f"result_on_Dwarf: {result_on_Dwarf}")
                 if result_on_Dwarf:
                     dwarf_full_path = get_Backup_fullpath (result_on_Dwarf[2], "", result_on_Dwarf[3], self.get_selected_dwarf_id())
@@ -857,7 +1141,7 @@ class ExploreApp:
                             ui.item_label(f"Actually available on {result_on_Dwarf[1]}").classes("text-green-600").classes("pl-4 pr-4 pb-4").props('header').classes('text-bold')
                         }
             else:
-                result_on_backupDrive = get_session_present_in_backupDrive(self.conn, session_dir)
+                result_on_backupDrive = self.get_session_presence(session_dir)
 
                 if result_on_backupDrive:
                     backup_full_path = get_Backup_fullpath(
@@ -893,7 +1177,7 @@ class ExploreApp:
                 self.open_folder_icon.disable()
 
             if not self.fullscreen_icon:
-                self.fullscreen_icon =  ui.button("Show Fullscreen Image", on_click=self.image_dialog.open).classes('h-16')
+                self.fullscreen_icon =  ui.button("Show Fullscreen Image", on_click=self.show_fullscreen_image).classes('h-16')
             elif self.selected_path and os.path.isdir(self.selected_path):
                 self.fullscreen_icon.enable()
             else:
@@ -921,10 +1205,19 @@ class ExploreApp:
                 self.backup_session_icon.disable()
 
     def set_preview(self, path: str):
-        if path.lower().endswith('.fits'):
-            path = generate_fits_preview(path)
+        # FITS and TIFF are rendered once in the preview cache (pre-generated after the scans)
+        render = get_preview_renderer(path)
+        if render:
+            path = preview_cache.get(path, render, {"max_size": PREVIEW_MAX_SIZE}) or PREVIEW_ERROR_IMAGE
         return path
 
+    def get_preview_url(self, path: str):
+        if preview_cache.is_cached_path(path):
+            return preview_cache.build_url(path)
+        if path == PREVIEW_ERROR_IMAGE:
+            return path
+        return build_preview_url(get_file_path(path, self.base_folder))
+
     def get_backup_url(self):
         ui.notify("Launch Backup Dwarf Data...")  # Simulate showing data
         Dwarf_id = self.get_selected_dwarf_id()
@@ -2,12 +2,13 @@ import webview
 from nicegui import ui, app, run
 
 import os
-import shutil
 import asyncio
 import hashlib
 
 from components.menu import menu
 from api.dwarf_backup_fct import scan_backup_folder
+from api.dwarf_transfer_journal import TransferJournal, copy_file_with_digest
+from api.dwarf_transfer_queue import get_transfer_queue, TRANSPORT_USB, PRIORITY_NAMES, PRIORITY_NORMAL
 from api.dwarf_backup_db import DB_NAME, connect_db, close_db, init_db
 from api.dwarf_backup_db_api import get_dwarf_Names, get_dwarf_detail, get_backupDrive_list_dwarfId
 from components.win_log import WinLog
@@ -39,6 +40,7 @@ class TransferApp:
         self.dest_dir = '' # 'T:\\DWARFLAB_2\\DATA4\\DATA_OBJECTS\\NGC7000_North_American_Nebula'
         self.src_main_dir = '' # 'G:\\Astronomy\\DWARF_RAW_WIDE_C 20_EXP_15_GAIN_80_2025-04-28-04-21-24-416'
         self.dest_main_dir = '' # 'T:\\DWARFLAB_2\\DATA4\\DATA_OBJECTS\\NGC7000_North_American_Nebula'
+        self.journal = None
 
         self.build_ui()
         self.set_mode_UI()
@@ -108,6 +110,9 @@ class TransferApp:
             self.cancel_btn = ui.button('Cancel Backup', on_click=lambda: self.cancel())
             self.cancel_btn.visible = False
             ui.button('Start Backup', on_click=lambda:self.start_backup())
+            with ui.row().classes("items-center"):
+                self.priority_select = ui.select(PRIORITY_NAMES, value=PRIORITY_NORMAL, label="Priority").classes("w-28")
+                ui.button('Add to Queue', on_click=lambda:self.add_to_queue())
             self.cancel_backup = False
 
         self.populate_dwarf_filter()
@@ -269,41 +274,76 @@ class TransferApp:
         self.cancel_btn.visible = True
         dest_path = os.path.join(dest_dir, os.path.basename(src_dir))
 
-        # Check if destination path exists
-        if os.path.exists(dest_path):
-            await self.confirm_overwrite(dest_path)
+        # Only new or changed files are copied, the journal keeps track of the verified ones
+        self.journal = TransferJournal(src_dir, dest_path)
+        list_files = await self.get_files(src_dir, dest_path)
+        to_copy, skipped = await run.io_bound(self.journal.plan, list_files)
+
+        # Check if files on the destination path will be overwritten
+        overwritten = [dest_file for _, dest_file in to_copy if os.path.exists(dest_file)]
+        if overwritten:
+            await self.confirm_overwrite(src_dir, dest_path, to_copy, skipped, len(overwritten))
+        else:
+            await self.execute_backup(src_dir, dest_path, to_copy, skipped)
+
+    def add_to_queue(self):
+        src_dir = self.input_src_dir.value
+        dest_dir = self.input_dest_dir.value
+        if not src_dir:
+            self.progress_label.set_text("Select a Source Directory.")
+            return
+        if not dest_dir:
+            self.progress_label.set_text("Select a Destination Directory.")
+            return
+
+        dest_path = os.path.join(dest_dir, os.path.basename(src_dir))
+
+        # same analysis as at the end of execute_backup, run by the queue once the copy is verified
+        dwarf_scan = [self.dwarf_astroDir, None, self.DwarfId, None]
+        backup_scan = [self.backup_location, self.backup_astrodir, self.DwarfId, self.BackupId]
+        if self.mode == "Archive":
+            scans = [dwarf_scan + [src_dir], backup_scan + [dest_path]]
         else:
-            await self.execute_backup(src_dir, dest_path)
+            scans = [backup_scan + [src_dir], dwarf_scan + [dest_path]]
+
+        job = get_transfer_queue().add_job(self.mode, TRANSPORT_USB, src_dir, dest_path, priority=self.priority_select.value, scans=scans)
+        ui.notify(f"➕ {job.label} added to the transfer queue", type="positive")
 
-    async def confirm_overwrite(self, dest_path):
+    async def confirm_overwrite(self, src_dir, dest_path, to_copy, skipped, nb_overwritten):
 
         print("confirm_overwrite")
         ui.notify(f"The destination '{dest_path}' already exists.!", type='warning')
 
         # Display confirmation dialog
         with ui.dialog().props('persistent') as dialog, ui.card().style('width: 800px; max-width: none'):
-            ui.label(f"The destination:\n'{dest_path}' already exists.\nAre you sure you want to continue?")
+            ui.label(f"The destination:\n'{dest_path}' already exists.\n{nb_overwritten} changed file(s) will be overwritten, {len(skipped)} unchanged file(s) will be skipped.\nAre you sure you want to continue?")
             with ui.row():
                 ui.button("Yes", on_click=lambda: dialog.submit('Yes'))
                 ui.button("No", on_click=lambda: dialog.submit('No'))
 
         result = await dialog
         if result == 'Yes':
-            await self.execute_backup(self.input_src_dir.value, dest_path)
+            await self.execute_backup(src_dir, dest_path, to_copy, skipped)
         else:
             self.progress_label.set_text("Backup canceled.")
             self.cancel_btn.visible = False
 
-    async def execute_backup(self, src_dir, dest_path):
+    async def execute_backup(self, src_dir, dest_path, list_files, skipped):
 
-        list_files = await self.get_files(src_dir, dest_path)
         total_files = 0
         if list_files:
             total_files = len(list_files)
 
         if total_files == 0:
-            self.progress_label.set_text("No files to copy.")
+            self.cancel_btn.visible = False
+            if skipped:
+                self.progress.value = 100
+                self.progress_label.set_text(f"Destination already up to date ({len(skipped)} unchanged files).")
+            else:
+                self.progress_label.set_text("No files to copy.")
             return
+        elif skipped:
+            self.progress_label.set_text(f"Starting copying {total_files} files, {len(skipped)} unchanged files skipped...")
         else:
             self.progress_label.set_text(f"Starting copying {total_files} files...")
         ui.notify("Starting...")
@@ -337,7 +377,7 @@ class TransferApp:
             except Exception as e:
                 ui.notify(f"❌ Error: {str(e)}", type="negative")
         else:
-            self.progress_label.set_text(f"Backup interrupted!")
+            self.progress_label.set_text(f"Backup interrupted! Start it again to resume.")
 
     @ui.refreshable
     def notify_me(self, msg: str | None) -> None:
@@ -379,25 +419,27 @@ class TransferApp:
 
             progress = round((i + 1) / total_files * 100)
 
-            os.makedirs(os.path.dirname(dest_file), exist_ok=True)
-            shutil.copy2(src_file, dest_file)
+            # 🔒 Step 1: Copy, the checksum of the written data is checked against the source
+            try:
+                digest = copy_file_with_digest(src_file, dest_file)
+            except OSError as e:
+                self.notify_me.refresh(f"Copy failed: {e}")
+                break
 
-            # 🔎 Step 1: Size check
+            # 🔎 Step 2: Size check
             if os.path.getsize(src_file) != os.path.getsize(dest_file):
                 self.notify_me.refresh(f"Size mismatch: {src_file}")
                 break
 
-            # 🔒 Step 2 (Optional): Check hash for sensitive files
-            #if os.path.splitext(src_file)[1] in ['.fits', '.json', '.jpg']:
-            #    if file_hash(src_file) != file_hash(dest_file):
-            #        ui.notify.refresh(f"Checksum mismatch: {src_file}")
-            #        break
+            # Step 3: Keep track of the verified file to resume an interrupted transfer
+            self.journal.record_done(src_file, digest)
 
             verified_files += 1
             progress_bar.value = round(progress)
 
         if not self.cancel_backup and verified_files == total_files:
             self.notify_me.refresh("✅ Backup complete and verified!")
+            self.journal.compact()
             result = True
 
         elif not self.cancel_backup:
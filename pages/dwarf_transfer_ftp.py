@@ -2,14 +2,15 @@ import webview
 from nicegui import ui, app, run
 
 import os
-import shutil
 import asyncio
 import hashlib
 
 from components.menu import menu
-from api.dwarf_backup_fct_ftp import ftp_conn, check_ftp_connection, get_ftp_astroDir, list_ftp_subdirectories, ftp_path_exists, download_ftp_tree, ftp_download_file
-from api.dwarf_backup_fct_sftp import asyncssh_sftp_session, async_sftp_upload
+from api.dwarf_backup_fct_ftp import ftp_conn, check_ftp_connection, get_ftp_astroDir, list_ftp_subdirectories, ftp_path_exists, download_ftp_tree, ftp_download_file, ftp_download_files_parallel, invalidate_ftp_cache
+from api.dwarf_backup_fct_sftp import asyncssh_sftp_session, async_sftp_upload, SftpTransferClient
 from api.dwarf_backup_fct import scan_backup_folder
+from api.dwarf_transfer_journal import TransferJournal, copy_file_with_digest
+from api.dwarf_transfer_queue import get_transfer_queue, TRANSPORT_USB, TRANSPORT_FTP, TRANSPORT_SFTP, PRIORITY_NAMES, PRIORITY_NORMAL
 
 from api.dwarf_backup_db import DB_NAME, connect_db, close_db, init_db
 from api.dwarf_backup_db_api import get_dwarf_Names, get_dwarf_detail, get_backupDrive_list_dwarfId
@@ -45,6 +46,7 @@ class TransferAppFTP:
         self.dwarf_type = None
         self.usb_available = False
         self.ftp_available = False
+        self.journal = None
         self.build_ui()
         self.set_mode_UI()
 
@@ -134,6 +136,9 @@ class TransferAppFTP:
             self.CancelBackup = self.cancel_btn = ui.button('Cancel Backup', on_click=lambda: self.cancel())
             self.cancel_btn.visible = False
             self.StartBackup = ui.button('Start Backup', on_click=lambda:self.start_backup())
+            with ui.row().classes("items-center"):
+                self.priority_select = ui.select(PRIORITY_NAMES, value=PRIORITY_NORMAL, label="Priority").classes("w-28")
+                ui.button('Add to Queue', on_click=lambda:self.add_to_queue())
             self.cancel_backup = False
 
         self.populate_dwarf_filter()
@@ -411,42 +416,100 @@ class TransferAppFTP:
             # Local USB path
             dest_path = os.path.join(dest_dir, os.path.basename(src_dir))
 
-            # Check if destination path exists
-            if os.path.exists(dest_path):
-                await self.confirm_overwrite(dest_path)
+            # Only new or changed files are copied, the journal keeps track of the verified ones
+            self.journal = TransferJournal(src_dir, dest_path)
+            list_files = await self.get_files(src_dir, dest_path)
+            to_copy, skipped = await run.io_bound(self.journal.plan, list_files)
+
+            # Check if files on the destination path will be overwritten
+            nb_overwritten = sum(1 for _, dest_file in to_copy if os.path.exists(dest_file))
+            if nb_overwritten:
+                await self.confirm_overwrite(dest_path, to_copy, skipped, nb_overwritten)
+            else:
+                await self.execute_backup(src_dir, dest_path, to_copy, skipped)
+
+    def add_to_queue(self):
+        src_dir = self.input_src_dir.value
+        dest_dir = self.input_dest_dir.value
+        if not src_dir:
+            self.progress_label.set_text("Select a Source Directory.")
+            return
+        if not dest_dir:
+            self.progress_label.set_text("Select a Destination Directory.")
+            return
+
+        dwarf_scan = [self.dwarf_astroDir, None, self.DwarfId, None]
+        backup_scan = [self.backup_location, self.backup_astrodir, self.DwarfId, self.BackupId]
+
+        if self.transfert_mode_select.value == "FTP":
+            if self.mode == "Restore" and int(self.dwarf_type) != 1: #only D2 is not read-only
+                self.notify_me.refresh("FTP is read-only: Restore not allowed.")
+                return
+            src_basename = os.path.basename(os.path.normpath(src_dir))
+            if self.mode == "Archive":
+                transport = TRANSPORT_FTP
+                dest_path = os.path.join(dest_dir, src_basename)
+                # only the backup side is on a local drive
+                scans = [backup_scan + [dest_path]]
+            else:
+                transport = TRANSPORT_SFTP
+                dest_path = f"{dest_dir.rstrip('/')}/{src_basename}"
+                scans = [backup_scan + [src_dir]]
+        else:
+            transport = TRANSPORT_USB
+            dest_path = os.path.join(dest_dir, os.path.basename(src_dir))
+            if self.mode == "Archive":
+                scans = [dwarf_scan + [src_dir], backup_scan + [dest_path]]
             else:
-                await self.execute_backup(src_dir, dest_path)
+                scans = [backup_scan + [src_dir], dwarf_scan + [dest_path]]
 
-    async def confirm_overwrite(self, dest_path):
+        job = get_transfer_queue().add_job(self.mode, transport, src_dir, dest_path, priority=self.priority_select.value, ip_address=self.dwarf_ip_sta_mode, scans=scans)
+        ui.notify(f"➕ {job.label} added to the transfer queue", type="positive")
+
+    async def confirm_overwrite(self, dest_path, list_files = None, skipped = None, nb_overwritten = None):
 
         print("confirm_overwrite")
         ui.notify(f"The destination '{dest_path}' already exists.!", type='warning')
 
+        if nb_overwritten:
+            message = f"The destination:\n'{dest_path}' already exists.\n{nb_overwritten} changed file(s) will be overwritten, {len(skipped)} unchanged file(s) will be skipped.\nAre you sure you want to continue?"
+        else:
+            message = f"The destination:\n'{dest_path}' already exists.\nAre you sure you want to continue?"
+
         # Display confirmation dialog
         with ui.dialog().props('persistent') as dialog, ui.card().style('width: 800px; max-width: none'):
-            ui.label(f"The destination:\n'{dest_path}' already exists.\nAre you sure you want to continue?")
+            ui.label(message)
             with ui.row():
                 ui.button("Yes", on_click=lambda: dialog.submit('Yes'))
                 ui.button("No", on_click=lambda: dialog.submit('No'))
 
         result = await dialog
         if result == 'Yes':
-            await self.execute_backup(self.input_src_dir.value, dest_path)
+            await self.execute_backup(self.input_src_dir.value, dest_path, list_files, skipped)
         else:
             self.progress_label.set_text("Backup canceled.")
             self.cancel_btn.visible = False
 
-    async def execute_backup(self, src_dir, dest_path):
+    async def execute_backup(self, src_dir, dest_path, list_files = None, skipped = None):
 
-        list_files = await self.get_files(src_dir, dest_path)
+        if list_files is None:
+            self.journal = None
+            list_files = await self.get_files(src_dir, dest_path)
          
         total_files = 0
         if list_files:
             total_files = len(list_files)
 
         if total_files == 0:
-            self.progress_label.set_text("No files to copy.")
+            self.cancel_btn.visible = False
+            if skipped:
+                self.progress.value = 100
+                self.progress_label.set_text(f"Destination already up to date ({len(skipped)} unchanged files).")
+            else:
+                self.progress_label.set_text("No files to copy.")
             return
+        elif skipped:
+            self.progress_label.set_text(f"Starting copying {total_files} files, {len(skipped)} unchanged files skipped...")
         else:
             self.progress_label.set_text(f"Starting copying {total_files} files...")
         ui.notify("Starting...")
@@ -455,6 +518,10 @@ class TransferAppFTP:
         #result = await run.io_bound(self.copy_with_progress_async, list_files, self.progress, self.cancel_btn)
         result = await self.copy_with_progress_async(list_files, self.progress, self.cancel_btn)
 
+        if self.mode == "Restore" and self.transfert_mode_select.value == "FTP":
+            # the Dwarf content changed, the cached listings are outdated
+            invalidate_ftp_cache(self.dwarf_ip_sta_mode, dest_path)
+
         if result:
             self.progress_label.set_text(f"End of Backup")
             ui.notify("✅ Backup complete and verified!")
@@ -482,7 +549,7 @@ class TransferAppFTP:
             except Exception as e:
                 ui.notify(f"❌ Error: {str(e)}", type="negative")
         else:
-            self.progress_label.set_text(f"Backup interrupted!")
+            self.progress_label.set_text(f"Backup interrupted! Start it again to resume.")
 
     @ui.refreshable
     def notify_me(self, msg: str | None) -> None:
@@ -541,6 +608,66 @@ class TransferAppFTP:
                hash.update(chunk)
         return hash.hexdigest()
 
+    async def download_ftp_parallel_async(self, all_files, progress_bar, cancel_button):
+        total_files = len(all_files)
+        downloaded = {"files": 0}
+
+        def on_progress(done_files, total, nb_bytes):
+            # called from the download threads, the UI is updated by the timer
+            downloaded["files"] = done_files
+
+        def update_progress():
+            progress_bar.value = round(downloaded["files"] / total_files * 100)
+
+        timer = ui.timer(0.5, update_progress)
+        try:
+            failed = await run.io_bound(ftp_download_files_parallel, self.dwarf_ip_sta_mode, all_files, progress=on_progress, cancel=lambda: self.cancel_backup)
+        finally:
+            timer.cancel()
+            update_progress()
+
+        cancel_button.visible = False
+        if self.cancel_backup:
+            self.notify_me.refresh("Backup cancelled.")
+            return False
+        if failed:
+            self.notify_me.refresh(f"⚠️ Backup incomplete: {len(failed)} files could not be downloaded.")
+            return False
+
+        self.notify_me.refresh("✅ Backup complete and verified!")
+        return True
+
+    async def upload_sftp_async(self, all_files, progress_bar, cancel_button):
+        def on_progress(done_files, total_files):
+            progress_bar.value = round(done_files / total_files * 100)
+
+        try:
+            async with SftpTransferClient(self.dwarf_ip_sta_mode) as client:
+                # only the files missing or different on the Dwarf are sent
+                self.progress_label.set_text("Comparing with the Dwarf content...")
+                to_upload, skipped = await client.plan_delta(all_files)
+                if not to_upload:
+                    progress_bar.value = 100
+                    self.progress_label.set_text(f"Dwarf already up to date ({len(skipped)} unchanged files).")
+                elif skipped:
+                    self.progress_label.set_text(f"Uploading {len(to_upload)} files, {len(skipped)} unchanged files skipped...")
+                failed = await client.upload_files(to_upload, progress=on_progress, cancel=lambda: self.cancel_backup)
+        except Exception as e:
+            cancel_button.visible = False
+            self.notify_me.refresh(f"❌ SFTP Error: {e}")
+            return False
+
+        cancel_button.visible = False
+        if self.cancel_backup:
+            self.notify_me.refresh("Backup cancelled.")
+            return False
+        if failed:
+            self.notify_me.refresh(f"⚠️ Backup incomplete: {len(failed)} files could not be uploaded.")
+            return False
+
+        self.notify_me.refresh("✅ Backup complete and verified!")
+        return True
+
     async def copy_with_progress_async(self, all_files, progress_bar, cancel_button):
         self.cancel_backup = False
         verified_files = 0
@@ -555,6 +682,15 @@ class TransferAppFTP:
         use_ftp = transfer_mode == "FTP"
         mode_use_ssh = True if use_ftp and is_restore else False
         print(f"mode_use_ssh: {mode_use_ssh}")
+
+        # --- FTP ➜ LOCAL (ARCHIVE) : parallel downloads ---
+        if use_ftp and is_archive and self.dwarf_ip_sta_mode:
+            return await self.download_ftp_parallel_async(all_files, progress_bar, cancel_button)
+
+        # --- LOCAL ➜ FTP (RESTORE) : one SFTP connection for all the files ---
+        if mode_use_ssh and self.dwarf_ip_sta_mode:
+            return await self.upload_sftp_async(all_files, progress_bar, cancel_button)
+
         # Conditional FTP connection block
         ftp = None
         ftp_ctx = ftp_conn(self.dwarf_ip_sta_mode) if use_ftp and self.dwarf_ip_sta_mode and not mode_use_ssh else None
@@ -563,7 +699,7 @@ class TransferAppFTP:
         created_dirs_cache = set()
 
         try:
-            for i, (src_file, dest_file) in enumerate(all_files):
+            for i, (src_file, dest_file, *_) in enumerate(all_files):
                 if self.cancel_backup:
                     self.notify_me.refresh("Backup cancelled.")
                     result = False
@@ -580,16 +716,12 @@ class TransferAppFTP:
 
                     # --- LOCAL ➜ LOCAL ---
                     else:
-                        Path(dest_file).parent.mkdir(parents=True, exist_ok=True)
-                        shutil.copy2(src_file, dest_file)
+                        # the checksum of the written data is checked against the source
+                        digest = await run.io_bound(copy_file_with_digest, src_file, dest_file)
                         if os.path.getsize(src_file) != os.path.getsize(dest_file):
                             raise Exception("Size mismatch after copy")
-
-                        # 🔒 Step 2 (Optional): Check hash for sensitive files
-                        #if os.path.splitext(src_file)[1] in ['.fits', '.json', '.jpg']:
-                        #    if file_hash(src_file) != file_hash(dest_file):
-                        #        ui.notify.refresh(f"Checksum mismatch: {src_file}")
-                        #        break
+                        if self.journal:
+                            self.journal.record_done(src_file, digest)
 
                     verified_files += 1
 
@@ -610,6 +742,8 @@ class TransferAppFTP:
 
         if not self.cancel_backup and verified_files == total_files:
             self.notify_me.refresh("✅ Backup complete and verified!")
+            if self.journal:
+                self.journal.compact()
             result = True
 
         elif not self.cancel_backup:
@@ -0,0 +1,97 @@
+from nicegui import ui
+
+from components.menu import menu
+from api.dwarf_transfer_queue import get_transfer_queue, PRIORITY_NAMES, JOB_QUEUED, JOB_RUNNING, JOB_FAILED, JOB_CANCELLED, JOB_FINISHED
+
+STATUS_ICONS = {
+    "queued": "⏳",
+    "running": "🔄",
+    "done": "✅",
+    "failed": "❌",
+    "cancelled": "⛔"
+}
+
+@ui.page('/TransferQueue')
+def transfer_queue_page():
+
+    menu("Transfer Queue")
+
+    # Launch the GUI
+    TransferQueueApp()
+
+class TransferQueueApp:
+    def __init__(self):
+        self.transfer_queue = get_transfer_queue()
+        self.build_ui()
+
+    def build_ui(self):
+        with ui.card().classes("w-full p-4 mt-2"):
+            with ui.row().classes("w-full items-center"):
+                self.summary_label = ui.label("").classes("text-lg font-semibold mr-auto")
+                ui.button("Clear finished", on_click=self.clear_finished)
+
+            self.job_list = ui.column().classes("w-full")
+
+        self.last_state = None
+        self.refresh()
+        ui.timer(1.0, self.refresh)
+
+    def refresh(self):
+        counts = self.transfer_queue.counts()
+        self.summary_label.set_text(f"{counts[JOB_RUNNING]} running, {counts[JOB_QUEUED]} queued, {counts['done']} done, {counts[JOB_FAILED]} failed")
+
+        # only rebuild the list when a job changed state, progress is updated in place
+        state = [(job.id, job.status, job.priority) for job in self.transfer_queue.jobs]
+        if state != self.last_state:
+            self.last_state = state
+            self.show_jobs()
+        else:
+            for job in self.transfer_queue.jobs:
+                if job.id in self.progress_items:
+                    progress, message = self.progress_items[job.id]
+                    progress.value = job.progress / 100
+                    message.set_text(self.job_text(job))
+
+    def job_text(self, job):
+        text = f"{job.done_files}/{job.total_files} files"
+        if job.skipped_files:
+            text += f", {job.skipped_files} unchanged"
+        if job.message:
+            text += f" - {job.message}"
+        return text
+
+    def show_jobs(self):
+        self.progress_items = {}
+        self.job_list.clear()
+        with self.job_list:
+            if not self.transfer_queue.jobs:
+                ui.label("No transfer in the queue.")
+                return
+
+            running = [job for job in self.transfer_queue.jobs if job.status == JOB_RUNNING]
+            queued = sorted((job for job in self.transfer_queue.jobs if job.status == JOB_QUEUED), key=lambda job: (job.priority, job.created))
+            finished = [job for job in reversed(self.transfer_queue.jobs) if job.status in JOB_FINISHED]
+
+            for job in running + queued + finished:
+                with ui.card().classes("w-full p-2"):
+                    with ui.row().classes("w-full items-center no-wrap"):
+                        ui.label(STATUS_ICONS.get(job.status, "")).classes("text-xl")
+                        with ui.column().classes("gap-0 mr-auto"):
+                            ui.label(f"{job.mode} ({job.transport}) : {job.label}").classes("font-semibold")
+                            ui.label(f"{job.src_dir} ➜ {job.dest_dir}").classes("text-xs")
+                            message = ui.label(self.job_text(job)).classes("text-sm")
+
+                        if job.status == JOB_QUEUED:
+                            ui.select(PRIORITY_NAMES, value=job.priority, label="Priority",
+                                      on_change=lambda e, job_id=job.id: self.transfer_queue.set_priority(job_id, e.value)).classes("w-28")
+                        if job.status in (JOB_QUEUED, JOB_RUNNING):
+                            ui.button(icon="cancel", on_click=lambda job_id=job.id: self.transfer_queue.cancel_job(job_id)).props("flat").tooltip("Cancel")
+                        if job.status in (JOB_FAILED, JOB_CANCELLED):
+                            ui.button(icon="replay", on_click=lambda job_id=job.id: self.transfer_queue.retry_job(job_id)).props("flat").tooltip("Retry")
+
+                    progress = ui.linear_progress(value=job.progress / 100, show_value=False)
+                    self.progress_items[job.id] = (progress, message)
+
+    def clear_finished(self):
+        self.transfer_queue.clear_finished()
+        self.refresh()
@@ -0,0 +1,41 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# the tests import the api package like the application, from the repository root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from api.dwarf_backup_db import connect_db, close_db
+
+@pytest.fixture
+def db_conn(tmp_path, monkeypatch):
+    """New archive database in tmp_path, the DSO catalog imported from the repository."""
+    monkeypatch.chdir(ROOT_DIR)
+    conn = connect_db(str(tmp_path / "db" / "dwarf_backup.db"))
+    yield conn
+    close_db(conn)
+
+@pytest.fixture
+def ftp_server(tmp_path):
+    """Anonymous read-only FTP server on localhost serving tmp_path/remote, like the Dwarf: (root, port)."""
+    pytest.importorskip("pyftpdlib")
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    root = tmp_path / "remote"
+    root.mkdir()
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(str(root))
+    handler = type("DwarfHandler", (FTPHandler,), {"authorizer": authorizer})
+    server = ThreadedFTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"timeout": 0.1}, daemon=True)
+    thread.start()
+    try:
+        yield root, server.address[1]
+    finally:
+        server.close_all()
+        thread.join(timeout=5)
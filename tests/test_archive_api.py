@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import archive_api as archive_api_module
+from api.archive_api import archive_api, keyset_page
+
+@pytest.fixture
+def client(db_conn, tmp_path, monkeypatch):
+    open_archive = archive_api_module.open_archive
+    monkeypatch.setattr(archive_api_module, "open_archive", lambda: open_archive(tmp_path / "db" / "dwarf_backup.db"))
+    for name in ("M 31", "M 42", "M 45", "NGC 7000", "IC 434"):
+        db_conn.execute("INSERT INTO AstroObject (name) VALUES (?)", (name,))
+    db_conn.commit()
+    app = FastAPI()
+    app.include_router(archive_api)
+    return TestClient(app)
+
+def test_keyset_page_follows_the_ids(db_conn, client):
+    db_conn.row_factory = sqlite3.Row
+    select = "SELECT id, name FROM AstroObject"
+    names = []
+    after = None
+    while True:
+        page = keyset_page(db_conn, select, [], [], "id", after, 2)
+        names += [item["name"] for item in page["items"]]
+        after = page["next_after"]
+        if after is None:
+            break
+        assert len(page["items"]) == 2
+    assert names == ["M 31", "M 42", "M 45", "NGC 7000", "IC 434"]
+
+    page = keyset_page(db_conn, select, ["name LIKE ?"], ["M%"], "id", None, 3)
+    assert ([item["name"] for item in page["items"]], page["next_after"]) == (["M 31", "M 42", "M 45"], None)
+
+def test_objects_pages(client):
+    first = client.get("/api/objects", params={"limit": 3}).json()
+    assert [item["name"] for item in first["items"]] == ["M 31", "M 42", "M 45"]
+    second = client.get("/api/objects", params={"limit": 3, "after": first["next_after"]}).json()
+    assert [item["name"] for item in second["items"]] == ["NGC 7000", "IC 434"]
+    assert second["next_after"] is None
+    assert client.get("/api/objects", params={"limit": 0}).status_code == 422
+
+def test_etag_of_the_db_version(db_conn, client):
+    response = client.get("/api/objects")
+    etag = response.headers["etag"]
+    assert response.json()["version"] == int(etag.strip('"'))
+
+    for if_none_match in (etag, f"W/{etag}", f'"0", {etag}', "*"):
+        response = client.get("/api/objects", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    assert client.get("/api/objects", headers={"If-None-Match": '"0"'}).status_code == 200
+
+    # any change of the archive changes the ETag
+    db_conn.execute("UPDATE AstroObject SET description = 'Andromeda' WHERE name = 'M 31'")
+    db_conn.commit()
+    response = client.get("/api/objects", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+
+from api.dwarf_backup_db import connect_db, close_db, SUBFRAME_QUALITY_COLUMNS
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_quality_columns_added_to_an_existing_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT_DIR)
+    db_name = tmp_path / "db" / "dwarf_backup.db"
+    db_name.parent.mkdir()
+    # SubFrame as created before the frame quality analysis
+    conn = sqlite3.connect(db_name)
+    conn.execute("""
+        CREATE TABLE SubFrame (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dwarf_data_id INTEGER NOT NULL,
+            file_name TEXT NOT NULL,
+            format TEXT,
+            frame_type TEXT,
+            date_obs TEXT,
+            exp_time REAL,
+            gain INTEGER,
+            filter TEXT,
+            ccd_temp REAL,
+            file_size INTEGER,
+            modification_time INTEGER,
+            UNIQUE("dwarf_data_id", "file_name")
+        )
+    """)
+    conn.execute("INSERT INTO SubFrame (dwarf_data_id, file_name, format) VALUES (1, 'M31_0001.fits', 'fits')")
+    conn.commit()
+    conn.close()
+
+    for _ in range(2):
+        conn = connect_db(str(db_name))
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(SubFrame)")}
+        assert {column for column, _ in SUBFRAME_QUALITY_COLUMNS} <= columns
+        assert conn.execute("SELECT file_name, fwhm, excluded FROM SubFrame").fetchall() == [("M31_0001.fits", None, 0)]
+        close_db(conn)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from api.dwarf_backup_fct import stretch_lut, PREVIEW_CONTRAST_GAIN, PREVIEW_LUT_SIZE
+
+def reference_stretch(data, target_bkg=0.25, shadows_clip=-1.25):
+    """auto_stretch: shadows clipping at median + shadows_clip * avg_dev, midtones putting median - c0 at target_bkg."""
+    median = np.median(data)
+    c0 = np.clip(median + shadows_clip * np.mean(np.abs(data - median)), 0, 1)
+    x = median - c0
+    m = (target_bkg - 1) * x / ((2 * target_bkg - 1) * x - target_bkg)
+    x = np.clip((data - c0) / (1 - c0), 0, 1)
+    stretched = np.where(data < c0, 0, (m - 1) * x / ((2 * m - 1) * x - m))
+    return 1 / (1 + np.exp(-PREVIEW_CONTRAST_GAIN * (stretched - 0.5)))
+
+def test_stretch_lut_matches_auto_stretch():
+    rng = np.random.default_rng(0)
+    for background in (0.02, 0.1, 0.3):
+        data16 = np.round(np.clip(rng.normal(background, 0.01, (200, 300)), 0, 1) * (PREVIEW_LUT_SIZE - 1)).astype(np.uint16)
+        data = data16 / (PREVIEW_LUT_SIZE - 1)
+        median = float(np.median(data))
+        lut = stretch_lut(median, float(np.mean(np.abs(data - median))))
+        assert np.abs(lut[data16] / 255 - reference_stretch(data)).max() <= 1 / 255
@@ -0,0 +1,28 @@
+import time
+import calendar
+
+from api.dwarf_backup_fct_ftp import parse_list_line, parse_mlsd_time
+
+def test_parse_mlsd_time():
+    assert parse_mlsd_time("20250101200000") == calendar.timegm((2025, 1, 1, 20, 0, 0))
+    assert parse_mlsd_time("20250101200000.123") == calendar.timegm((2025, 1, 1, 20, 0, 0))
+    assert parse_mlsd_time(None) is None
+    assert parse_mlsd_time("yesterday") is None
+
+def test_parse_unix_list_lines():
+    assert parse_list_line("-rw-r--r--    1 0        0         2097152 Jan 01  2024 M31_0001.fits") == {
+        "name": "M31_0001.fits", "type": "file", "size": 2097152, "modify": calendar.timegm((2024, 1, 1, 0, 0, 0))}
+    entry = parse_list_line("drwxr-xr-x    2 0        0            4096 Mar 05 21:30 DWARF_RAW_M42 EXP 15")
+    assert (entry["name"], entry["type"]) == ("DWARF_RAW_M42 EXP 15", "dir")
+    assert time.gmtime(entry["modify"])[1:5] == (3, 5, 21, 30)
+    assert entry["modify"] <= time.time() + 86400
+    assert parse_list_line("lrwxrwxrwx    1 0        0              10 Jan 01  2024 last -> DWARF_RAW_M31")["name"] == "last"
+
+def test_parse_dos_list_lines():
+    assert parse_list_line("01-02-25  08:15PM       <DIR>          Astronomy") == {
+        "name": "Astronomy", "type": "dir", "size": None, "modify": calendar.timegm((2025, 1, 2, 20, 15, 0))}
+    assert parse_list_line("01-02-25  08:15PM              1234 stacked.jpg")["size"] == 1234
+
+def test_unparsed_lines():
+    assert parse_list_line("total 12") is None
+    assert parse_list_line("") is None
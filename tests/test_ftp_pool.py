@@ -0,0 +1,143 @@
+import os
+import ftplib
+import threading
+
+import pytest
+
+from api import dwarf_backup_fct_ftp as fct_ftp
+
+def make_session(root, nb_files = 6, size = 20000):
+    session = root / "DWARF_RAW_M31_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    session.mkdir()
+    for i in range(nb_files):
+        (session / f"M31_{i:04d}.fits").write_bytes(bytes([i]) * (size + i))
+    return session
+
+def test_pool_reuses_connections(ftp_server):
+    root, port = ftp_server
+    (root / "a.txt").write_text("a")
+    with fct_ftp.FtpConnectionPool("127.0.0.1", size=2, port=port) as pool:
+        with pool.connection() as ftp:
+            first = ftp
+        with pool.connection() as ftp:
+            assert ftp is first
+            assert "a.txt" in ftp.nlst()
+        # a missing file leaves the connection usable
+        with pytest.raises(ftplib.error_perm):
+            with pool.connection() as ftp:
+                ftp.size("/missing.txt")
+        assert pool.idle == [first]
+    assert pool.opened == 0
+
+def test_parallel_download(ftp_server, tmp_path):
+    root, port = ftp_server
+    session = make_session(root)
+    local = tmp_path / "local"
+    all_files = fct_ftp.download_ftp_tree("127.0.0.1", "/" + session.name, str(local), port=port)
+    assert len(all_files) == 6
+
+    progress = []
+    failed = fct_ftp.ftp_download_files_parallel("127.0.0.1", all_files, max_connections=3, port=port,
+                                                 progress=lambda done, total, nb_bytes: progress.append((done, total)))
+    assert failed == []
+    assert sorted(progress) == [(i, 6) for i in range(1, 7)]
+    for remote_file in session.iterdir():
+        assert (local / remote_file.name).read_bytes() == remote_file.read_bytes()
+    assert not list(local.glob("*.part"))
+
+def test_transient_failure_of_the_last_file_is_retried(ftp_server, tmp_path, monkeypatch):
+    """The last file fails once and lowers the concurrency: a remaining worker must still take its retry."""
+    root, port = ftp_server
+    session = make_session(root, nb_files=2)
+    local = tmp_path / "local"
+    all_files = fct_ftp.download_ftp_tree("127.0.0.1", "/" + session.name, str(local), port=port)
+    flaky_remote = all_files[-1][0]
+
+    download_file = fct_ftp.ftp_download_file
+    calls = []
+    def flaky_download(ftp, remote_path, local_path, *args, **kwargs):
+        calls.append(remote_path)
+        if remote_path == flaky_remote and calls.count(remote_path) == 1:
+            # the beginning of the file received, then the link drops
+            with open(local_path + ".part", "wb") as f:
+                f.write((root / remote_path.lstrip("/")).read_bytes()[:1000])
+            raise ftplib.error_temp("426 Connection closed; transfer aborted")
+        return download_file(ftp, remote_path, local_path, *args, **kwargs)
+
+    monkeypatch.setattr(fct_ftp, "ftp_download_file", flaky_download)
+    monkeypatch.setattr(fct_ftp, "FTP_RETRY_BACKOFF", 0.05)
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(failed=fct_ftp.ftp_download_files_parallel(
+        "127.0.0.1", all_files, max_connections=2, port=port)), daemon=True)
+    thread.start()
+    thread.join(timeout=20)
+    assert not thread.is_alive(), "download hangs after a transient failure"
+
+    assert result["failed"] == []
+    assert calls.count(flaky_remote) == 2
+    assert (local / os.path.basename(flaky_remote)).read_bytes() == (root / flaky_remote.lstrip("/")).read_bytes()
+
+def test_permanent_failure_is_reported(ftp_server, tmp_path, monkeypatch):
+    root, port = ftp_server
+    session = make_session(root, nb_files=2)
+    local = tmp_path / "local"
+    all_files = fct_ftp.download_ftp_tree("127.0.0.1", "/" + session.name, str(local), port=port)
+    all_files.append(("/" + session.name + "/missing.fits", str(local / "missing.fits"), None, None))
+    monkeypatch.setattr(fct_ftp, "FTP_RETRY_BACKOFF", 0.05)
+
+    failed = fct_ftp.ftp_download_files_parallel("127.0.0.1", all_files, max_connections=2, port=port)
+    assert [remote_path for remote_path, _ in failed] == ["/" + session.name + "/missing.fits"]
+
+def test_cancel_reports_the_files_not_downloaded(ftp_server, tmp_path):
+    root, port = ftp_server
+    session = make_session(root)
+    all_files = fct_ftp.download_ftp_tree("127.0.0.1", "/" + session.name, str(tmp_path / "local"), port=port)
+    failed = fct_ftp.ftp_download_files_parallel("127.0.0.1", all_files, port=port, cancel=lambda: True)
+    assert sorted(failed) == sorted((remote_path, local_path) for remote_path, local_path, *_ in all_files)
+
+def test_listing_gives_size_and_date(ftp_server, tmp_path):
+    root, port = ftp_server
+    session = make_session(root, nb_files=1)
+    remote_file = next(session.iterdir())
+    os.utime(remote_file, (1735761600, 1735761600))
+    all_files = fct_ftp.download_ftp_tree("127.0.0.1", "/", str(tmp_path), port=port)
+    assert all_files == [(f"/{session.name}/{remote_file.name}", str(tmp_path / session.name / remote_file.name),
+                          remote_file.stat().st_size, 1735761600)]
+
+def test_download_file_refreshes_a_restacked_file(ftp_server, tmp_path):
+    """A new stacked file of the same size replaces the local copy, an unchanged one is not downloaded again."""
+    root, port = ftp_server
+    remote_file = root / "stacked.fits"
+    remote_file.write_bytes(b"a" * 5000)
+    os.utime(remote_file, (1735761600, 1735761600))
+    local_file = tmp_path / "local" / "stacked.fits"
+
+    with fct_ftp.ftp_conn("127.0.0.1", port) as ftp:
+        fct_ftp.ftp_download_file(ftp, "/stacked.fits", str(local_file))
+        assert local_file.read_bytes() == b"a" * 5000
+        assert local_file.stat().st_mtime == 1735761600
+
+        # same size and date: kept
+        local_file.write_bytes(b"k" * 5000)
+        os.utime(local_file, (1735761600, 1735761600))
+        fct_ftp.ftp_download_file(ftp, "/stacked.fits", str(local_file), 5000, 1735761600)
+        assert local_file.read_bytes() == b"k" * 5000
+
+        # restacked: same size, newer date
+        remote_file.write_bytes(b"b" * 5000)
+        os.utime(remote_file, (1735848000, 1735848000))
+        fct_ftp.ftp_download_file(ftp, "/stacked.fits", str(local_file))
+        assert local_file.read_bytes() == b"b" * 5000
+        assert local_file.stat().st_mtime == 1735848000
+
+def test_download_file_resumes_a_part_file(ftp_server, tmp_path):
+    root, port = ftp_server
+    (root / "M31_0001.fits").write_bytes(bytes(range(256)) * 40)
+    local_file = tmp_path / "M31_0001.fits"
+    (tmp_path / "M31_0001.fits.part").write_bytes((bytes(range(256)) * 40)[:3000])
+
+    with fct_ftp.ftp_conn("127.0.0.1", port) as ftp:
+        fct_ftp.ftp_download_file(ftp, "/M31_0001.fits", str(local_file))
+    assert local_file.read_bytes() == bytes(range(256)) * 40
+    assert not (tmp_path / "M31_0001.fits.part").exists()
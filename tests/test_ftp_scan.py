@@ -0,0 +1,58 @@
+import os
+import json
+
+import numpy as np
+from astropy.io import fits
+
+from api.dwarf_backup_db_api import get_session_stats
+from api.dwarf_backup_fct_ftp import scan_dwarf_ftp
+
+def write_files(directory, names, size = 100):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_bytes(b"x" * size)
+
+def test_scan_stores_listing_stats_and_returns_new_sessions(ftp_server, db_conn, tmp_path):
+    root, port = ftp_server
+    astro_dir = root / "Astronomy"
+    session = astro_dir / "DWARF_RAW_TELE_M31_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    write_files(session, ["M31_0001.fits", "M31_0002.fits", "failed_M31_0003.fits", "stacked.jpg", "stacked_thumbnail.jpg"])
+    header = fits.Header()
+    header["EXPTIME"] = 30.0
+    fits.PrimaryHDU(np.zeros((4, 4), dtype=np.uint16), header).writeto(session / "stacked-2_M31.fits")
+    (session / "shotsInfo.json").write_text(json.dumps({"target": "M31", "exp": 15, "gain": 80, "shotsStacked": 2}))
+
+    mosaic = astro_dir / "DWARF_RAW_TELE_M42_MOSAIC_2x1_EXP_15_GAIN_80_2025-01-02-20-00-00-000"
+    write_files(mosaic, ["stacked.jpg", "M42_0001.fits"])
+    write_files(mosaic / "Panel_1", ["M42_0001.fits", "M42_0002.fits"])
+    write_files(mosaic / "Panel_2", ["M42_0001.fits"])
+
+    db_name = str(tmp_path / "db" / "dwarf_backup.db")
+    local_root = tmp_path / "local"
+    new_sessions = []
+    added, deleted = scan_dwarf_ftp(db_name, "127.0.0.1", "/Astronomy", 1, str(local_root), port=port, new_sessions=new_sessions)
+    assert (added, deleted) == (2, 0)
+
+    local_session = str(local_root / "DWARF_1" / session.name)
+    assert sorted(new_sessions) == sorted([local_session, str(local_root / "DWARF_1" / mosaic.name)])
+    assert sorted(os.listdir(local_session)) == ["shotsInfo.json", "stacked-2_M31.fits", "stacked.jpg", "stacked_thumbnail.jpg"]
+
+    rows = dict(db_conn.execute("""
+        SELECT DwarfEntry.session_dir, DwarfData.id FROM DwarfEntry JOIN DwarfData ON DwarfEntry.dwarf_data_id = DwarfData.id
+    """).fetchall())
+    stats = get_session_stats(db_conn, rows[session.name])
+    assert (stats["fits_count"], stats["failed_fits_count"], stats["panel_count"]) == (2, 1, 0)
+    assert stats["file_count"] == 7
+    assert stats["total_size"] == sum(path.stat().st_size for path in session.iterdir())
+
+    stats = get_session_stats(db_conn, rows[mosaic.name])
+    assert (stats["fits_count"], stats["panel_count"]) == (3, 2)
+
+    # the stacked header of the local copy is indexed
+    assert db_conn.execute("SELECT frame_type, exp_time FROM SubFrame WHERE dwarf_data_id = ?",
+                           (rows[session.name],)).fetchall() == [("stacked", 30.0)]
+
+    # nothing new on the second scan
+    new_sessions = []
+    assert scan_dwarf_ftp(db_name, "127.0.0.1", "/Astronomy", 1, str(local_root), port=port, new_sessions=new_sessions) == (0, 0)
+    assert new_sessions == []
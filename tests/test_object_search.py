@@ -0,0 +1,35 @@
+from api.object_search import ObjectSearchIndex, match_pattern, highlight_match
+
+ENTRIES = {
+    1: ["M 31", "Andromeda Galaxy", "NGC 224"],
+    2: ["M 42", "Orion Nebula", "NGC 1976"],
+    3: ["M 33", "Triangulum Galaxy", "NGC 598"],
+}
+
+def test_search_ignores_case_spaces_and_punctuation():
+    index = ObjectSearchIndex(ENTRIES)
+    assert index.search("m-31") == {1}
+    assert index.search("ngc 1976") == {2}
+    assert index.search("galaxy") == {1, 3}
+    assert index.search(" ") is None
+    assert index.search("pleiades") == set()
+
+def test_search_narrows_the_previous_result():
+    index = ObjectSearchIndex(ENTRIES)
+    assert index.search("m") == {1, 2, 3}
+    assert index.search("m3") == {1, 3}
+    assert index.last_matches == {1, 3}
+    # the candidates of a longer query come from the previous matches
+    index.keys[2] = index.keys[2] + "\nm33"
+    assert index.search("m33") == {3}
+    # another query starts from the trigram sets again
+    assert index.search("orion") == {2}
+
+def test_match_pattern_and_highlight():
+    pattern = match_pattern("ngc224")
+    assert highlight_match("NGC 224", pattern) == "<mark>NGC 224</mark>"
+    assert highlight_match("Andromeda <M31>", match_pattern("m31")) == "Andromeda &lt;<mark>M31</mark>&gt;"
+    assert highlight_match("Orion Nebula", pattern) is None
+    assert match_pattern("--") is None
+    assert highlight_match("M 42", None) is None
+    assert ObjectSearchIndex(ENTRIES).matched_text(1, pattern) == "NGC 224"
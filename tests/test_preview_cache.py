@@ -0,0 +1,64 @@
+import os
+import time
+import threading
+
+from api.preview_cache import PreviewCache
+
+def test_renders_of_a_key_never_overlap_after_a_failure(tmp_path):
+    source = tmp_path / "stacked.fits"
+    source.write_bytes(b"fits")
+    cache = PreviewCache(str(tmp_path / "cache"))
+    os.makedirs(cache.cache_dir)
+
+    state = {"active": 0, "max_active": 0, "renders": 0}
+    state_lock = threading.Lock()
+    def render(src_path, dest_path, max_size):
+        with state_lock:
+            state["active"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+            state["renders"] += 1
+            failing = state["renders"] == 1
+        time.sleep(0.1)
+        with state_lock:
+            state["active"] -= 1
+        if failing:
+            raise ValueError("unreadable")
+        with open(dest_path, "wb") as f:
+            f.write(b"png")
+
+    # the second request waits for the failed render, the third one comes while the second one renders
+    results = []
+    threads = []
+    for delay in (0, 0.02, 0.13):
+        time.sleep(delay)
+        threads.append(threading.Thread(target=lambda: results.append(cache.get(str(source), render, {"max_size": 64}))))
+        threads[-1].start()
+    for thread in threads:
+        thread.join()
+
+    assert state["max_active"] == 1
+    # the failed render, then one render for all the waiting requests
+    assert state["renders"] == 2
+    assert results.count(None) == 1
+    assert all(path and os.path.isfile(path) for path in results if path is not None)
+    assert cache.key_locks == {}
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith(".part")]
+
+def test_size_cap_evicts_the_least_recently_used(tmp_path):
+    cache = PreviewCache(str(tmp_path / "cache"))
+    os.makedirs(cache.cache_dir)
+    def render(src_path, dest_path):
+        with open(dest_path, "wb") as f:
+            f.write(b"x" * 1000)
+
+    paths = []
+    for i in range(3):
+        source = tmp_path / f"stacked_{i}.fits"
+        source.write_bytes(b"fits")
+        paths.append(cache.get(str(source), render))
+        os.utime(paths[-1], (1000 + i, 1000 + i))
+
+    cache.set_max_size(2500 / 1024 / 1024)
+    assert [os.path.exists(path) for path in paths] == [False, True, True]
+    stats = cache.stats()
+    assert (stats["files"], stats["evictions"], stats["misses"]) == (2, 1, 3)
@@ -0,0 +1,27 @@
+import os
+
+import cv2
+import numpy as np
+
+from api import preview_pregen
+from api.preview_cache import PreviewCache, PREVIEW_CACHE_MAX_MB
+
+def test_workers_keep_the_user_size_cap(tmp_path, monkeypatch):
+    session = tmp_path / "DWARF_RAW_M31_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    session.mkdir()
+    image = np.random.default_rng(0).integers(0, 65535, (64, 96, 3), dtype=np.uint16)
+    cv2.imwrite(str(session / "stacked-16_M31.tiff"), image)
+    cv2.imwrite(str(session / "stacked.jpg"), (image // 256).astype(np.uint8))
+
+    # user setting above the default cap, filled by an older preview (sparse file)
+    cache = PreviewCache(str(tmp_path / "cache"), (PREVIEW_CACHE_MAX_MB + 256) * 1024 * 1024)
+    os.makedirs(cache.cache_dir)
+    old_preview = os.path.join(cache.cache_dir, "0" * 40 + ".png")
+    with open(old_preview, "wb") as f:
+        f.truncate((PREVIEW_CACHE_MAX_MB + 64) * 1024 * 1024)
+    os.utime(old_preview, (1000, 1000))
+    monkeypatch.setattr(preview_pregen, "preview_cache", cache)
+
+    assert preview_pregen.pregenerate_previews([str(session)], max_workers=1) == (2, 0)
+    assert os.path.exists(old_preview)
+    assert len(cache.entries()) == 3
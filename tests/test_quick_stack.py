@@ -0,0 +1,21 @@
+import numpy as np
+
+from api.quick_stack import sigma_clipped_median
+
+def test_sigma_clipped_median_rejects_the_outliers():
+    rng = np.random.default_rng(0)
+    stack = rng.normal(1000, 10, (9, 4, 5, 3)).astype(np.float32)
+    clean = stack.mean(axis=0)
+    # satellite trail on one frame
+    stack[3, 2, :, :] = 60000
+    result = sigma_clipped_median(stack)
+    assert result.shape == (4, 5, 3)
+    assert result.dtype == np.float32
+    assert np.abs(result[2] - 1000).max() < 30
+    assert np.abs(stack.mean(axis=0)[2] - 1000).min() > 5000
+    # without outlier: the mean of the kept values
+    assert np.abs(result[0] - clean[0]).max() < 10
+
+def test_sigma_clipped_median_of_identical_frames():
+    stack = np.full((5, 2, 2, 3), 250, dtype=np.float32)
+    assert np.array_equal(sigma_clipped_median(stack), np.full((2, 2, 3), 250, dtype=np.float32))
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from api.session_stats import compute_session_stats, read_session_stats, walk_session_dir
+from api.dwarf_backup_fct import count_fits_files, count_failed_fits_files, count_tiff_files, count_failed_tiff_files
+
+def write_files(directory, names, size = 10):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_bytes(b"x" * size)
+
+@pytest.fixture
+def session(tmp_path):
+    session = tmp_path / "DWARF_RAW_TELE_M31_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    write_files(session, ["M31_0001.fits", "M31_0002.fits", "failed_M31_0003.fits", "stacked-16_M31.fits",
+                          "stacked.fits", "stacked.jpg", "M31_0004.tiff", "failed_M31_0005.tiff", "shotsInfo.json"])
+    write_files(session / "Thumbnail", ["M31_0001.jpg"])
+    return session
+
+@pytest.fixture
+def mosaic(tmp_path):
+    mosaic = tmp_path / "DWARF_RAW_TELE_M31_MOSAIC_2x1_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    write_files(mosaic, ["M31_0001.fits", "failed_M31_0002.fits", "stacked.jpg", "M31_0003.tiff"])
+    write_files(mosaic / "Panel_1", ["M31_0001.fits", "M31_0002.fits", "failed_M31_0003.fits", "stacked.jpg"])
+    write_files(mosaic / "Panel_2", ["M31_0001.fits", "M31_0001.tiff"])
+    return mosaic
+
+def baseline_counts(directory):
+    return (count_fits_files(str(directory)), count_failed_fits_files(str(directory)),
+            count_tiff_files(str(directory)), count_failed_tiff_files(str(directory)))
+
+def stats_counts(stats):
+    return stats["fits_count"], stats["failed_fits_count"], stats["tiff_count"], stats["failed_tiff_count"]
+
+def test_session_counts_match_the_explore_counters(session):
+    stats = read_session_stats(str(session))
+    assert stats_counts(stats) == baseline_counts(session) == (3, 1, 1, 1)
+    assert stats["panel_count"] == 0
+    assert stats["file_count"] == 10
+    assert stats["total_size"] == 100
+    assert stats["fits_size"] == 50
+    assert stats["tiff_size"] == 20
+    assert stats["image_size"] == 20
+    assert stats["other_size"] == 10
+
+def test_mosaic_counts_only_the_panel_frames(mosaic):
+    stats = read_session_stats(str(mosaic))
+    assert stats_counts(stats) == baseline_counts(mosaic) == (3, 1, 1, 0)
+    assert stats["panel_count"] == 2
+
+def test_walk_does_not_follow_directory_links(session):
+    try:
+        os.symlink(session, session / "loop", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("symbolic links not available")
+    dir_mtime, files, subdirs = walk_session_dir(str(session))
+    assert subdirs == ["Thumbnail"]
+    assert len(files) == 10
+
+def test_compute_from_a_listing():
+    files = [("M31_0001.fits", "", 100), ("stacked.jpg", "", 50), ("M31_0001.fits", "Panel_1", 100),
+             ("M31_0002.fits", "Panel_1", 100), ("M31_0001.fits", "Panel_2/sub", 100)]
+    stats = compute_session_stats("/Astronomy/DWARF_RAW_M31_MOSAIC_2x1", 1735761600, files, ["Panel_1", "Panel_2"])
+    assert stats["fits_count"] == 2
+    assert stats["panel_count"] == 1
+    assert stats["total_size"] == 450
+    assert stats["dir_mtime"] == 1735761600
@@ -0,0 +1,146 @@
+import os
+import asyncio
+from pathlib import Path
+
+import pytest
+
+asyncssh = pytest.importorskip("asyncssh")
+
+from api.dwarf_backup_fct_sftp import SftpTransferClient
+
+class DwarfSSHServer(asyncssh.SSHServer):
+    """root / rockchip, like the Dwarf."""
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return username == "root" and password == "rockchip"
+
+class CountingSFTPServer(asyncssh.SFTPServer):
+    """SFTP server chrooted to the test directory, counting the requests the client sends."""
+    requests = None
+
+    def __init__(self, chan, root):
+        super().__init__(chan, chroot=root)
+
+    def count(self, name):
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    def stat(self, path):
+        self.count("stat")
+        return super().stat(path)
+
+    def mkdir(self, path, attrs):
+        self.count("mkdir")
+        return super().mkdir(path, attrs)
+
+    def open(self, path, pflags, attrs):
+        self.count("open")
+        self.requests["open_now"] = self.requests.get("open_now", 0) + 1
+        self.requests["open_max"] = max(self.requests.get("open_max", 0), self.requests["open_now"])
+        return super().open(path, pflags, attrs)
+
+    def close(self, file_obj):
+        self.requests["open_now"] -= 1
+        return super().close(file_obj)
+
+async def with_sftp_server(root, test):
+    """Run test(port, requests) against a local asyncssh server serving root."""
+    requests = {}
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+    server_class = type("Server", (CountingSFTPServer,), {"requests": requests})
+    server = await asyncssh.create_server(DwarfSSHServer, "127.0.0.1", 0, server_host_keys=[host_key],
+                                          sftp_factory=lambda chan: server_class(chan, str(root)))
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await test(port, requests)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+def make_restore(tmp_path, nb_files = 8):
+    local = tmp_path / "local" / "DWARF_RAW_M31_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    local.mkdir(parents=True)
+    all_files = []
+    for i in range(nb_files):
+        sub_dir = local / ("Panel_1" if i % 2 else "")
+        sub_dir.mkdir(exist_ok=True)
+        path = sub_dir / f"M31_{i:04d}.fits"
+        path.write_bytes(bytes([i]) * (50000 + i))
+        rel_path = os.path.relpath(path, local).replace(os.sep, "/")
+        all_files.append((str(path), f"/Astronomy/{local.name}/{rel_path}"))
+    return all_files
+
+def test_upload_files_creates_dirs_once_and_uploads_concurrently(tmp_path):
+    remote = tmp_path / "remote"
+    (remote / "Astronomy").mkdir(parents=True)
+    all_files = make_restore(tmp_path)
+
+    async def test(port, requests):
+        async with SftpTransferClient("127.0.0.1", port=port, max_concurrent=4) as client:
+            progress = []
+            failed = await client.upload_files(all_files, progress=lambda done, total: progress.append((done, total)))
+            assert failed == []
+            assert progress[-1] == (8, 8)
+            # /Astronomy exists, the session and its panel are created: one mkdir each
+            assert requests["mkdir"] == 2
+            stats = requests["stat"]
+
+            # the directories are known now: no more stat or mkdir
+            await client.ensure_dirs({os.path.dirname(remote_path) for _, remote_path in all_files})
+            assert requests["mkdir"] == 2
+            assert requests["stat"] == stats
+        return requests
+
+    requests = asyncio.run(with_sftp_server(remote, test))
+    assert 1 < requests["open_max"] <= 4
+    for local_path, remote_path in all_files:
+        remote_file = remote / remote_path.lstrip("/")
+        assert remote_file.read_bytes() == Path(local_path).read_bytes()
+        # preserved for the next delta restore
+        assert int(remote_file.stat().st_mtime) == int(os.stat(local_path).st_mtime)
+
+def test_upload_files_cancel(tmp_path):
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    all_files = make_restore(tmp_path, nb_files=3)
+
+    async def test(port, requests):
+        async with SftpTransferClient("127.0.0.1", port=port) as client:
+            return await client.upload_files(all_files, cancel=lambda: True)
+
+    assert sorted(asyncio.run(with_sftp_server(remote, test))) == sorted(all_files)
+
+def test_plan_delta_skips_the_unchanged_files(tmp_path):
+    remote = tmp_path / "remote"
+    remote.mkdir()
+    all_files = make_restore(tmp_path, nb_files=4)
+
+    async def test(port, requests):
+        async with SftpTransferClient("127.0.0.1", port=port) as client:
+            to_upload, skipped = await client.plan_delta(all_files)
+            assert (to_upload, skipped) == (all_files, [])
+            assert await client.upload_files(to_upload) == []
+
+            # changed content and size, changed date only, unchanged
+            with open(all_files[0][0], "ab") as f:
+                f.write(b"more")
+            os.utime(all_files[1][0], (1735761600, 1735761600))
+
+            to_upload, skipped = await client.plan_delta(all_files)
+            assert to_upload == all_files[:2]
+            assert skipped == all_files[2:]
+
+            # same size and date but another content: only found with the digest
+            remote_file = remote / all_files[2][1].lstrip("/")
+            stat = remote_file.stat()
+            remote_file.write_bytes(b"z" * stat.st_size)
+            os.utime(remote_file, (stat.st_atime, stat.st_mtime))
+            to_upload, skipped = await client.plan_delta(all_files[2:], check_digest=True)
+            assert to_upload == [all_files[2]]
+            assert skipped == [all_files[3]]
+
+    asyncio.run(with_sftp_server(remote, test))
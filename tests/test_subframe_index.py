@@ -0,0 +1,43 @@
+import numpy as np
+from astropy.io import fits
+
+from api import subframe_index
+
+def write_frame(path, exp_time):
+    header = fits.Header()
+    header["DATE-OBS"] = "2025-01-01T20:00:00"
+    header["EXPTIME"] = exp_time
+    header["GAIN"] = 80
+    header["CCD-TEMP"] = 12.5
+    fits.PrimaryHDU(np.zeros((4, 4), dtype=np.uint16), header).writeto(path)
+
+def test_index_reads_each_frame_once_with_one_pool(db_conn, tmp_path, monkeypatch):
+    session = tmp_path / "DWARF_RAW_M31_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    session.mkdir()
+    for i in range(3):
+        write_frame(session / f"M31_{i:04d}.fits", 15.0)
+    write_frame(session / "failed_M31_0003.fits", 15.0)
+
+    pools = []
+    executor = subframe_index.ThreadPoolExecutor
+    def counting_executor(*args, **kwargs):
+        pools.append(args)
+        return executor(*args, **kwargs)
+    monkeypatch.setattr(subframe_index, "ThreadPoolExecutor", counting_executor)
+
+    # stacked.jpg and stacked.png of the same session
+    assert subframe_index.index_session_subframes(db_conn, [1, 2], str(session)) == 4
+    assert len(pools) == 1
+    for dwarf_data_id in (1, 2):
+        rows = db_conn.execute("SELECT file_name, frame_type, exp_time, gain, ccd_temp FROM SubFrame WHERE dwarf_data_id = ? ORDER BY file_name",
+                               (dwarf_data_id,)).fetchall()
+        assert rows == [("M31_0000.fits", "light", 15.0, 80, 12.5), ("M31_0001.fits", "light", 15.0, 80, 12.5),
+                        ("M31_0002.fits", "light", 15.0, 80, 12.5), ("failed_M31_0003.fits", "failed", 15.0, 80, 12.5)]
+
+    # nothing changed: no header read, no pool
+    assert subframe_index.index_session_subframes(db_conn, [1, 2], str(session)) == 0
+    assert len(pools) == 1
+
+    (session / "M31_0001.fits").unlink()
+    assert subframe_index.index_session_subframes(db_conn, [1], str(session)) == 0
+    assert db_conn.execute("SELECT COUNT(*) FROM SubFrame WHERE dwarf_data_id = 1").fetchone()[0] == 3
@@ -0,0 +1,90 @@
+import os
+import hashlib
+
+import pytest
+
+from api import dwarf_transfer_journal
+from api.dwarf_transfer_journal import TransferJournal, copy_file_with_digest
+
+@pytest.fixture
+def transfer(tmp_path):
+    src = tmp_path / "src" / "DWARF_RAW_M31_EXP_15_GAIN_80_2025-01-01-20-00-00-000"
+    src.mkdir(parents=True)
+    for i in range(3):
+        (src / f"M31_{i:04d}.fits").write_bytes(bytes([i]) * 1000)
+    dest = tmp_path / "dest" / src.name
+    (tmp_path / "journal").mkdir()
+    all_files = [(str(path), str(dest / path.name)) for path in sorted(src.iterdir())]
+    return src, dest, all_files
+
+def test_copy_checks_the_written_data(tmp_path):
+    src = tmp_path / "stacked.fits"
+    src.write_bytes(b"fits data" * 1000)
+    os.utime(src, (1735761600, 1735761600))
+    dest = tmp_path / "copy" / "stacked.fits"
+
+    digest = copy_file_with_digest(str(src), str(dest))
+    assert digest == hashlib.sha256(src.read_bytes()).hexdigest()
+    assert dest.read_bytes() == src.read_bytes()
+    assert dest.stat().st_mtime == 1735761600
+    assert not (tmp_path / "copy" / "stacked.fits.part").exists()
+
+def test_copy_mismatch_never_looks_complete(tmp_path, monkeypatch):
+    src = tmp_path / "stacked.fits"
+    src.write_bytes(b"fits data")
+    dest = tmp_path / "copy" / "stacked.fits"
+    # what is read back from the drive is not what was sent
+    monkeypatch.setattr(dwarf_transfer_journal, "file_digest", lambda path: "0" * 64)
+
+    with pytest.raises(OSError, match="Checksum mismatch"):
+        copy_file_with_digest(str(src), str(dest))
+    assert os.listdir(tmp_path / "copy") == []
+
+def test_plan_skips_the_verified_files(transfer, tmp_path):
+    src, dest, all_files = transfer
+    journal = TransferJournal(str(src), str(dest), str(tmp_path / "journal"))
+    to_copy, skipped = journal.plan(all_files)
+    assert (to_copy, skipped) == (all_files, [])
+
+    # interrupted after the first file
+    src_file, dest_file = all_files[0]
+    journal.record_done(src_file, copy_file_with_digest(src_file, dest_file))
+
+    # a new journal reads the manifest back
+    journal = TransferJournal(str(src), str(dest), str(tmp_path / "journal"))
+    assert sorted(journal.pending()) == ["M31_0001.fits", "M31_0002.fits"]
+    to_copy, skipped = journal.plan(all_files)
+    assert (to_copy, skipped) == (all_files[1:], all_files[:1])
+
+def test_plan_copies_changed_files_again(transfer, tmp_path):
+    src, dest, all_files = transfer
+    journal = TransferJournal(str(src), str(dest), str(tmp_path / "journal"))
+    for src_file, dest_file in journal.plan(all_files)[0]:
+        journal.record_done(src_file, copy_file_with_digest(src_file, dest_file))
+    journal.compact()
+    assert journal.plan(all_files) == ([], all_files)
+
+    # new content of the same size, newer date
+    (src / "M31_0001.fits").write_bytes(b"x" * 1000)
+    os.utime(src / "M31_0001.fits", (2000000000, 2000000000))
+    # removed on the destination
+    os.remove(all_files[2][1])
+    to_copy, skipped = journal.plan(all_files)
+    assert to_copy == all_files[1:]
+    assert skipped == all_files[:1]
+
+def test_files_copied_by_another_tool_are_skipped(transfer, tmp_path):
+    src, dest, all_files = transfer
+    dest.mkdir(parents=True)
+    for src_file, dest_file in all_files:
+        copy_file_with_digest(src_file, dest_file)
+    journal = TransferJournal(str(src), str(dest), str(tmp_path / "journal"))
+    assert journal.plan(all_files) == ([], all_files)
+
+def test_truncated_journal_line_is_ignored(transfer, tmp_path):
+    src, dest, all_files = transfer
+    journal = TransferJournal(str(src), str(dest), str(tmp_path / "journal"))
+    journal.plan(all_files)
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "file", "rel": "M31_00')
+    assert len(TransferJournal(str(src), str(dest), str(tmp_path / "journal")).entries) == 3
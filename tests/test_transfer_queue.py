@@ -0,0 +1,30 @@
+import os
+
+from api import dwarf_transfer_queue
+from api.dwarf_transfer_queue import TransferQueue, device_key, TRANSPORT_USB, TRANSPORT_FTP, JOB_RUNNING
+
+MOUNTS = {"/", "/media/user/DISK1", "/media/user/DISK2"}
+
+def fake_mounts(monkeypatch):
+    monkeypatch.setattr(os.path, "ismount", lambda path: path in MOUNTS)
+
+def test_import_does_not_create_the_queue():
+    assert not hasattr(dwarf_transfer_queue, "transfer_queue")
+
+def test_device_key_is_the_mount_point(monkeypatch):
+    fake_mounts(monkeypatch)
+    assert device_key(TRANSPORT_USB, "/media/user/DISK1/Astronomy/M31") == "/media/user/DISK1"
+    assert device_key(TRANSPORT_USB, "/media/user/DISK2/Backup/not_created_yet") == "/media/user/DISK2"
+    assert device_key(TRANSPORT_USB, "/home/user/Backup") == "/"
+    assert device_key(TRANSPORT_FTP, "/Astronomy", "192.168.88.1") == "ftp://192.168.88.1"
+
+def test_copies_to_different_drives_run_together(monkeypatch, tmp_path):
+    fake_mounts(monkeypatch)
+    queue = TransferQueue(queue_file=str(tmp_path / "transfer_queue.json"))
+    first = queue.add_job("Archive", TRANSPORT_FTP, "/Astronomy/M31", "/media/user/DISK1/M31", ip_address="192.168.88.1")
+    second = queue.add_job("Archive", TRANSPORT_USB, "/media/user/DISK2/M42", "/media/user/DISK1/M42")
+    third = queue.add_job("Archive", TRANSPORT_USB, "/home/user/M45", "/media/user/DISK2/M45")
+    assert queue.next_jobs() == [first, third]
+
+    first.status = JOB_RUNNING
+    assert queue.next_jobs() == [third]